@@ -0,0 +1,297 @@
+# SPDX-FileCopyrightText: 2025 Aaron White <w531t4@gmail.com>
+# SPDX-License-Identifier: MIT
+"""
+End-to-end benchmark: fake Twitch server -> IRC agent -> transports.
+
+    python -m benchmarks.bench_e2e [--engine thread] [--rate 2000] [--tls]
+
+The fake server (benchmarks.fake_twitch) runs in a child process so CPU and
+memory below belong to the agent side only. The agent is built like
+TwitchIrcBridge builds it (same config, transport factory and dispatcher)
+but against a stub app: UDP goes to an unread local socket, MQTT and HA
+service calls are counted and optionally delayed by --ha-latency-ms.
+Latency is measured from the server writing a PRIVMSG to a transport's
+send() receiving it as the newest line (ingest-to-send, over loopback).
+"""
+
+import argparse
+import asyncio
+import multiprocessing
+import os
+import resource
+import socket
+import sys
+import tempfile
+import time
+from collections import Counter
+from pathlib import Path
+from typing import Any, Dict, List, Tuple
+
+from benchmarks.fake_twitch import (
+    SAMPLE,
+    FakeTwitchServer,
+    load_lines,
+    self_signed_cert,
+    server_tls_context,
+    stamp_of,
+)
+from twitch_fetchchat.aio_agent import AsyncIRCAgent
+from twitch_fetchchat.config import IrcBridgeConfig
+from twitch_fetchchat.dispatcher import TransportDispatcher
+from twitch_fetchchat.irc_agent import IRCAgent
+from twitch_fetchchat.metrics import Metrics
+from twitch_fetchchat.transports import build_transport
+
+CHANNEL = "benchchannel"
+
+
+class StubApp:
+    """Stands in for the AppDaemon app the transports are handed."""
+
+    def __init__(self, latency_s: float = 0.0, verbose: bool = False) -> None:
+        self.latency_s = latency_s
+        self.verbose = verbose
+        self.calls: Counter = Counter()
+
+    def log(self, msg: str, *args: Any, level: str = "INFO", **kwargs: Any) -> None:
+        if self.verbose or level in ("WARNING", "ERROR"):
+            print(f"[{level}] {msg}", file=sys.stderr)
+
+    error = log
+
+    def call_service(self, service: str, **kwargs: Any) -> None:
+        self.calls[service] += 1
+        if self.latency_s:
+            time.sleep(self.latency_s)
+
+    def set_state(self, entity_id: str, **kwargs: Any) -> None:
+        self.calls["set_state"] += 1
+        if self.latency_s:
+            time.sleep(self.latency_s)
+
+    def fire_event(self, event: str, **kwargs: Any) -> None:
+        self.calls["fire_event"] += 1
+
+
+class _Probe:
+    """Wraps a transport's send() to record the age of the newest line."""
+
+    def __init__(self, send) -> None:
+        self.inner = send
+        self.latencies_ns: List[int] = []
+        self.last_seq = -1
+
+    def send(self, lines: List[str]) -> None:
+        now = time.monotonic_ns()
+        stamp = None
+        for line in reversed(lines):
+            stamp = stamp_of(line)
+            if stamp:
+                break
+        self.inner(lines)
+        if stamp:
+            self.latencies_ns.append(now - stamp[1])
+            self.last_seq = max(self.last_seq, stamp[0])
+
+
+def _server_process(conn, opts: Dict[str, Any], stamped, done) -> None:
+    """child: run the fake server, publish its port and PRIVMSG count"""
+
+    async def run() -> None:
+        tls = server_tls_context(*opts["cert"]) if opts["cert"] else None
+        fake = FakeTwitchServer(
+            load_lines(opts["file"]), rate=opts["rate"], duration_s=opts["duration"]
+        )
+        server = await fake.start("127.0.0.1", 0, tls)
+        conn.send(fake.port)
+        async with server:
+            while True:
+                stamped.value = fake.stamped
+                if fake.finished.is_set():
+                    done.set()
+                await asyncio.sleep(0.01)
+
+    asyncio.run(run())
+
+
+def _cpu_s() -> float:
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    return usage.ru_utime + usage.ru_stime
+
+
+def _rss_mib() -> Tuple[float, float]:
+    """(current, peak) resident set size"""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    try:
+        with open("/proc/self/statm", encoding="ascii") as f:
+            pages = int(f.read().split()[1])
+        rss = pages * os.sysconf("SC_PAGE_SIZE") / 2**20
+        return rss, max(rss, peak)
+    except OSError:
+        return float("nan"), peak
+
+
+def _pct(values: List[int], q: float) -> float:
+    """q-th percentile in ms"""
+    if not values:
+        return float("nan")
+    ordered = sorted(values)
+    return ordered[round(q * (len(ordered) - 1))] / 1e6
+
+
+def _wait(predicate, timeout: float) -> bool:
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(0.005)
+    return True
+
+
+def main() -> None:
+    """entry point"""
+    parser = argparse.ArgumentParser(
+        description=__doc__.splitlines()[1] if __doc__ else None
+    )
+    parser.add_argument("--engine", choices=["thread", "asyncio"], default="thread")
+    parser.add_argument("--rate", type=float, default=2000, help="0 = unthrottled")
+    parser.add_argument("--duration", type=float, default=10)
+    parser.add_argument(
+        "--file", type=Path, default=SAMPLE, help="capture file or recording dir"
+    )
+    parser.add_argument("--tls", action="store_true")
+    parser.add_argument("--fast-parse", action="store_true")
+    parser.add_argument("--transports", default="udp,mqtt,ha")
+    parser.add_argument("--max-messages", type=int, default=3)
+    parser.add_argument("--emit-hz", type=int, default=0)
+    parser.add_argument("--dispatch-queue-size", type=int, default=8)
+    parser.add_argument("--dispatch-policy", default="replace_pending")
+    parser.add_argument("--ha-latency-ms", type=float, default=0)
+    parser.add_argument("--drain-timeout", type=float, default=30)
+    parser.add_argument("--metrics", action="store_true", help="enable Metrics")
+    parser.add_argument("--verbose", action="store_true")
+    args = parser.parse_args()
+
+    # -------- Fake server --------
+    cert = None
+    if args.tls:
+        cert = self_signed_cert(Path(tempfile.mkdtemp()))
+    stamped = multiprocessing.Value("q", 0)
+    done = multiprocessing.Event()
+    parent_conn, child_conn = multiprocessing.Pipe()
+    opts = {
+        "cert": cert,
+        "file": args.file,
+        "rate": args.rate,
+        "duration": args.duration,
+    }
+    server = multiprocessing.Process(
+        target=_server_process, args=(child_conn, opts, stamped, done), daemon=True
+    )
+    server.start()
+    port = parent_conn.recv()
+
+    # -------- Agent + transports, as TwitchIrcBridge wires them --------
+    udp_sink = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    udp_sink.bind(("127.0.0.1", 0))
+    sinks = {
+        "udp": {"udp_hosts": ["127.0.0.1"], "udp_port": udp_sink.getsockname()[1]},
+        "mqtt": {},
+        "ha": {},
+    }
+    config = IrcBridgeConfig(
+        entity_id="input_text.bench_channel",
+        irc_host="localhost",
+        irc_port=port,
+        irc_tls=args.tls,
+        irc_tls_ca_file=str(cert[0]) if cert else "",
+        irc_engine=args.engine,
+        irc_fast_parse=args.fast_parse,
+        max_messages=args.max_messages,
+        emit_max_rate_hz=args.emit_hz,
+        dispatch_queue_size=args.dispatch_queue_size,
+        dispatch_policy=args.dispatch_policy,
+        transports=[
+            {"type": kind, **sinks[kind]} for kind in args.transports.split(",")
+        ],
+    )
+    app = StubApp(args.ha_latency_ms / 1000, args.verbose)
+    metrics = Metrics() if args.metrics else None
+    transports, probes, targets = [], {}, []
+    for name, tcfg in config.transport_configs():
+        transport = build_transport(app, tcfg)
+        if transport is None:
+            raise SystemExit(f"transport {name} could not be built")
+        transports.append(transport)
+        probes[name] = _Probe(transport.deliver)
+        targets.append((name, probes[name].send))
+    dispatcher = TransportDispatcher(
+        app.log,
+        targets,
+        queue_size=config.dispatch_queue_size,
+        policy=config.dispatch_policy,
+        late_ms=config.dispatch_late_ms,
+        metrics=metrics,
+    )
+    dispatcher.start()
+    agent_class = AsyncIRCAgent if args.engine == "asyncio" else IRCAgent
+    agent = agent_class(
+        config=config, logger=app.log, emit_target=dispatcher.submit, metrics=metrics
+    )
+
+    # -------- Run --------
+    agent.switch_channel(CHANNEL)
+    agent.start()
+    if not _wait(lambda: any(p.last_seq >= 0 for p in probes.values()), 15):
+        raise SystemExit("no chat reached the transports within 15s")
+    first = min(p.last_seq for p in probes.values() if p.last_seq >= 0)
+    wall0, cpu0 = time.perf_counter(), _cpu_s()
+    done.wait(args.duration + args.drain_timeout)
+    final = stamped.value - 1
+    drained = _wait(
+        lambda: all(p.last_seq >= final for p in probes.values()), args.drain_timeout
+    )
+    wall, cpu = time.perf_counter() - wall0, _cpu_s() - cpu0
+    rss, peak = _rss_mib()
+
+    agent.terminate()
+    stats = dispatcher.stats()
+    dispatcher.stop()
+    for transport in transports:
+        transport.close()
+    udp_sink.close()
+    server.terminate()
+
+    # -------- Report --------
+    msgs = final - first
+    print(
+        f"engine={args.engine} tls={args.tls} fast_parse={args.fast_parse} "
+        f"emit_hz={args.emit_hz} rate={args.rate:g}/s x {args.duration:g}s "
+        f"transports={args.transports}"
+    )
+    print(
+        f"throughput {msgs:,} msgs in {wall:.2f}s = {msgs / wall:,.0f} msgs/s"
+        + ("" if drained else f" (NOT drained: slowest sink at seq <= {final})")
+    )
+    print(
+        f"cpu        {cpu:.2f}s = {100 * cpu / wall:.1f}% of a core, "
+        f"{cpu * 1e6 / max(msgs, 1):.1f} us/msg"
+    )
+    print(f"memory     rss {rss:.1f} MiB (peak {peak:.1f} MiB)")
+    print(f"{'transport':<10}{'sends':>9}{'p50 ms':>9}{'p99 ms':>9}{'max ms':>9}"
+          f"{'send ms':>9}{'dropped':>9}")  # fmt: skip
+    for name, probe in probes.items():
+        lat = probe.latencies_ns
+        print(
+            f"{name:<10}{len(lat):>9,}{_pct(lat, 0.5):>9.2f}{_pct(lat, 0.99):>9.2f}"
+            f"{_pct(lat, 1.0):>9.2f}{stats[name]['send_ms_avg']:>9.3f}"
+            f"{stats[name]['dropped']:>9,}"
+        )
+    if app.calls:
+        print(f"service calls {dict(app.calls)}")
+    if metrics is not None:
+        print(f"metrics    {metrics.summary()}")
+
+
+if __name__ == "__main__":
+    main()
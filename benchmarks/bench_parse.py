@@ -0,0 +1,93 @@
+# SPDX-FileCopyrightText: 2025 Aaron White <w531t4@gmail.com>
+# SPDX-License-Identifier: MIT
+"""
+Microbenchmark: irc.client line handling vs. the fastparse PRIVMSG path.
+
+    python -m benchmarks.bench_parse [--file capture.irc] [--repeat 200]
+
+Both paths replay the same raw lines through an unconnected
+ServerConnection and end in the same sink, (channel, nick, text), so the
+numbers compare exactly what IRCAgent does per line with and without
+`irc_fast_parse`. Capture files hold one raw IRC line per row.
+"""
+
+import argparse
+import time
+from pathlib import Path
+from typing import Callable, List, Tuple
+
+import irc.client
+
+from twitch_fetchchat.irc_agent import FastPathConnection
+
+SAMPLE = Path(__file__).parent / "data" / "twitch_sample.irc"
+
+Row = Tuple[str, str, str]
+
+
+def _reactor(fast: bool, sink: List[Row]) -> irc.client.ServerConnection:
+    reactor = irc.client.Reactor()
+    # The built-in PING responder needs a socket; the replay has none
+    reactor.remove_global_handler("ping", irc.client._ping_ponger)
+    if fast:
+        reactor.connection_class = FastPathConnection
+    conn = reactor.server()
+    # Normally set by connect()
+    conn.real_server_name = ""
+    conn.real_nickname = "justinfan123456"
+    conn.handlers = {}
+
+    def on_pubmsg(_conn, event: irc.client.Event) -> None:
+        # mirrors IRCAgent._on_pubmsg
+        nick = irc.client.NickMask(event.source).nick if event.source else "unknown"
+        sink.append((event.target, nick, event.arguments[0]))
+
+    reactor.add_global_handler("pubmsg", on_pubmsg)
+    if isinstance(conn, FastPathConnection):
+        conn.on_privmsg = lambda m: sink.append((m.channel, m.nick, m.text))
+    return conn
+
+
+def _run(process: Callable[[str], None], lines: List[str], repeat: int) -> float:
+    started = time.perf_counter()
+    for _ in range(repeat):
+        for line in lines:
+            process(line)
+    return time.perf_counter() - started
+
+
+def main() -> None:
+    """entry point"""
+    parser = argparse.ArgumentParser(
+        description=__doc__.splitlines()[1] if __doc__ else None
+    )
+    parser.add_argument("--file", type=Path, default=SAMPLE)
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    lines = [l for l in args.file.read_text(encoding="utf-8").splitlines() if l.strip()]
+    results = {}
+    for name, fast in (("irc.client", False), ("fastparse", True)):
+        sink: List[Row] = []
+        conn = _reactor(fast, sink)
+        _run(conn._process_line, lines, 1)  # warm up + equivalence sample
+        results[name] = (list(sink), _run(conn._process_line, lines, args.repeat))
+
+    if results["irc.client"][0] != results["fastparse"][0]:
+        raise SystemExit("paths disagree on the delivered messages")
+
+    total = len(lines) * args.repeat
+    print(
+        f"{len(lines)} lines x {args.repeat} "
+        f"({len(results['fastparse'][0])} pubmsg per pass) from {args.file}"
+    )
+    for name, (_, took) in results.items():
+        print(
+            f"{name:>10}: {total / took:>12,.0f} lines/s "
+            f"{took * 1e9 / total:>8,.0f} ns/line"
+        )
+    print(f"   speedup: {results['irc.client'][1] / results['fastparse'][1]:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,162 @@
+# SPDX-FileCopyrightText: 2025 Aaron White <w531t4@gmail.com>
+# SPDX-License-Identifier: MIT
+"""
+Startup benchmark: import cost and time to first chat line.
+
+    python -m benchmarks.bench_startup [--runs 5] [--engine thread,asyncio]
+
+Every measurement uses a fresh interpreter. "import" rows time importing a
+module (and report the process's peak RSS afterwards); the AppDaemon app is
+included when appdaemon is installed, for comparison. "first line" rows
+start `python -m twitch_fetchchat` against the local fake Twitch server and
+time process launch -> first chat line arriving at a UDP socket.
+"""
+
+import argparse
+import asyncio
+import json
+import multiprocessing
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import List, Tuple
+
+from benchmarks.fake_twitch import FakeTwitchServer, load_lines
+
+MODULES = [
+    "twitch_fetchchat",
+    "twitch_fetchchat.standalone",
+    "twitch_fetchchat.aio_agent",
+    "twitch_fetchchat.irc_agent",
+    "twitch_fetchchat.twitch_ircbridge",
+]
+
+_IMPORT = """
+import resource, time
+t = time.perf_counter()
+import {module}
+print(time.perf_counter() - t, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss)
+"""
+
+
+def _server_process(conn) -> None:
+    """child: fake Twitch server at a low rate, publishing its port"""
+
+    async def run() -> None:
+        fake = FakeTwitchServer(load_lines(), rate=50, stamp=False)
+        server = await fake.start("127.0.0.1", 0)
+        conn.send(fake.port)
+        async with server:
+            await server.serve_forever()
+
+    asyncio.run(run())
+
+
+def time_import(module: str) -> Tuple[float, float]:
+    """(seconds, peak RSS MiB) importing `module` in a fresh interpreter"""
+    out = subprocess.run(
+        [sys.executable, "-c", _IMPORT.format(module=module)],
+        capture_output=True,
+        text=True,
+        check=True,
+    ).stdout.split()
+    return float(out[0]), int(out[1]) / 1024
+
+
+def time_first_line(config: Path, sink: socket.socket) -> float:
+    """seconds from launching the standalone runner to its first chat line"""
+    started = time.perf_counter()
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "twitch_fetchchat", str(config), "--channel", "bench"],
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    try:
+        while True:
+            data = sink.recv(65535)
+            if data.strip(b"\n"):
+                return time.perf_counter() - started
+    finally:
+        proc.terminate()
+        proc.wait()
+
+
+def _row(name: str, samples: List[float], extra: str = "") -> None:
+    print(
+        f"{name:<42}{1000 * min(samples):>9.1f}"
+        f"{1000 * statistics.median(samples):>9.1f}  {extra}"
+    )
+
+
+def main() -> None:
+    """entry point"""
+    parser = argparse.ArgumentParser(
+        description=__doc__.splitlines()[1] if __doc__ else None
+    )
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--engine", default="thread,asyncio")
+    args = parser.parse_args()
+
+    print(f"{'':<42}{'min ms':>9}{'med ms':>9}")
+    baseline = []
+    for _ in range(args.runs):
+        started = time.perf_counter()
+        subprocess.run([sys.executable, "-c", "pass"], check=True)
+        baseline.append(time.perf_counter() - started)
+    for module in MODULES:
+        try:
+            runs = [time_import(module) for _ in range(args.runs)]
+        except subprocess.CalledProcessError:
+            print(f"import {module:<35} (not importable here)")
+            continue
+        rss = statistics.median(r[1] for r in runs)
+        _row(f"import {module}", [r[0] for r in runs], f"peak rss {rss:.1f} MiB")
+    _row("interpreter startup (python -c pass)", baseline)
+
+    parent, child = multiprocessing.Pipe()
+    server = multiprocessing.Process(target=_server_process, args=(child,), daemon=True)
+    server.start()
+    port = parent.recv()
+    sink = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    sink.bind(("127.0.0.1", 0))
+    sink.settimeout(30)
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            for engine in args.engine.split(","):
+                config = Path(tmp) / f"{engine}.json"
+                config.write_text(
+                    json.dumps(
+                        {
+                            "irc_host": "127.0.0.1",
+                            "irc_port": port,
+                            "irc_tls": False,
+                            "irc_engine": engine,
+                            "transport_mode": "udp",
+                            "udp_hosts": ["127.0.0.1"],
+                            "udp_port": sink.getsockname()[1],
+                        }
+                    ),
+                    encoding="utf-8",
+                )
+                samples = []
+                for _ in range(args.runs):
+                    samples.append(time_first_line(config, sink))
+                    while True:  # drop what the last run left queued
+                        sink.settimeout(0.2)
+                        try:
+                            sink.recv(65535)
+                        except socket.timeout:
+                            break
+                    sink.settimeout(30)
+                _row(f"first line, standalone {engine}", samples)
+    finally:
+        sink.close()
+        server.terminate()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,318 @@
+# SPDX-FileCopyrightText: 2025 Aaron White <w531t4@gmail.com>
+# SPDX-License-Identifier: MIT
+"""
+Local stand-in for irc.chat.twitch.tv (no network needed).
+
+    python -m benchmarks.fake_twitch [--port 6667] [--tls] [--rate 500]
+
+Speaks enough of the Twitch dialect for both IRC engines: CAP REQ is ACKed,
+NICK gets the welcome burst, JOIN/PART are echoed, client PINGs are answered
+and the server can PING on its own. Every joined channel is fed the capture
+lines in a loop at --rate lines/s (0 = as fast as the client reads), with
+the channel rewritten. When stamping, each PRIVMSG nick is prefixed with
+"<seq>_<time.monotonic_ns()>_" so a sink on the same host can recover
+wire-to-sink latency from the display line (see `stamp_of`).
+"""
+
+import argparse
+import asyncio
+import re
+import ssl
+import subprocess
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from twitch_fetchchat.fastparse import parse_privmsg
+from twitch_fetchchat.recorder import RecordedMessage, Recording
+
+SAMPLE = Path(__file__).parent / "data" / "twitch_sample.irc"
+SERVER = "tmi.twitch.tv"
+
+_TICK_S = 0.005
+_BURST = 100  # lines per write when unthrottled
+_CHANNEL = re.compile(r" #[^ ]+")
+
+
+class _Template(NamedTuple):
+    """one capture line, split so the channel (and nick) can be swapped in"""
+
+    head: str  # PRIVMSG: raw tags; else text before the channel
+    nick: str  # PRIVMSG only
+    tail: str  # PRIVMSG: message text; else text after the channel
+
+
+def _recorded_line(rec: RecordedMessage) -> str:
+    """a recorded message as the raw line Twitch sent"""
+    tags = f"@{rec.tags} " if rec.tags else ""
+    if rec.command != "PRIVMSG":
+        arg = f" :{rec.msg}" if rec.msg else ""
+        return f"{tags}:{SERVER} {rec.command} #{rec.channel}{arg}"
+    source = f"{rec.user}!{rec.user}@{rec.user}.{SERVER}"
+    return f"{tags}:{source} PRIVMSG #{rec.channel} :{rec.msg}"
+
+
+def load_lines(path: Path = SAMPLE) -> List[str]:
+    """
+    Raw IRC lines from a capture file (one per row), or PRIVMSGs rebuilt from
+    a recording directory made with `record_dir`.
+    """
+    if path.is_dir():
+        recording = Recording(str(path))
+        try:
+            return [_recorded_line(r) for r in recording.query()]
+        finally:
+            recording.close()
+    text = path.read_text(encoding="utf-8")
+    return [l.rstrip("\r") for l in text.splitlines() if l.strip()]
+
+
+def stamp_of(line: str) -> Optional[Tuple[int, int]]:
+    """(seq, sent monotonic ns) from a stamped "nick: text" display line"""
+    parts = line.partition(": ")[0].split("_", 2)
+    try:
+        return int(parts[0]), int(parts[1])
+    except (IndexError, ValueError):
+        return None
+
+
+def self_signed_cert(directory: Path, host: str = "localhost") -> Tuple[Path, Path]:
+    """(cert, key) for `host` via the openssl CLI; the cert is its own CA"""
+    cert, key = directory / "cert.pem", directory / "key.pem"
+    try:
+        subprocess.run(
+            [
+                "openssl", "req", "-x509", "-newkey", "rsa:2048", "-nodes",
+                "-days", "1", "-subj", f"/CN={host}",
+                "-addext", f"subjectAltName=DNS:{host},IP:127.0.0.1",
+                "-keyout", str(key), "-out", str(cert),
+            ],
+            check=True,
+            capture_output=True,
+        )  # fmt: skip
+    except FileNotFoundError as e:
+        raise RuntimeError("--tls needs the openssl CLI (or pass --cert/--key)") from e
+    return cert, key
+
+
+def server_tls_context(cert: Path, key: Path) -> ssl.SSLContext:
+    """server side of the TLS handshake"""
+    ctx = ssl.create_default_context(ssl.Purpose.CLIENT_AUTH)
+    ctx.load_cert_chain(cert, key)
+    return ctx
+
+
+class FakeTwitchServer:
+    """
+    Asyncio IRC server replaying capture lines into joined channels.
+    `duration_s` (0 = forever) bounds each replay; `stamped` counts the
+    PRIVMSGs written so far and `finished` is set when a replay ends.
+    """
+
+    def __init__(
+        self,
+        lines: List[str],
+        rate: float = 500,
+        stamp: bool = True,
+        duration_s: float = 0,
+        ping_interval_s: float = 0,
+    ) -> None:
+        self.rate = rate
+        self.stamp = stamp
+        self.duration_s = duration_s
+        self.ping_interval_s = ping_interval_s
+        self.templates = [t for t in map(self._template, lines) if t is not None]
+        if not self.templates:
+            raise ValueError("no replayable lines (need channel messages)")
+        self.stamped = 0
+        self.sent = 0
+        self.port = 0
+        self.finished = asyncio.Event()
+
+    @staticmethod
+    def _template(line: str) -> Optional[_Template]:
+        msg = parse_privmsg(line)
+        if msg:
+            return _Template(msg.raw_tags, msg.nick, msg.text)
+        match = _CHANNEL.search(line)
+        if not match:
+            return None  # PING etc.; nothing channel-specific to replay
+        return _Template(line[: match.start()], "", line[match.end() :])
+
+    async def start(
+        self,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        tls: Optional[ssl.SSLContext] = None,
+    ) -> asyncio.Server:
+        """listen (port 0 picks a free one, see self.port)"""
+        server = await asyncio.start_server(self._client, host, port, ssl=tls)
+        self.port = server.sockets[0].getsockname()[1]
+        return server
+
+    # -------------------- Session --------------------
+    async def _client(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ) -> None:
+        nick = "justinfan0"
+        replays: Dict[str, asyncio.Task] = {}
+        tasks = []
+        if self.ping_interval_s:
+            tasks.append(asyncio.create_task(self._pinger(writer)))
+        try:
+            while True:
+                raw = await reader.readline()
+                if not raw:
+                    break
+                command, _, rest = raw.decode("utf-8", "replace").strip().partition(" ")
+                command = command.upper()
+                if command == "CAP" and rest.startswith("REQ"):
+                    caps = rest[3:].strip().lstrip(":")
+                    self._write(writer, f":{SERVER} CAP * ACK :{caps}")
+                elif command == "NICK":
+                    nick = rest.strip()
+                    self._welcome(writer, nick)
+                elif command == "PING":
+                    self._write(writer, f":{SERVER} PONG {SERVER} {rest}")
+                elif command == "JOIN":
+                    for channel in rest.strip().split(","):
+                        if channel in replays:
+                            continue
+                        self._joined(writer, nick, channel)
+                        replays[channel] = asyncio.create_task(
+                            self._replay(writer, channel)
+                        )
+                elif command == "PART":
+                    for channel in rest.strip().split(","):
+                        task = replays.pop(channel, None)
+                        if task:
+                            task.cancel()
+                        self._write(
+                            writer, f":{nick}!{nick}@{nick}.{SERVER} PART {channel}"
+                        )
+                elif command == "QUIT":
+                    break
+                await writer.drain()
+        except (ConnectionError, ssl.SSLError):
+            pass
+        finally:
+            for task in [*replays.values(), *tasks]:
+                task.cancel()
+            writer.close()
+
+    def _welcome(self, writer: asyncio.StreamWriter, nick: str) -> None:
+        for code, text in (
+            ("001", "Welcome, GLHF!"),
+            ("002", f"Your host is {SERVER}"),
+            ("003", "This server is rather new"),
+            ("004", "-"),
+            ("375", "-"),
+            ("372", "You are in a maze of twisty passages, all alike."),
+            ("376", ">"),
+        ):
+            self._write(writer, f":{SERVER} {code} {nick} :{text}")
+
+    def _joined(self, writer: asyncio.StreamWriter, nick: str, channel: str) -> None:
+        user = f"{nick}.{SERVER}"
+        self._write(writer, f":{nick}!{nick}@{user} JOIN {channel}")
+        self._write(writer, f":{user} 353 {nick} = {channel} :{nick}")
+        self._write(writer, f":{user} 366 {nick} {channel} :End of /NAMES list")
+        self._write(
+            writer,
+            f"@emote-only=0;followers-only=-1;r9k=0;slow=0;subs-only=0 "
+            f":{SERVER} ROOMSTATE {channel}",
+        )
+
+    async def _pinger(self, writer: asyncio.StreamWriter) -> None:
+        while True:
+            await asyncio.sleep(self.ping_interval_s)
+            self._write(writer, f"PING :{SERVER}")
+
+    async def _replay(self, writer: asyncio.StreamWriter, channel: str) -> None:
+        """Feed `channel` at self.rate lines/s, catching up after stalls."""
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        count = 0
+        try:
+            while True:
+                elapsed = loop.time() - started
+                if self.duration_s and elapsed >= self.duration_s:
+                    break
+                due = count + _BURST if self.rate <= 0 else int(elapsed * self.rate)
+                if due > count:
+                    batch = [self._line(count + i, channel) for i in range(due - count)]
+                    writer.write("".join(batch).encode("utf-8"))
+                    self.sent += len(batch)
+                    count = due
+                    await writer.drain()  # client backpressure
+                if self.rate > 0:
+                    await asyncio.sleep(_TICK_S)
+        except (ConnectionError, ssl.SSLError):
+            pass
+        self.finished.set()
+
+    def _line(self, count: int, channel: str) -> str:
+        t = self.templates[count % len(self.templates)]
+        if not t.nick:
+            return f"{t.head} {channel}{t.tail}\r\n"
+        nick = t.nick
+        if self.stamp:
+            nick = f"{self.stamped}_{time.monotonic_ns()}_{nick}"
+            self.stamped += 1
+        return (
+            f"@{t.head} :{nick}!{nick}@{nick}.{SERVER} PRIVMSG {channel} :{t.tail}\r\n"
+        )
+
+    @staticmethod
+    def _write(writer: asyncio.StreamWriter, line: str) -> None:
+        writer.write(f"{line}\r\n".encode("utf-8"))
+
+
+async def _serve(args: argparse.Namespace) -> None:
+    tls = None
+    if args.tls:
+        if args.cert:
+            cert, key = args.cert, args.key or args.cert
+        else:
+            cert, key = self_signed_cert(Path(tempfile.mkdtemp()))
+        tls = server_tls_context(cert, key)
+        print(f"TLS with certificate {cert} (use as irc_tls_ca_file)")
+    fake = FakeTwitchServer(
+        load_lines(args.file),
+        rate=args.rate,
+        stamp=args.stamp,
+        ping_interval_s=args.ping,
+    )
+    server = await fake.start(args.host, args.port, tls)
+    print(f"fake Twitch IRC on {args.host}:{fake.port} ({args.rate:g} lines/s)")
+    async with server:
+        await server.serve_forever()
+
+
+def main() -> None:
+    """entry point"""
+    parser = argparse.ArgumentParser(
+        description=__doc__.splitlines()[1] if __doc__ else None
+    )
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=6667)
+    parser.add_argument(
+        "--file", type=Path, default=SAMPLE, help="capture file or recording dir"
+    )
+    parser.add_argument("--rate", type=float, default=500)
+    parser.add_argument("--ping", type=float, default=0, help="server PING every N s")
+    parser.add_argument("--stamp", action="store_true", help="latency-stamp nicks")
+    parser.add_argument("--tls", action="store_true")
+    parser.add_argument(
+        "--cert", type=Path, help="PEM certificate (default: generated)"
+    )
+    parser.add_argument("--key", type=Path, help="PEM key (default: --cert)")
+    try:
+        asyncio.run(_serve(parser.parse_args()))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -1,3 +1,19 @@
 # SPDX-FileCopyrightText: 2025 Aaron White <w531t4@gmail.com>
 # SPDX-License-Identifier: MIT
-from twitch_fetchchat.twitch_ircbridge import TwitchIrcBridge
+from typing import TYPE_CHECKING, Any
+
+if TYPE_CHECKING:
+    from twitch_fetchchat.twitch_ircbridge import TwitchIrcBridge
+
+__all__ = ["TwitchIrcBridge"]
+
+
+def __getattr__(name: str) -> Any:
+    # AppDaemon is only imported when the app class itself is asked for, so
+    # the standalone runner and the core modules start without it
+    if name == "TwitchIrcBridge":
+        # pylint: disable-next=import-outside-toplevel
+        from twitch_fetchchat.twitch_ircbridge import TwitchIrcBridge
+
+        return TwitchIrcBridge
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
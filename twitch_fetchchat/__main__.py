@@ -0,0 +1,5 @@
+# SPDX-FileCopyrightText: 2025 Aaron White <w531t4@gmail.com>
+# SPDX-License-Identifier: MIT
+from twitch_fetchchat.standalone import main
+
+main()
@@ -0,0 +1,609 @@
+# SPDX-FileCopyrightText: 2025 Aaron White <w531t4@gmail.com>
+# SPDX-License-Identifier: MIT
+import itertools
+import random
+import ssl
+import string
+import threading
+import time
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Optional, Callable, List, Dict
+
+from twitch_fetchchat import profiling
+from twitch_fetchchat.config import RECONNECT_KEYS, IrcBridgeConfig
+from twitch_fetchchat.emit_scheduler import EmitScheduler
+from twitch_fetchchat.filters import ChatFilter, TagGetter, no_tags
+from twitch_fetchchat.hasslog import HassLog
+from twitch_fetchchat.message import Batch, ChatMessage, Snapshot
+from twitch_fetchchat.metrics import SWITCH_BUCKETS_S, Metrics
+from twitch_fetchchat.render import Renderer
+from twitch_fetchchat.ring import ChatRing
+
+# Twitch commands that edit a channel's buffer or modes (see _moderate)
+MODERATION_COMMANDS = ("CLEARCHAT", "CLEARMSG", "ROOMSTATE")
+# ROOMSTATE tags worth keeping; a partial ROOMSTATE carries only what changed
+ROOM_STATE_TAGS = ("emote-only", "followers-only", "r9k", "slow", "subs-only")
+
+if TYPE_CHECKING:
+    from twitch_fetchchat.checkpoint import BufferCheckpoint
+    from twitch_fetchchat.recorder import ChatRecorder
+    from twitch_fetchchat.supervisor import ShardSupervisor
+
+
+class _ResumingContext(ssl.SSLContext):
+    """SSLContext that offers the last remembered session to new connections"""
+
+    session: ssl.SSLSession | None = None
+
+    def wrap_socket(self, *args, **kwargs):  # pylint: disable=signature-differs
+        if kwargs.get("session") is None:
+            kwargs["session"] = self.session
+        return super().wrap_socket(*args, **kwargs)
+
+    def wrap_bio(self, *args, **kwargs):  # pylint: disable=signature-differs
+        if kwargs.get("session") is None:
+            kwargs["session"] = self.session
+        return super().wrap_bio(*args, **kwargs)
+
+
+@dataclass
+class _Display:
+    """An output (TV, ticker, ...) following one channel at a time"""
+
+    emit_target: Callable[[List[str]], None]
+    max_messages: int
+    channel: Optional[str] = None
+    # seq of the newest message already batched to this display
+    cursor: int = 0
+
+
+class _AgentBase:
+    """
+    Engine-independent half of the Twitch IRC agent
+    - Serves any number of displays over a single IRC connection
+    - Keeps one ring buffer per wanted channel and routes chat to displays
+    - Emits each display's rolling last N public chat lines to its own target
+    Engines implement start/terminate and react to `_channels_changed`.
+    """
+
+    def __init__(
+        self,
+        config: IrcBridgeConfig,
+        logger: HassLog,
+        emit_target: Callable[[List[str]], None],
+        metrics: Optional[Metrics] = None,
+    ) -> None:
+        self.log = logger
+        self.config = config
+        self.metrics = metrics
+
+        # -------- State --------
+        # display key -> display; the config's own entity is the default one
+        self._displays: Dict[str, _Display] = {
+            config.entity_id: _Display(emit_target, config.max_messages)
+        }
+        # "#channel" -> ring buffer / display keys watching it
+        self._buffers: Dict[str, ChatRing] = {}
+        self._routes: Dict[str, List[str]] = {}
+        self._seqs: Dict[str, itertools.count] = {}
+        # "#channel" -> latest ROOMSTATE tags (slow, subs-only, ...)
+        self._room_state: Dict[str, Dict[str, str]] = {}
+        self._stop_flag = False
+        self._lock = threading.RLock()
+        # "#channel" -> monotonic time of the switch still awaiting chat
+        self._switched_at: Dict[str, float] = {}
+        # built once; carries the TLS session across reconnects
+        self._ssl_ctx: _ResumingContext | None = None
+
+        # Coalesce bursts into at most emit_max_rate_hz snapshots/sec
+        self._scheduler = self._build_scheduler()
+        # Load shedding ahead of the ring buffers; None when nothing is set
+        self._filter = self._build_filter()
+        # Display rows are rendered once per message, not per transport
+        self._renderer = self._build_renderer()
+        self._started = False
+
+        # Optional append-only log of everything ingested
+        self._recorder: ChatRecorder | None = None
+        if self.config.record_dir:
+            # pylint: disable-next=import-outside-toplevel
+            from twitch_fetchchat import recorder
+
+            self._recorder = recorder.ChatRecorder(
+                self.config.record_dir,
+                self.log,
+                segment_bytes=self.config.record_segment_mb * 2**20,
+                segment_s=self.config.record_segment_s,
+                max_segments=self.config.record_max_segments,
+            )
+
+        # Optional on-disk copy of the buffers, restored when a channel is
+        # (re)joined so displays come back filled after a restart
+        self._checkpoint: BufferCheckpoint | None = None
+        if self.config.checkpoint_path:
+            # pylint: disable-next=import-outside-toplevel
+            from twitch_fetchchat import checkpoint
+
+            self._checkpoint = checkpoint.BufferCheckpoint(
+                self.config.checkpoint_path,
+                self.log,
+                interval_s=self.config.checkpoint_interval_s,
+                max_age_s=self.config.checkpoint_max_age_s,
+                metrics=self.metrics,
+            )
+            self._checkpoint.load()
+
+    def _build_scheduler(self) -> EmitScheduler | None:
+        if self.config.emit_max_rate_hz <= 0:
+            return None
+        return EmitScheduler(
+            self._emit,
+            self.log,
+            self.config.emit_max_rate_hz,
+            self.config.emit_quiet_ms,
+        )
+
+    def _build_filter(self) -> ChatFilter | None:
+        chat_filter = ChatFilter(
+            max_lines_per_s=self.config.filter_max_lines_per_s,
+            dedup_size=self.config.filter_dedup_size,
+            dedup_window_s=self.config.filter_dedup_window_s,
+            priority=self.config.filter_priority,
+            blocklist=self.config.filter_blocklist,
+        )
+        return chat_filter if chat_filter.enabled else None
+
+    def _build_renderer(self) -> Renderer | None:
+        renderer = Renderer(
+            width=self.config.render_width,
+            wrap_rows=self.config.render_wrap,
+            hide_emotes=self.config.render_strip_emotes,
+            ascii_only=self.config.render_ascii,
+            max_rows=self.config.max_messages,
+        )
+        return renderer if renderer.enabled else None
+
+    def start(self) -> None:
+        """start the agent"""
+        self._started = True
+        if self._scheduler:
+            self._scheduler.start()
+        if self._recorder:
+            self._recorder.start()
+        if self._checkpoint:
+            self._checkpoint.start(self._checkpoint_buffers)
+
+    def terminate(self) -> None:
+        """stop irc session"""
+        self._stop_flag = True
+        if self._scheduler:
+            self._scheduler.stop()
+        if self._recorder:
+            self._recorder.stop()
+        if self._checkpoint:
+            self._checkpoint.stop()
+        if self._filter:
+            self.log(f"chat filter: {self._filter.stats()}")
+
+    def reconfigure(self, config: IrcBridgeConfig) -> None:
+        """
+        Apply a reloaded config in place: the emit scheduler, filter and
+        renderer are rebuilt if their settings changed, and the IRC link is
+        redialled only for RECONNECT_KEYS. RESTART_KEYS need a new agent;
+        displays are updated through add_display/remove_display.
+        """
+        changed = set(self.config.changed_fields(config))
+        with self._lock:
+            self.config = config
+            if changed & {"emit_max_rate_hz", "emit_quiet_ms"}:
+                old, self._scheduler = self._scheduler, self._build_scheduler()
+                if old:
+                    old.stop()
+                if self._scheduler and self._started:
+                    self._scheduler.start()
+            if "batch_backlog" in changed:
+                for channel in self._buffers:
+                    self._resize(channel)
+            if any(key.startswith("filter_") for key in changed):
+                self._filter = self._build_filter()
+            if any(key.startswith("render_") for key in changed) or (
+                "max_messages" in changed
+            ):
+                self._renderer = self._build_renderer()  # new messages only
+            if "irc_tls_ca_file" in changed:
+                self._ssl_ctx = None
+            elif "irc_host" in changed and self._ssl_ctx is not None:
+                self._ssl_ctx.session = None  # issued by the old server
+            keys = list(self._displays)
+        if changed.intersection(RECONNECT_KEYS):
+            self.log(
+                f"IRC endpoint now {config.irc_host}:{config.irc_port}; reconnecting"
+            )
+            self._endpoint_changed()
+        for key in keys:
+            self._request_emit(key)
+
+    def add_display(
+        self,
+        key: str,
+        emit_target: Callable[[List[str]], None],
+        max_messages: int,
+    ) -> None:
+        """
+        Register another display sharing this agent's connection; for a
+        known key, swap its target/size and keep its channel.
+        """
+        with self._lock:
+            disp = self._displays.get(key)
+            if disp is None:
+                self._displays[key] = _Display(emit_target, max_messages)
+                return
+            disp.emit_target = emit_target
+            disp.max_messages = max_messages
+            if disp.channel:
+                self._resize(f"#{disp.channel}")
+        self._request_emit(key)
+
+    def remove_display(self, key: str) -> None:
+        """Drop a display, releasing its channel."""
+        with self._lock:
+            disp = self._displays.pop(key, None)
+            if disp is None or not disp.channel:
+                return
+            self._unroute(f"#{disp.channel}", key)
+            idle = not self._buffers
+        self._channels_changed(idle)
+
+    def channels(self) -> Dict[str, Optional[str]]:
+        """display key -> the channel it follows"""
+        with self._lock:
+            return {key: disp.channel for key, disp in self._displays.items()}
+
+    def switch_channel(
+        self, channel: Optional[str], display: Optional[str] = None
+    ) -> None:
+        """
+        Point a display (default: the config's entity) at a new channel, or
+        None to release it. Disconnects once no display wants a channel.
+        """
+        key = self.config.entity_id if display is None else display
+        with self._lock:
+            self.log(f"switch_channel: display={key} channel={channel}")
+            disp = self._displays[key]
+            if disp.channel == channel:
+                # e.g. re-applied after a reload: keep the buffer, just re-emit
+                self._request_emit(key)
+                return
+            if disp.channel:
+                self._unroute(f"#{disp.channel}", key)
+            disp.channel = channel
+            disp.cursor = 0  # the first batch carries the buffered history
+            if channel:
+                self._route(f"#{channel}", key)
+                if self.metrics is not None:
+                    self._switched_at[f"#{channel}"] = time.monotonic()
+            idle = not self._buffers
+        self._request_emit(key)  # send blanks (or the shared buffer) on switch
+        self._channels_changed(idle)
+
+    def _channels_changed(self, idle: bool) -> None:
+        """engine hook: the wanted channel set changed (idle => none wanted)"""
+        raise NotImplementedError
+
+    def _endpoint_changed(self) -> None:
+        """engine hook: irc_host/port/TLS changed; drop the link and redial"""
+        raise NotImplementedError
+
+    def _wanted_channels(self) -> set[str]:
+        with self._lock:
+            return set(self._buffers)
+
+    def _route(self, channel: str, key: str) -> None:
+        """attach a display to a channel, creating its buffer (lock held)"""
+        self._routes.setdefault(channel, []).append(key)
+        self._resize(channel)
+
+    def _resize(self, channel: str) -> None:
+        """fit a channel's buffer to its largest display (lock held)"""
+        watchers = self._routes.get(channel, [])
+        maxlen = max(
+            [self._displays[k].max_messages for k in watchers]
+            + [3, self.config.batch_backlog]
+        )
+        ring = self._buffers.get(channel)
+        if ring is None:
+            ring = self._buffers[channel] = ChatRing(maxlen)
+            self._seqs.setdefault(channel, itertools.count(1))
+            if self._checkpoint is not None:
+                self._restore(channel, ring)
+        elif ring.maxlen != maxlen:
+            ring.resize(maxlen)
+
+    def _unroute(self, channel: str, key: str) -> None:
+        """detach a display; the last one out drops the buffer (lock held)"""
+        watchers = self._routes.get(channel, [])
+        if key in watchers:
+            watchers.remove(key)
+        if not watchers:
+            self._routes.pop(channel, None)
+            ring = self._buffers.pop(channel, None)
+            if self._checkpoint is not None and ring is not None:
+                self._checkpoint.keep(channel[1:], list(ring))
+            self._seqs.pop(channel, None)
+            self._room_state.pop(channel, None)
+            self._switched_at.pop(channel, None)
+            if self._filter:
+                self._filter.forget(channel)
+
+    def _restore(self, channel: str, ring: ChatRing) -> None:
+        """refill a new buffer from the checkpoint (lock held)"""
+        assert self._checkpoint is not None
+        seqs = self._seqs[channel]
+        saved = self._checkpoint.restore(channel[1:], ring.maxlen)
+        for m in saved:
+            data = tuple(l.encode("utf-8", errors="replace") for l in m.lines)
+            ring.append(
+                ChatMessage(
+                    channel[1:],
+                    m.user,
+                    m.msg,
+                    m.ts,
+                    m.lines,
+                    data,
+                    next(seqs),
+                    m.msg_id,
+                )
+            )
+        if saved:
+            self.log(f"restored {len(saved)} buffered messages for {channel}")
+
+    def _checkpoint_buffers(self) -> Dict[str, List[ChatMessage]]:
+        """the live buffers by channel (without "#"), for the checkpoint"""
+        with self._lock:
+            return {ch[1:]: list(ring) for ch, ring in self._buffers.items()}
+
+    # -------------------- Ingest --------------------
+    def _ingest(
+        self, channel: str, nick: str, msg: str, tag: TagGetter = no_tags
+    ) -> None:
+        """
+        Buffer one chat line for `channel` ("#name") and schedule emits.
+        `tag` looks up the line's IRCv3 tags for the filter and render stages.
+        """
+        if channel not in self._buffers:
+            return  # unwatched; skip the filter/render work
+        if self._filter is not None:
+            reason = self._filter.shed(channel, nick, msg, tag)
+            if reason:
+                if self.metrics is not None:
+                    self.metrics.inc("messages_shed_total", reason=reason)
+                return
+        lines = None
+        if self._renderer is not None:
+            lines = self._renderer.render(nick, msg, tag)
+        seqs = self._seqs.get(channel)
+        if seqs is None:
+            return
+        item = ChatMessage.create(
+            channel[1:], nick, msg, lines, next(seqs), tag("id") or ""
+        )
+
+        with self._lock:
+            ring = self._buffers.get(channel)
+            if ring is None:  # not (or no longer) watched
+                return
+            ring.append(item)
+            watchers = tuple(self._routes[channel])
+        if self._recorder is not None:
+            self._recorder.append(item, tag)
+        if self._checkpoint is not None:
+            self._checkpoint.mark()
+        if self.metrics is not None:
+            self._count_ingest(self.metrics, channel)
+        for key in watchers:
+            self._request_emit(key)
+
+    def _count_ingest(self, metrics: Metrics, channel: str) -> None:
+        """metered half of _ingest (message count, switch-to-first-message)"""
+        metrics.inc("messages_received_total")
+        started = self._switched_at.pop(channel, None)
+        if started is not None:
+            metrics.observe(
+                "channel_switch_first_message_seconds",
+                time.monotonic() - started,
+                SWITCH_BUCKETS_S,
+            )
+
+    # -------------------- Moderation --------------------
+    def _moderate(
+        self, command: str, channel: str, arg: Optional[str], tag: TagGetter
+    ) -> None:
+        """
+        Apply a CLEARCHAT/CLEARMSG/ROOMSTATE line for `channel` ("#name");
+        `arg` is its trailing parameter (the banned user for CLEARCHAT).
+        """
+        if self._recorder is not None and channel in self._buffers:
+            self._recorder.append_command(command, channel[1:], arg, tag)
+        if command == "CLEARCHAT":
+            self._clear_chat(channel, arg)
+        elif command == "CLEARMSG":
+            self._clear_msg(channel, tag("target-msg-id"))
+        elif command == "ROOMSTATE":
+            self._room_state_changed(channel, tag)
+
+    def _clear_chat(self, channel: str, user: Optional[str]) -> None:
+        """CLEARCHAT: a ban/timeout of `user`, or the whole chat when None"""
+        with self._lock:
+            ring = self._buffers.get(channel)
+            if ring is None:
+                return
+            removed = ring.remove_user(user) if user else ring.clear()
+        self._moderated(channel, removed, "ban" if user else "clear")
+
+    def _clear_msg(self, channel: str, msg_id: Optional[str]) -> None:
+        """CLEARMSG: one message deleted by its `target-msg-id`"""
+        if not msg_id:
+            return
+        with self._lock:
+            ring = self._buffers.get(channel)
+            if ring is None:
+                return
+            removed = ring.remove_id(msg_id)
+        self._moderated(channel, removed, "delete")
+
+    def _moderated(self, channel: str, removed: int, kind: str) -> None:
+        """re-emit a channel's displays once if moderation changed its buffer"""
+        if not removed:
+            return  # bans of users with nothing buffered cost no emit
+        if self._checkpoint is not None:
+            self._checkpoint.mark()
+        if self.metrics is not None:
+            self.metrics.inc("messages_moderated_total", removed, kind=kind)
+        with self._lock:
+            watchers = tuple(self._routes.get(channel, ()))
+        for key in watchers:
+            self._request_emit(key)
+
+    def _room_state_changed(self, channel: str, tag: TagGetter) -> None:
+        """ROOMSTATE: log the chat modes that changed (slow, subs-only, ...)"""
+        with self._lock:
+            if channel not in self._buffers:
+                return
+            state = self._room_state.setdefault(channel, {})
+            changed = {}
+            for key in ROOM_STATE_TAGS:
+                value = tag(key)
+                if value is not None and state.get(key) != value:
+                    changed[key] = state[key] = value
+        if changed:
+            self.log(f"room state {channel}: {changed}")
+
+    # -------------------- Emission --------------------
+    def _request_emit(self, key: str) -> None:
+        """Emit now, or leave it to the scheduler when rate limiting is on."""
+        if self._scheduler:
+            self._scheduler.request(key)
+        else:
+            self._emit(key)
+
+    def _emit(self, key: str) -> None:
+        spans = profiling.spans
+        started = time.perf_counter() if spans is not None else 0.0
+        with self._lock:
+            disp = self._displays.get(key)
+            if disp is None:
+                return  # removed while an emit was pending
+            ring = self._buffers.get(f"#{disp.channel}") if disp.channel else None
+            # Newest rows first until the display is full (messages may wrap)
+            rows: List[str] = []
+            data: List[bytes] = []
+            for m in reversed(ring or ()):
+                rows.extend(reversed(m.lines))
+                data.extend(reversed(m.data))
+                if len(rows) >= disp.max_messages:
+                    break
+            batch = self._batch(key, disp, ring)
+        # Exactly N display lines (oldest->newest), empty if missing
+        del rows[disp.max_messages :], data[disp.max_messages :]
+        pad = disp.max_messages - len(rows)
+        lines = Snapshot([""] * pad + rows[::-1], [b""] * pad + data[::-1], batch)
+        if self.metrics is not None:
+            self.metrics.inc("snapshots_emitted_total")
+        try:
+            disp.emit_target(lines)
+        except Exception as e:
+            self.log(f"Transport send error ({key}): {e}", level="ERROR")
+        if spans is not None:
+            spans.add("emit", time.perf_counter() - started)
+
+    @staticmethod
+    def _batch(key: str, disp: _Display, ring: Optional[ChatRing]) -> Batch:
+        """messages in `ring` newer than the display's cursor (lock held)"""
+        fresh: List[ChatMessage] = []
+        for m in reversed(ring or ()):
+            if m.seq <= disp.cursor:
+                break
+            fresh.append(m)
+        if not fresh:
+            return Batch(key, disp.channel)
+        fresh.reverse()
+        dropped = fresh[0].seq - disp.cursor - 1 if disp.cursor else 0
+        disp.cursor = fresh[-1].seq
+        return Batch(key, disp.channel, tuple(fresh), dropped)
+
+    def _link_state(self, event: str, backoff_s: float = 0.0) -> None:
+        """record an IRC link event (connected/failed/closed) when metered"""
+        if self.metrics is None:
+            return
+        if event == "connected":
+            self.metrics.inc("irc_connects_total")
+        elif event == "failed":
+            self.metrics.inc("irc_failures_total")
+        self.metrics.set("irc_connected", int(event == "connected"))
+        self.metrics.set("irc_backoff_seconds", round(backoff_s, 3))
+
+    # -------------------- Connection helpers --------------------
+    @staticmethod
+    def _anonymous_nick() -> str:
+        return "justinfan" + "".join(random.choices(string.digits, k=6))
+
+    def _tls_context(self) -> ssl.SSLContext:
+        if self._ssl_ctx is not None:
+            return self._ssl_ctx
+        # Verified TLS (hostname check + CA validation); irc_tls_ca_file
+        # replaces the system trust store, e.g. for a local test server
+        ctx = _ResumingContext(ssl.PROTOCOL_TLS_CLIENT)
+        if self.config.irc_tls_ca_file:
+            ctx.load_verify_locations(cafile=self.config.irc_tls_ca_file)
+        else:
+            ctx.load_default_certs(ssl.Purpose.SERVER_AUTH)
+        ctx.minimum_version = ssl.TLSVersion.TLSv1_2
+        ctx.check_hostname = True
+        ctx.verify_mode = ssl.CERT_REQUIRED
+        self._ssl_ctx = ctx
+        return ctx
+
+    def _remember_tls_session(self, tls: ssl.SSLSocket | ssl.SSLObject) -> None:
+        """
+        Called once the server has greeted us (any TLS 1.3 ticket has
+        arrived by then): keep the session so the next connect resumes it.
+        """
+        if tls.session_reused:
+            self.log("TLS session resumed")
+            if self.metrics is not None:
+                self.metrics.inc("irc_tls_resumed_total")
+        if self._ssl_ctx is not None and tls.session is not None:
+            self._ssl_ctx.session = tls.session
+
+
+def agent_class(engine: str) -> type[_AgentBase]:
+    """The agent for an `irc_engine` value, importing only that engine."""
+    # pylint: disable=import-outside-toplevel
+    if engine == "asyncio":
+        from twitch_fetchchat.aio_agent import AsyncIRCAgent
+
+        return AsyncIRCAgent
+    if engine == "replay":
+        from twitch_fetchchat.replay_agent import ReplayAgent
+
+        return ReplayAgent
+    from twitch_fetchchat.irc_agent import IRCAgent
+
+    return IRCAgent
+
+
+def build_agent(
+    config: IrcBridgeConfig,
+    logger: HassLog,
+    emit_target: Callable[[List[str]], None],
+    metrics: Optional[Metrics] = None,
+) -> "_AgentBase | ShardSupervisor":
+    """The configured engine, or a ShardSupervisor when irc_shards > 1."""
+    if config.irc_shards > 1:
+        # pylint: disable-next=import-outside-toplevel
+        from twitch_fetchchat.supervisor import ShardSupervisor
+
+        return ShardSupervisor(config, logger, emit_target, metrics)
+    return agent_class(config.irc_engine)(
+        config=config, logger=logger, emit_target=emit_target, metrics=metrics
+    )
@@ -0,0 +1,271 @@
+# SPDX-FileCopyrightText: 2025 Aaron White <w531t4@gmail.com>
+# SPDX-License-Identifier: MIT
+import asyncio
+import random
+import threading
+import time
+from typing import Callable, List, Optional, Tuple
+
+from twitch_fetchchat import profiling
+from twitch_fetchchat.agent_base import MODERATION_COMMANDS, _AgentBase
+from twitch_fetchchat.config import IrcBridgeConfig
+from twitch_fetchchat.fastparse import RawPrivmsg, parse_privmsg
+from twitch_fetchchat.hasslog import HassLog
+from twitch_fetchchat.metrics import Metrics
+
+# Twitch PINGs roughly every 5 minutes; silence beyond this means a dead link
+_SERVER_SILENCE_S = 360
+
+
+def _split_line(line: str) -> Tuple[str, str, str, List[str]]:
+    """Split a raw IRC line into (tags, prefix, COMMAND, params)."""
+    tags = prefix = ""
+    if line.startswith("@"):
+        tags, _, line = line[1:].partition(" ")
+    if line.startswith(":"):
+        prefix, _, line = line[1:].partition(" ")
+    head, sep, trailing = line.lstrip(" ").partition(" :")
+    params = head.split()
+    command = params.pop(0).upper() if params else ""
+    if sep:
+        params.append(trailing)
+    return tags, prefix, command, params
+
+
+class AsyncIRCAgent(_AgentBase):
+    """
+    Anonymous, read-only Twitch IRC Agent (asyncio engine)
+    - Same switch_channel/terminate API as IRCAgent
+    - Runs its own event loop on one thread; wakes only on socket data,
+      channel changes and shutdown (no fixed-interval polling)
+    """
+
+    def __init__(
+        self,
+        config: IrcBridgeConfig,
+        logger: HassLog,
+        emit_target: Callable[[List[str]], None],
+        metrics: Optional[Metrics] = None,
+    ) -> None:
+        super().__init__(config, logger, emit_target, metrics)
+        self._irc_thread: threading.Thread | None = None
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._main_task: asyncio.Task | None = None
+        self._changed: asyncio.Event | None = None
+        self._last_rx = 0.0
+        self._redial = False
+
+    def start(self) -> None:
+        """start the agent"""
+        super().start()
+        if not self._irc_thread:
+            self._irc_thread = threading.Thread(target=self._run, daemon=True)
+            self._irc_thread.start()
+
+    def terminate(self) -> None:
+        """stop irc session"""
+        super().terminate()
+        self._call_soon(self._cancel_main)
+
+    def _channels_changed(self, idle: bool) -> None:
+        # The session notices an empty channel set itself and disconnects
+        self._call_soon(self._notify_changed)
+
+    def _endpoint_changed(self) -> None:
+        # The session returns and _main dials the new endpoint
+        self._redial = True
+        self._call_soon(self._notify_changed)
+
+    def _call_soon(self, callback: Callable[[], None]) -> None:
+        """schedule `callback` on the agent loop from any thread"""
+        loop = self._loop
+        if loop is None:
+            return  # not started yet; _main reads the current state on entry
+        try:
+            loop.call_soon_threadsafe(callback)
+        except RuntimeError:
+            pass  # loop already closed
+
+    def _notify_changed(self) -> None:
+        if self._changed:
+            self._changed.set()
+
+    def _cancel_main(self) -> None:
+        if self._main_task:
+            self._main_task.cancel()
+
+    # -------------------- IRC core --------------------
+    def _run(self) -> None:
+        try:
+            asyncio.run(self._main())
+        except asyncio.CancelledError:
+            pass
+
+    async def _main(self) -> None:
+        self._loop = asyncio.get_running_loop()
+        self._main_task = asyncio.current_task()
+        self._changed = asyncio.Event()
+        if self._stop_flag:  # terminate() raced start()
+            return
+        backoff = self.config.reconnect_delay_s
+        while not self._stop_flag:
+            self._changed.clear()
+            # Only connect when we actually have a target channel
+            if not self._wanted_channels():
+                await self._changed.wait()  # until switch_channel/terminate
+                continue
+            try:
+                self._redial = False
+                reader, writer = await self._connect()
+                backoff = self.config.reconnect_delay_s  # reset after success
+                self._link_state("connected")
+                try:
+                    await self._session(reader, writer)
+                    if self._redial:
+                        self.log("Reconnecting (IRC endpoint changed).")
+                    else:
+                        self.log("Tearing down IRC connection (no active channel).")
+                    self._link_state("closed")
+                    continue
+                finally:
+                    self._close(writer)
+            except Exception as e:
+                self.log(f"IRC loop error: {e}", level="WARNING")
+            delay = backoff + random.random() * 0.5 * backoff
+            self._link_state("failed", delay)
+            await asyncio.sleep(delay)
+            backoff = min(backoff * 2, 60)
+
+    async def _connect(self) -> Tuple[asyncio.StreamReader, asyncio.StreamWriter]:
+        nick = self._anonymous_nick()
+        self.log(
+            f"Connecting to {self.config.irc_host}:{self.config.irc_port} "
+            f"as {nick} (anonymous, asyncio)"
+        )
+        reader, writer = await asyncio.open_connection(
+            self.config.irc_host,
+            self.config.irc_port,
+            ssl=self._tls_context() if self.config.irc_tls else None,
+            server_hostname=self.config.irc_host if self.config.irc_tls else None,
+        )
+        writer.write(
+            b"CAP REQ :twitch.tv/tags twitch.tv/commands twitch.tv/membership\r\n"
+            + f"NICK {nick}\r\nUSER {nick} 0 * :{nick}\r\n".encode()
+        )
+        await writer.drain()
+        self._last_rx = time.monotonic()
+        return reader, writer
+
+    @staticmethod
+    def _close(writer: asyncio.StreamWriter) -> None:
+        try:
+            writer.write(b"QUIT :bye\r\n")
+        except Exception:
+            pass
+        writer.close()
+
+    async def _session(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ) -> None:
+        """Run until no channel is wanted (returns) or the link fails (raises)."""
+        tasks = {
+            asyncio.create_task(self._read_lines(reader, writer)),
+            asyncio.create_task(self._follow_channels(writer)),
+        }
+        try:
+            done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            for task in tasks:
+                task.cancel()
+        for task in done:
+            task.result()  # re-raise link errors
+
+    async def _follow_channels(self, writer: asyncio.StreamWriter) -> None:
+        """JOIN/PART as soon as switch_channel changes the wanted set."""
+        if self._changed is None:
+            raise NotImplementedError("_changed should be defined here, but isn't.")
+        joined: set[str] = set()
+        linger = self.config.irc_idle_linger_s
+        while not self._stop_flag:
+            self._changed.clear()
+            wanted = self._wanted_channels()
+            if self._redial or (not wanted and not linger):
+                return
+            for ch in joined.difference(wanted):
+                writer.write(f"PART {ch}\r\n".encode())
+                self.log(f"Parted {ch}")
+            for ch in wanted.difference(joined):
+                writer.write(f"JOIN {ch}\r\n".encode())
+                self.log(f"Joined {ch}")
+            joined = wanted
+            await writer.drain()
+            try:
+                # idle: keep the link warm for irc_idle_linger_s
+                timeout = _SERVER_SILENCE_S if wanted else linger
+                await asyncio.wait_for(self._changed.wait(), timeout)
+            except asyncio.TimeoutError:
+                if not wanted:
+                    return
+                if time.monotonic() - self._last_rx > _SERVER_SILENCE_S:
+                    raise ConnectionError("server went silent") from None
+
+    async def _read_lines(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ) -> None:
+        while True:
+            raw = await reader.readline()
+            if not raw:
+                raise ConnectionError("Connection reset by peer")
+            self._last_rx = time.monotonic()
+            line = raw.decode("utf-8", errors="replace").rstrip("\r\n")
+            if line:
+                spans = profiling.spans
+                if spans is None:
+                    self._handle_line(line, writer)
+                else:
+                    started = time.perf_counter()
+                    self._handle_line(line, writer)
+                    spans.add("irc_loop", time.perf_counter() - started)
+
+    def _handle_line(self, line: str, writer: asyncio.StreamWriter) -> None:
+        fast = parse_privmsg(line)
+        if fast is not None:
+            spans = profiling.spans
+            started = time.perf_counter() if spans is not None else 0.0
+            try:
+                self._ingest(fast.channel, fast.nick, fast.text, fast.tag)
+            except Exception as e:
+                self.log(f"pubmsg parse error: {e}", level="ERROR")
+            if spans is not None:
+                spans.add("on_pubmsg", time.perf_counter() - started)
+            return
+        tags, prefix, command, params = _split_line(line)
+        if command == "PRIVMSG":
+            # CTCP (/me etc.) is not a pubmsg in irc.client either
+            if len(params) < 2 or not params[0].startswith("#"):
+                return
+            if params[1].startswith("\x01"):
+                return
+            nick = prefix.split("!", 1)[0] if prefix else "unknown"
+            try:
+                tag = RawPrivmsg(tags, nick, params[0], params[1]).tag
+                self._ingest(params[0], nick, params[1], tag)
+            except Exception as e:
+                self.log(f"pubmsg parse error: {e}", level="ERROR")
+        elif command in MODERATION_COMMANDS and params:
+            arg = params[1] if len(params) > 1 else None
+            try:
+                tag = RawPrivmsg(tags, "", params[0], "").tag
+                self._moderate(command, params[0], arg, tag)
+            except Exception as e:
+                self.log(f"{command} parse error: {e}", level="ERROR")
+        elif command == "001":
+            tls = writer.get_extra_info("ssl_object")
+            if tls is not None:
+                self._remember_tls_session(tls)
+        elif command == "PING":
+            writer.write(
+                f"PONG :{params[0] if params else 'tmi.twitch.tv'}\r\n".encode()
+            )
+        elif command == "RECONNECT":
+            raise ConnectionError("server requested RECONNECT")
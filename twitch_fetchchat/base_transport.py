@@ -1,7 +1,28 @@
 # SPDX-FileCopyrightText: 2025 Aaron White <w531t4@gmail.com>
 # SPDX-License-Identifier: MIT
+from typing import List
+
+from twitch_fetchchat.message import Batch, Snapshot
 
 
 class _TransportBase:
     def send(self, lines):
         raise NotImplementedError
+
+    def send_batch(self, batch: Batch, lines: Snapshot) -> None:
+        """
+        Batch interface: once per flush, the messages new since the previous
+        call plus the snapshot they end in. Snapshot-only transports keep
+        the default, which sends the snapshot.
+        """
+        self.send(lines)
+
+    def deliver(self, lines: List[str]) -> None:
+        """dispatcher entry point: routes a snapshot through send_batch()"""
+        batch = getattr(lines, "batch", None)
+        if batch is None:
+            batch = Batch("", None)
+        self.send_batch(batch, lines)  # type: ignore[arg-type]
+
+    def close(self) -> None:
+        """release sockets/clients; called once on shutdown"""
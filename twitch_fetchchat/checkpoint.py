@@ -0,0 +1,276 @@
+# SPDX-FileCopyrightText: 2025 Aaron White <w531t4@gmail.com>
+# SPDX-License-Identifier: MIT
+"""
+Buffer checkpoints for warm restarts.
+
+A checkpoint is one file holding the last buffered messages of every channel
+seen within `max_age_s`: a header (magic, save time, payload length, CRC32)
+followed by a zlib-compressed run of channels, each a record header and its
+messages. The file is rewritten whole, atomically (temp file + os.replace),
+at most every `interval_s` and only after the buffers changed; it is read
+once, at startup, and refused beyond _MAX_BYTES so a restore stays bounded.
+"""
+
+import os
+import struct
+import threading
+import time
+import zlib
+from pathlib import Path
+from typing import Callable, Dict, List, NamedTuple, Tuple
+
+from twitch_fetchchat.hasslog import HassLog
+from twitch_fetchchat.message import ChatMessage
+from twitch_fetchchat.metrics import Metrics
+
+# file header: magic, saved unix ms, payload length, payload crc32
+_HEADER = struct.Struct("!4sQII")
+_MAGIC = b"TCK1"
+# channel: last seen unix ms, name length, message count
+_CHANNEL = struct.Struct("!QBH")
+# message: unix s, user/msg/id byte lengths, display row count
+_MESSAGE = struct.Struct("!IBHBB")
+_ROW = struct.Struct("!H")
+# larger files are ignored rather than parsed at startup
+_MAX_BYTES = 4 * 2**20
+
+
+class SavedMessage(NamedTuple):
+    """one buffered chat line as kept in a checkpoint"""
+
+    ts: int
+    user: str
+    msg: str
+    msg_id: str
+    lines: Tuple[str, ...]
+
+
+# channel (without "#") -> (last seen unix ms, messages oldest->newest)
+Saved = Dict[str, Tuple[int, List[SavedMessage]]]
+
+
+def _saved(item: ChatMessage) -> SavedMessage:
+    return SavedMessage(item.ts, item.user, item.msg, item.msg_id, item.lines)
+
+
+def _utf8(text: str, limit: int) -> bytes:
+    return text.encode("utf-8", errors="replace")[:limit]
+
+
+def pack(saved: Saved, now_ms: int) -> bytes:
+    """the checkpoint file for `saved`"""
+    parts = []
+    for channel, (seen_ms, messages) in saved.items():
+        name = _utf8(channel, 0xFF)
+        messages = messages[-0xFFFF:]
+        parts.append(_CHANNEL.pack(seen_ms, len(name), len(messages)))
+        parts.append(name)
+        for m in messages:
+            user = _utf8(m.user, 0xFF)
+            msg = _utf8(m.msg, 0xFFFF)
+            msg_id = _utf8(m.msg_id, 0xFF)
+            rows = [_utf8(line, 0xFFFF) for line in m.lines[:0xFF]]
+            parts.append(
+                _MESSAGE.pack(m.ts, len(user), len(msg), len(msg_id), len(rows))
+            )
+            parts.extend((user, msg, msg_id))
+            for row in rows:
+                parts.append(_ROW.pack(len(row)))
+                parts.append(row)
+    payload = zlib.compress(b"".join(parts), 6)
+    return _HEADER.pack(_MAGIC, now_ms, len(payload), zlib.crc32(payload)) + payload
+
+
+def unpack(data: bytes) -> Saved:
+    """inverse of pack(); ValueError if the file is not a valid checkpoint"""
+    try:
+        magic, _, length, crc = _HEADER.unpack_from(data)
+    except struct.error as e:
+        raise ValueError("truncated checkpoint header") from e
+    payload = data[_HEADER.size : _HEADER.size + length]
+    if magic != _MAGIC or len(payload) != length or zlib.crc32(payload) != crc:
+        raise ValueError("not a checkpoint, or a damaged one")
+    raw = zlib.decompress(payload)
+
+    def text(offset: int, length: int) -> str:
+        return raw[offset : offset + length].decode("utf-8", "replace")
+
+    saved: Saved = {}
+    offset = 0
+    try:
+        while offset < len(raw):
+            seen_ms, n_name, count = _CHANNEL.unpack_from(raw, offset)
+            offset += _CHANNEL.size
+            channel = text(offset, n_name)
+            offset += n_name
+            messages = []
+            for _ in range(count):
+                ts, n_user, n_msg, n_id, n_rows = _MESSAGE.unpack_from(raw, offset)
+                offset += _MESSAGE.size
+                user = text(offset, n_user)
+                offset += n_user
+                msg = text(offset, n_msg)
+                offset += n_msg
+                msg_id = text(offset, n_id)
+                offset += n_id
+                rows = []
+                for _ in range(n_rows):
+                    (length,) = _ROW.unpack_from(raw, offset)
+                    offset += _ROW.size
+                    rows.append(text(offset, length))
+                    offset += length
+                messages.append(SavedMessage(ts, user, msg, msg_id, tuple(rows)))
+            saved[channel] = (seen_ms, messages)
+    except struct.error as e:
+        raise ValueError("truncated checkpoint payload") from e
+    return saved
+
+
+class BufferCheckpoint:
+    """
+    Background, throttled checkpointing of the agent's channel buffers
+    - `mark` only flags a change (safe and cheap on the ingest path)
+    - The writer snapshots the live buffers through `snapshot` and merges
+      them with the channels it still remembers (released or not yet
+      rejoined) until they are `max_age_s` old
+    - `restore` hands back a channel's saved messages when it is rejoined
+    """
+
+    def __init__(
+        self,
+        path: str,
+        logger: HassLog,
+        interval_s: int = 5,
+        max_age_s: int = 3600,
+        metrics: Metrics | None = None,
+    ) -> None:
+        self.path = Path(path)
+        self.log = logger
+        self.interval_s = interval_s
+        self.max_age_s = max_age_s
+        self.metrics = metrics
+        self._saved: Saved = {}
+        self._cond = threading.Condition()
+        self._dirty = False
+        self._stop_flag = False
+        self._thread: threading.Thread | None = None
+        self._snapshot: Callable[[], Dict[str, List[ChatMessage]]] = dict
+        self.written = 0
+
+    # -------------------- Restore --------------------
+    def load(self) -> None:
+        """read the checkpoint file once (bounded by _MAX_BYTES) and time it"""
+        started = time.perf_counter()
+        try:
+            size = self.path.stat().st_size
+            if size > _MAX_BYTES:
+                self.log(
+                    f"checkpoint {self.path} is {size} bytes "
+                    f"(limit {_MAX_BYTES}); ignoring it",
+                    level="WARNING",
+                )
+                return
+            saved = unpack(self.path.read_bytes())
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError, zlib.error) as e:
+            self.log(f"checkpoint {self.path} unreadable: {e}", level="WARNING")
+            return
+        with self._cond:
+            self._saved = self._fresh(saved)
+        elapsed = time.perf_counter() - started
+        if self.metrics is not None:
+            self.metrics.set("checkpoint_load_seconds", elapsed)
+        self.log(
+            f"checkpoint: {sum(len(m) for _, m in self._saved.values())} "
+            f"messages in {len(self._saved)} channels loaded in "
+            f"{1000 * elapsed:.1f} ms"
+        )
+
+    def restore(self, channel: str, limit: int) -> List[SavedMessage]:
+        """the newest `limit` saved messages of `channel` (without "#")"""
+        with self._cond:
+            seen_ms, messages = self._saved.get(channel, (0, []))
+        if seen_ms < self._now_ms() - 1000 * self.max_age_s:
+            return []
+        return messages[-limit:]
+
+    # -------------------- Checkpointing --------------------
+    def start(self, snapshot: Callable[[], Dict[str, List[ChatMessage]]]) -> None:
+        """start the writer; `snapshot` returns the live buffers by channel"""
+        if self._thread:
+            return
+        self._snapshot = snapshot
+        self._stop_flag = False
+        self._thread = threading.Thread(
+            target=self._run, name="checkpoint", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self) -> None:
+        """write a final checkpoint and stop the writer"""
+        with self._cond:
+            self._stop_flag = True
+            self._cond.notify()
+        if self._thread:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    def mark(self) -> None:
+        """note that the buffers changed (call after changing them)"""
+        if not self._dirty:
+            with self._cond:
+                self._dirty = True
+                self._cond.notify()
+
+    def keep(self, channel: str, messages: List[ChatMessage]) -> None:
+        """remember a buffer the agent is dropping (channel released)"""
+        with self._cond:
+            self._saved[channel] = (self._now_ms(), [_saved(m) for m in messages])
+            self._dirty = True
+            self._cond.notify()
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                while not self._dirty and not self._stop_flag:
+                    self._cond.wait()
+                stopping = self._stop_flag
+                self._dirty = False
+            self._write()
+            if stopping:
+                return
+            with self._cond:  # throttle: at most one write per interval
+                self._cond.wait_for(lambda: self._stop_flag, self.interval_s)
+
+    def _write(self) -> None:
+        live = self._snapshot()
+        now_ms = self._now_ms()
+        with self._cond:
+            for channel, messages in live.items():
+                self._saved[channel] = (now_ms, [_saved(m) for m in messages])
+            self._saved = self._fresh(self._saved)
+            data = pack(self._saved, now_ms)
+        tmp = self.path.with_name(f"{self.path.name}.tmp")
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            with open(tmp, "wb") as f:
+                f.write(data)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp, self.path)
+        except OSError as e:
+            self.log(f"checkpoint write error: {e}", level="ERROR")
+            return
+        self.written += 1
+        if self.metrics is not None:
+            self.metrics.inc("checkpoint_writes_total")
+
+    def _fresh(self, saved: Saved) -> Saved:
+        """`saved` without channels last seen more than max_age_s ago"""
+        oldest = self._now_ms() - 1000 * self.max_age_s
+        return {ch: entry for ch, entry in saved.items() if entry[0] >= oldest}
+
+    @staticmethod
+    def _now_ms() -> int:
+        return time.time_ns() // 1_000_000
@@ -1,7 +1,11 @@
 # SPDX-FileCopyrightText: 2025 Aaron White <w531t4@gmail.com>
 # SPDX-License-Identifier: MIT
-from typing import List, Any
-from dataclasses import dataclass, field
+from typing import Dict, List, Any, Tuple
+from dataclasses import dataclass, field, fields, replace
+import ipaddress
+import os
+
+from twitch_fetchchat.filters import PRIORITY_CLASSES
 
 
 # Strings
@@ -45,6 +49,80 @@ def validate_is_bool(field_name: str, data: Any) -> None:
         raise ValueError(f"{field_name} expects type=bool. observed={type(data)}")
 
 
+# Per-sink settings
+SINK_KEYS = [
+    "udp_hosts",
+    "udp_port",
+    "udp_line_max_chars",
+    "udp_frame",
+    "udp_skip_unchanged",
+    "udp_resolve_ttl_s",
+    "udp_fail_threshold",
+    "udp_suppress_s",
+    "mqtt_base_topic",
+    "mqtt_retain",
+    "mqtt_delta",
+    "mqtt_append",
+    "mqtt_batch",
+    "mqtt_qos",
+    "mqtt_client",
+    "mqtt_broker_host",
+    "mqtt_broker_port",
+    "mqtt_username",
+    "mqtt_password",
+    "ha_entity_id",
+    "ha_skip_unchanged",
+    "ha_min_interval_ms",
+    "ha_event",
+    "sub_port",
+    "sub_bind",
+    "sub_allow",
+    "sub_lease_s",
+    "sub_max_clients",
+]
+
+# The per-sink settings each transport_mode is built from
+MODE_SINK_KEYS = {
+    "udp": [key for key in SINK_KEYS if key.startswith("udp_")],
+    "mqtt": [key for key in SINK_KEYS if key.startswith("mqtt_")],
+    "subscribe": [key for key in SINK_KEYS if key.startswith("sub_")]
+    + ["udp_line_max_chars", "udp_frame"],
+    "ha": [key for key in SINK_KEYS if key.startswith("ha_")],
+}
+
+# Settings a `transports` entry may carry for its own sink
+TRANSPORT_KEYS = ["type", "name"] + SINK_KEYS
+
+# Settings a `displays` entry may override for its own output
+DISPLAY_KEYS = [
+    "channel_entity_id",
+    "transport_mode",
+    "transports",
+    "max_messages",
+] + SINK_KEYS
+
+# Settings a reload can only apply by building a new agent
+RESTART_KEYS = [
+    "irc_engine",
+    "irc_shards",
+    "irc_fast_parse",
+    "record_dir",
+    "record_segment_mb",
+    "record_segment_s",
+    "record_max_segments",
+    "checkpoint_path",
+    "checkpoint_interval_s",
+    "checkpoint_max_age_s",
+    "replay_dir",
+    "replay_speed",
+    "replay_loop",
+    "metrics_enabled",
+]
+
+# Settings a reload applies by reconnecting (everything else is live)
+RECONNECT_KEYS = ["irc_host", "irc_port", "irc_tls", "irc_tls_ca_file"]
+
+
 @dataclass(kw_only=True)
 class IrcBridgeConfig:
     """Config for IrcBridge"""
@@ -52,15 +130,78 @@ class IrcBridgeConfig:
     entity_id: str
     transport_mode: str = field(default="ha")
     max_messages: int = field(default=3)
+    batch_backlog: int = field(default=0)
     irc_host: str = field(default="irc.chat.twitch.tv")
     irc_port: int = field(default=6697)
+    irc_tls: bool = field(default=True)
+    irc_tls_ca_file: str = field(default="")
     reconnect_delay_s: int = field(default=5)
+    irc_idle_linger_s: int = field(default=0)
+    irc_engine: str = field(default="thread")
+    irc_fast_parse: bool = field(default=False)
+    irc_shards: int = field(default=0)
+    record_dir: str = field(default="")
+    record_segment_mb: int = field(default=16)
+    record_segment_s: int = field(default=3600)
+    record_max_segments: int = field(default=0)
+    checkpoint_path: str = field(default="")
+    checkpoint_interval_s: int = field(default=5)
+    checkpoint_max_age_s: int = field(default=3600)
+    replay_dir: str = field(default="")
+    replay_speed: int = field(default=1)
+    replay_loop: bool = field(default=False)
+    filter_max_lines_per_s: int = field(default=0)
+    filter_dedup_size: int = field(default=0)
+    filter_dedup_window_s: int = field(default=30)
+    filter_priority: List[str] = field(default_factory=list)
+    filter_blocklist: List[str] = field(default_factory=list)
+    render_width: int = field(default=0)
+    render_wrap: bool = field(default=False)
+    render_strip_emotes: bool = field(default=False)
+    render_ascii: bool = field(default=False)
     udp_hosts: List[str] = field(default_factory=list)
     udp_port: int = field(default=7777)
     udp_line_max_chars: int = field(default=160)
+    udp_frame: str = field(default="text")
+    udp_skip_unchanged: bool = field(default=False)
+    udp_resolve_ttl_s: int = field(default=300)
+    udp_fail_threshold: int = field(default=3)
+    udp_suppress_s: int = field(default=30)
     mqtt_base_topic: str = field(default="twitch_chat")
     mqtt_retain: bool = field(default=True)
+    mqtt_delta: bool = field(default=False)
+    mqtt_append: bool = field(default=False)
+    mqtt_batch: bool = field(default=False)
+    mqtt_qos: int = field(default=0)
+    mqtt_client: str = field(default="ha")
+    mqtt_broker_host: str = field(default="localhost")
+    mqtt_broker_port: int = field(default=1883)
+    mqtt_username: str = field(default="")
+    mqtt_password: str = field(default="")
     ha_entity_id: str = field(default="sensor.twitch_chat_bridge")
+    ha_skip_unchanged: bool = field(default=False)
+    ha_min_interval_ms: int = field(default=0)
+    ha_event: str = field(default="")
+    sub_port: int = field(default=7778)
+    sub_bind: str = field(default="127.0.0.1")
+    sub_allow: List[str] = field(default_factory=list)
+    sub_lease_s: int = field(default=60)
+    sub_max_clients: int = field(default=64)
+    emit_max_rate_hz: int = field(default=0)
+    emit_quiet_ms: int = field(default=0)
+    dispatch_queue_size: int = field(default=8)
+    dispatch_policy: str = field(default="replace_pending")
+    dispatch_late_ms: int = field(default=1000)
+    metrics_enabled: bool = field(default=False)
+    metrics_entity_id: str = field(default="sensor.twitch_chat_bridge_metrics")
+    metrics_interval_s: int = field(default=30)
+    metrics_port: int = field(default=0)
+    metrics_bind: str = field(default="127.0.0.1")
+    profile_dir: str = field(default="")
+    profile_seconds: int = field(default=30)
+    profile_sample_ms: int = field(default=5)
+    transports: List[Dict[str, Any]] = field(default_factory=list)
+    displays: List[Dict[str, Any]] = field(default_factory=list)
 
     def __post_init__(self):
         # entity_id
@@ -70,9 +211,9 @@ class IrcBridgeConfig:
         # transport_mode
         validate_is_str("transport_mode", self.transport_mode)
         self.transport_mode = self.transport_mode.lower()
-        if not self.transport_mode in ["ha", "udp", "mqtt"]:
+        if not self.transport_mode in ["ha", "udp", "mqtt", "subscribe"]:
             raise ValueError(
-                f"transport_mode expects one of [ha, udp, mqtt]. "
+                f"transport_mode expects one of [ha, udp, mqtt, subscribe]. "
                 f"observed={self.transport_mode}"
             )
 
@@ -80,6 +221,10 @@ class IrcBridgeConfig:
         validate_is_int("max_messages", self.max_messages)
         validate_positive("max_messages", self.max_messages)
 
+        # batch_backlog
+        validate_is_int("batch_backlog", self.batch_backlog)
+        validate_positive("batch_backlog", self.batch_backlog)
+
         # irc_host
         validate_is_str("irc_host", self.irc_host)
         validate_strlen_gt_zero("irc_host", self.irc_host)
@@ -88,10 +233,113 @@ class IrcBridgeConfig:
         validate_is_int("irc_port", self.irc_port)
         validate_port("irc_port", self.irc_port)
 
+        # irc_tls / irc_tls_ca_file
+        validate_is_bool("irc_tls", self.irc_tls)
+        validate_is_str("irc_tls_ca_file", self.irc_tls_ca_file)
+
         # reconnect_delay_s
         validate_is_int("reconnect_delay_s", self.reconnect_delay_s)
         validate_positive("reconnect_delay_s", self.reconnect_delay_s)
 
+        # irc_idle_linger_s
+        validate_is_int("irc_idle_linger_s", self.irc_idle_linger_s)
+        validate_positive("irc_idle_linger_s", self.irc_idle_linger_s)
+
+        # irc_engine
+        validate_is_str("irc_engine", self.irc_engine)
+        self.irc_engine = self.irc_engine.lower()
+        if not self.irc_engine in ["thread", "asyncio", "replay"]:
+            raise ValueError(
+                f"irc_engine expects one of [thread, asyncio, replay]. "
+                f"observed={self.irc_engine}"
+            )
+
+        # irc_fast_parse
+        validate_is_bool("irc_fast_parse", self.irc_fast_parse)
+
+        # irc_shards
+        validate_is_int("irc_shards", self.irc_shards)
+        validate_positive("irc_shards", self.irc_shards)
+
+        # record_*
+        validate_is_str("record_dir", self.record_dir)
+        validate_is_int("record_segment_mb", self.record_segment_mb)
+        validate_positive("record_segment_mb", self.record_segment_mb)
+        validate_is_int("record_segment_s", self.record_segment_s)
+        validate_positive("record_segment_s", self.record_segment_s)
+        validate_is_int("record_max_segments", self.record_max_segments)
+        validate_positive("record_max_segments", self.record_max_segments)
+
+        # checkpoint_*
+        validate_is_str("checkpoint_path", self.checkpoint_path)
+        validate_is_int("checkpoint_interval_s", self.checkpoint_interval_s)
+        validate_positive("checkpoint_interval_s", self.checkpoint_interval_s)
+        validate_is_int("checkpoint_max_age_s", self.checkpoint_max_age_s)
+        validate_positive("checkpoint_max_age_s", self.checkpoint_max_age_s)
+
+        # replay_*
+        validate_is_str("replay_dir", self.replay_dir)
+        validate_is_int("replay_speed", self.replay_speed)
+        validate_positive("replay_speed", self.replay_speed)
+        validate_is_bool("replay_loop", self.replay_loop)
+        if self.irc_engine == "replay":
+            validate_strlen_gt_zero("replay_dir", self.replay_dir)
+            if self.record_dir and os.path.realpath(
+                self.record_dir
+            ) == os.path.realpath(self.replay_dir):
+                raise ValueError(
+                    f"record_dir must differ from replay_dir. observed={self.record_dir}"
+                )
+
+        # filter_*
+        validate_is_int("filter_max_lines_per_s", self.filter_max_lines_per_s)
+        validate_positive("filter_max_lines_per_s", self.filter_max_lines_per_s)
+        validate_is_int("filter_dedup_size", self.filter_dedup_size)
+        validate_positive("filter_dedup_size", self.filter_dedup_size)
+        validate_is_int("filter_dedup_window_s", self.filter_dedup_window_s)
+        validate_positive("filter_dedup_window_s", self.filter_dedup_window_s)
+        for key in ["filter_priority", "filter_blocklist"]:
+            if isinstance(getattr(self, key), str):
+                setattr(self, key, [getattr(self, key)])
+            if not isinstance(getattr(self, key), list):
+                raise TypeError(
+                    f"{key} must be of type list or str. "
+                    f"observed={type(getattr(self, key))}"
+                )
+            for i, item in enumerate(getattr(self, key)):
+                validate_is_str(f"{key}[{i}]", item)
+        self.filter_priority = [p.lower() for p in self.filter_priority]
+        unknown = set(self.filter_priority).difference(PRIORITY_CLASSES)
+        if unknown:
+            raise ValueError(
+                f"filter_priority keys must be within {PRIORITY_CLASSES}. "
+                f"observed={sorted(unknown)}"
+            )
+
+        # render_*
+        validate_is_int("render_width", self.render_width)
+        validate_positive("render_width", self.render_width)
+        validate_is_bool("render_wrap", self.render_wrap)
+        validate_is_bool("render_strip_emotes", self.render_strip_emotes)
+        validate_is_bool("render_ascii", self.render_ascii)
+
+        # irc_shards > 1 runs one agent per worker process
+        if self.irc_shards > 1:
+            if self.irc_engine == "replay":
+                raise ValueError(
+                    f"irc_shards expects irc_engine thread or asyncio. "
+                    f"observed={self.irc_engine}"
+                )
+            if self.record_dir:
+                raise ValueError(
+                    f"record_dir expects irc_shards <= 1. observed={self.irc_shards}"
+                )
+            if self.checkpoint_path:
+                raise ValueError(
+                    f"checkpoint_path expects irc_shards <= 1. "
+                    f"observed={self.irc_shards}"
+                )
+
         # udp_hosts
         if not isinstance(self.udp_hosts, (list, str)):
             raise TypeError(
@@ -112,6 +360,25 @@ class IrcBridgeConfig:
         validate_is_int("udp_line_max_chars", self.udp_line_max_chars)
         validate_positive("udp_line_max_chars", self.udp_line_max_chars)
 
+        # udp_frame
+        validate_is_str("udp_frame", self.udp_frame)
+        self.udp_frame = self.udp_frame.lower()
+        if not self.udp_frame in ["text", "v1"]:
+            raise ValueError(
+                f"udp_frame expects one of [text, v1]. observed={self.udp_frame}"
+            )
+
+        # udp_skip_unchanged
+        validate_is_bool("udp_skip_unchanged", self.udp_skip_unchanged)
+
+        # udp_resolve_ttl_s / udp_fail_threshold / udp_suppress_s
+        validate_is_int("udp_resolve_ttl_s", self.udp_resolve_ttl_s)
+        validate_positive("udp_resolve_ttl_s", self.udp_resolve_ttl_s)
+        validate_is_int("udp_fail_threshold", self.udp_fail_threshold)
+        validate_positive("udp_fail_threshold", self.udp_fail_threshold)
+        validate_is_int("udp_suppress_s", self.udp_suppress_s)
+        validate_positive("udp_suppress_s", self.udp_suppress_s)
+
         # mqtt_base_topic
         validate_is_str("mqtt_base_topic", self.mqtt_base_topic)
         validate_strlen_gt_zero("mqtt_base_topic", self.mqtt_base_topic)
@@ -119,6 +386,241 @@ class IrcBridgeConfig:
         # mqtt_retain
         validate_is_bool("mqtt_retain", self.mqtt_retain)
 
-        # ha_entity_id
+        # mqtt_delta / mqtt_append / mqtt_batch
+        validate_is_bool("mqtt_delta", self.mqtt_delta)
+        validate_is_bool("mqtt_append", self.mqtt_append)
+        validate_is_bool("mqtt_batch", self.mqtt_batch)
+
+        # mqtt_qos
+        validate_is_int("mqtt_qos", self.mqtt_qos)
+        if not self.mqtt_qos in [0, 1, 2]:
+            raise ValueError(
+                f"mqtt_qos expects one of [0, 1, 2]. observed={self.mqtt_qos}"
+            )
+
+        # mqtt_client
+        validate_is_str("mqtt_client", self.mqtt_client)
+        self.mqtt_client = self.mqtt_client.lower()
+        if not self.mqtt_client in ["ha", "direct"]:
+            raise ValueError(
+                f"mqtt_client expects one of [ha, direct]. observed={self.mqtt_client}"
+            )
+
+        # mqtt_broker_host / mqtt_broker_port
+        validate_is_str("mqtt_broker_host", self.mqtt_broker_host)
+        validate_strlen_gt_zero("mqtt_broker_host", self.mqtt_broker_host)
+        validate_is_int("mqtt_broker_port", self.mqtt_broker_port)
+        validate_port("mqtt_broker_port", self.mqtt_broker_port)
+
+        # mqtt_username / mqtt_password
+        validate_is_str("mqtt_username", self.mqtt_username)
+        validate_is_str("mqtt_password", self.mqtt_password)
+
+        # ha_*
         validate_is_str("ha_entity_id", self.ha_entity_id)
         validate_strlen_gt_zero("ha_entity_id", self.ha_entity_id)
+        validate_is_bool("ha_skip_unchanged", self.ha_skip_unchanged)
+        validate_is_int("ha_min_interval_ms", self.ha_min_interval_ms)
+        validate_positive("ha_min_interval_ms", self.ha_min_interval_ms)
+        validate_is_str("ha_event", self.ha_event)
+
+        # sub_*
+        validate_is_int("sub_port", self.sub_port)
+        validate_port("sub_port", self.sub_port)
+        validate_is_str("sub_bind", self.sub_bind)
+        validate_strlen_gt_zero("sub_bind", self.sub_bind)
+        if not isinstance(self.sub_allow, (list, str)):
+            raise TypeError(
+                f"sub_allow must be of type list or str. "
+                f"observed={type(self.sub_allow)}"
+            )
+        if isinstance(self.sub_allow, str):
+            self.sub_allow = [self.sub_allow]
+        for i, item in enumerate(self.sub_allow):
+            validate_is_str(f"sub_allow[{i}]", item)
+            try:
+                ipaddress.ip_network(item, strict=False)
+            except ValueError as e:
+                raise ValueError(
+                    f"sub_allow[{i}] expects an address or CIDR. observed={item}"
+                ) from e
+        validate_is_int("sub_lease_s", self.sub_lease_s)
+        validate_positive("sub_lease_s", self.sub_lease_s)
+        validate_is_int("sub_max_clients", self.sub_max_clients)
+        validate_positive("sub_max_clients", self.sub_max_clients)
+
+        # emit_max_rate_hz
+        validate_is_int("emit_max_rate_hz", self.emit_max_rate_hz)
+        validate_positive("emit_max_rate_hz", self.emit_max_rate_hz)
+
+        # emit_quiet_ms
+        validate_is_int("emit_quiet_ms", self.emit_quiet_ms)
+        validate_positive("emit_quiet_ms", self.emit_quiet_ms)
+
+        # dispatch_queue_size
+        validate_is_int("dispatch_queue_size", self.dispatch_queue_size)
+        validate_positive("dispatch_queue_size", self.dispatch_queue_size)
+
+        # dispatch_policy
+        validate_is_str("dispatch_policy", self.dispatch_policy)
+        self.dispatch_policy = self.dispatch_policy.lower()
+        if not self.dispatch_policy in ["replace_pending", "drop_oldest"]:
+            raise ValueError(
+                f"dispatch_policy expects one of [replace_pending, drop_oldest]. "
+                f"observed={self.dispatch_policy}"
+            )
+
+        # dispatch_late_ms
+        validate_is_int("dispatch_late_ms", self.dispatch_late_ms)
+        validate_positive("dispatch_late_ms", self.dispatch_late_ms)
+
+        # metrics_*
+        validate_is_bool("metrics_enabled", self.metrics_enabled)
+        validate_is_str("metrics_entity_id", self.metrics_entity_id)
+        validate_strlen_gt_zero("metrics_entity_id", self.metrics_entity_id)
+        validate_is_int("metrics_interval_s", self.metrics_interval_s)
+        validate_positive("metrics_interval_s", self.metrics_interval_s)
+        validate_is_int("metrics_port", self.metrics_port)
+        validate_port("metrics_port", self.metrics_port)
+        validate_is_str("metrics_bind", self.metrics_bind)
+        validate_strlen_gt_zero("metrics_bind", self.metrics_bind)
+
+        # profile_*
+        validate_is_str("profile_dir", self.profile_dir)
+        validate_is_int("profile_seconds", self.profile_seconds)
+        validate_positive("profile_seconds", self.profile_seconds)
+        if self.profile_seconds == 0:
+            raise ValueError("profile_seconds expects > 0. observed=0")
+        validate_is_int("profile_sample_ms", self.profile_sample_ms)
+        validate_positive("profile_sample_ms", self.profile_sample_ms)
+        if self.profile_sample_ms == 0:
+            raise ValueError("profile_sample_ms expects > 0. observed=0")
+
+        # transports
+        if not isinstance(self.transports, list):
+            raise TypeError(
+                f"transports must be of type list. observed={type(self.transports)}"
+            )
+        for i, item in enumerate(self.transports):
+            if not isinstance(item, dict):
+                raise TypeError(
+                    f"transports[{i}] must be of type dict. observed={type(item)}"
+                )
+            if "type" not in item:
+                raise ValueError(f"transports[{i}] requires type")
+            unknown = set(item).difference(TRANSPORT_KEYS)
+            if unknown:
+                raise ValueError(
+                    f"transports[{i}] keys must be within {TRANSPORT_KEYS}. "
+                    f"observed={sorted(unknown)}"
+                )
+            if "name" in item:
+                validate_is_str(f"transports[{i}].name", item["name"])
+                validate_strlen_gt_zero(f"transports[{i}].name", item["name"])
+        if self.transports:
+            # validates every transport's merged settings
+            names = [name for name, _ in self.transport_configs()]
+            if len(set(names)) != len(names):
+                raise ValueError(
+                    f"transports expects unique name values. observed={names}"
+                )
+
+        # displays
+        if not isinstance(self.displays, list):
+            raise TypeError(
+                f"displays must be of type list. observed={type(self.displays)}"
+            )
+        for i, item in enumerate(self.displays):
+            if not isinstance(item, dict):
+                raise TypeError(
+                    f"displays[{i}] must be of type dict. observed={type(item)}"
+                )
+            if "channel_entity_id" not in item:
+                raise ValueError(f"displays[{i}] requires channel_entity_id")
+            unknown = set(item).difference(DISPLAY_KEYS)
+            if unknown:
+                raise ValueError(
+                    f"displays[{i}] keys must be within {DISPLAY_KEYS}. "
+                    f"observed={sorted(unknown)}"
+                )
+        if self.displays:
+            # validates every display's merged settings
+            entity_ids = [cfg.entity_id for cfg in self.display_configs()]
+            if len(set(entity_ids)) != len(entity_ids):
+                raise ValueError(
+                    f"displays expects unique channel_entity_id values. "
+                    f"observed={entity_ids}"
+                )
+
+        # every subscribe server binds its own socket (sub_port 0 picks a free one)
+        servers = [
+            (tcfg.sub_bind, tcfg.sub_port)
+            for cfg in (self.display_configs() if self.displays else [self])
+            for _, tcfg in cfg.transport_configs()
+            if tcfg.transport_mode == "subscribe" and tcfg.sub_port
+        ]
+        binds: Dict[int, List[str]] = {}
+        for bind, port in servers:
+            taken = binds.setdefault(port, [])
+            if bind in taken or (taken and "0.0.0.0" in (bind, *taken)):
+                raise ValueError(
+                    f"subscribe transports expect unique sub_bind/sub_port "
+                    f"pairs. observed={servers}"
+                )
+            taken.append(bind)
+
+    def changed_fields(self, other: "IrcBridgeConfig") -> List[str]:
+        """names of the settings whose values differ in `other`"""
+        return [
+            f.name
+            for f in fields(self)
+            if getattr(self, f.name) != getattr(other, f.name)
+        ]
+
+    def sink_settings(self) -> Dict[str, Any]:
+        """what a transport built from this config depends on"""
+        keys = MODE_SINK_KEYS.get(self.transport_mode, SINK_KEYS)
+        return {
+            "transport_mode": self.transport_mode,
+            **{key: getattr(self, key) for key in keys},
+        }
+
+    def transport_configs(self) -> List[Tuple[str, "IrcBridgeConfig"]]:
+        """
+        (name, config) per transport. Without a `transports` list this is the
+        single `transport_mode` sink; otherwise each entry's `type` becomes
+        its transport_mode and the settings it names override the top level.
+        """
+        if not self.transports:
+            return [(self.transport_mode, self)]
+        out = []
+        for i, item in enumerate(self.transports):
+            overrides = dict(item)
+            mode = overrides.pop("type")
+            name = overrides.pop("name", f"{str(mode).lower()}{i}")
+            out.append(
+                (
+                    name,
+                    replace(
+                        self,
+                        transport_mode=mode,
+                        transports=[],
+                        displays=[],
+                        **overrides,
+                    ),
+                )
+            )
+        return out
+
+    def display_configs(self) -> List["IrcBridgeConfig"]:
+        """
+        One config per display, the top-level block being the first.
+        Each `displays` entry overrides the top-level settings it names.
+        """
+        base = replace(self, displays=[])
+        out: List["IrcBridgeConfig"] = [base]
+        for item in self.displays:
+            overrides = dict(item)
+            overrides["entity_id"] = overrides.pop("channel_entity_id")
+            out.append(replace(base, **overrides))
+        return out
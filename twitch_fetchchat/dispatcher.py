@@ -0,0 +1,218 @@
+# SPDX-FileCopyrightText: 2025 Aaron White <w531t4@gmail.com>
+# SPDX-License-Identifier: MIT
+import threading
+import time
+from collections import deque
+from functools import partial
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+from twitch_fetchchat import profiling
+from twitch_fetchchat.hasslog import HassLog
+from twitch_fetchchat.message import Snapshot
+from twitch_fetchchat.metrics import Metrics
+
+
+def carry_batch(older: List[str], newer: List[str]) -> List[str]:
+    """
+    `newer` with the batch of the evicted frame `older` folded in, so batch
+    transports still see every message when the queue coalesces frames.
+    """
+    batch = getattr(older, "batch", None)
+    if batch is None or not (batch.messages or batch.dropped):
+        return newer
+    later = getattr(newer, "batch", None)
+    data = getattr(newer, "data", None) or [
+        (l or "").encode("utf-8", errors="replace") for l in newer
+    ]
+    return Snapshot(newer, data, batch if later is None else batch.merge(later))
+
+
+class _DispatchWorker:
+    """
+    One thread + bounded queue in front of a single transport send()
+    (queue_size 0 sends inline on the caller's thread instead).
+    """
+
+    def __init__(
+        self,
+        name: str,
+        send: Callable[[List[str]], None],
+        logger: HassLog,
+        queue_size: int,
+        policy: str,
+        late_ms: int,
+        metrics: Optional[Metrics] = None,
+    ) -> None:
+        self.name = name
+        self.log = logger
+        self.metrics = metrics
+        self._send = send
+        self._late_s = late_ms / 1000.0
+        self._inline = queue_size == 0
+        # replace_pending keeps at most one frame waiting; newer frames win
+        maxlen = 1 if policy == "replace_pending" else queue_size
+        self._queue: deque[Tuple[float, List[str]]] = deque(maxlen=maxlen)
+        self._cond = threading.Condition()
+        self._stop_flag = False
+        self._thread = threading.Thread(
+            target=self._run, name=f"dispatch-{name}", daemon=True
+        )
+
+        # -------- Counters --------
+        self.submitted = 0
+        self.sent = 0
+        self.dropped = 0
+        self.late = 0
+        self.errors = 0
+        self.send_s_total = 0.0
+        self.send_s_max = 0.0
+        self.send_s_last = 0.0
+
+    def start(self) -> None:
+        """start the worker thread"""
+        if not self._inline and not self._thread.is_alive():
+            self._thread.start()
+
+    def stop(self) -> None:
+        """stop the worker thread; queued frames are discarded"""
+        with self._cond:
+            self._stop_flag = True
+            self._cond.notify()
+
+    def submit(self, lines: List[str]) -> None:
+        """Queue a frame without blocking; evicts the oldest when full."""
+        if self._stop_flag:
+            return  # retired (e.g. replaced by a config reload)
+        if self._inline:
+            with self._cond:
+                self.submitted += 1
+            self._deliver(time.monotonic(), lines)
+            return
+        with self._cond:
+            self.submitted += 1
+            if len(self._queue) == self._queue.maxlen:
+                self.dropped += 1
+                if self.metrics is not None:
+                    self.metrics.inc("transport_dropped_total", transport=self.name)
+                # the evicted frame's new messages ride along with the next one
+                _, evicted = self._queue.popleft()
+                if self._queue:
+                    queued_at, following = self._queue[0]
+                    self._queue[0] = (queued_at, carry_batch(evicted, following))
+                else:
+                    lines = carry_batch(evicted, lines)
+            self._queue.append((time.monotonic(), lines))
+            self._cond.notify()
+
+    def stats(self) -> Dict[str, int | float]:
+        """counter and send-timing snapshot"""
+        with self._cond:
+            calls = self.sent + self.errors
+            return {
+                "submitted": self.submitted,
+                "sent": self.sent,
+                "dropped": self.dropped,
+                "late": self.late,
+                "errors": self.errors,
+                "depth": len(self._queue),
+                "send_ms_avg": round(1000 * self.send_s_total / max(calls, 1), 3),
+                "send_ms_max": round(1000 * self.send_s_max, 3),
+                "send_ms_last": round(1000 * self.send_s_last, 3),
+            }
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                while not self._queue and not self._stop_flag:
+                    self._cond.wait()
+                if self._stop_flag:
+                    return
+                queued_at, lines = self._queue.popleft()
+            self._deliver(queued_at, lines)
+
+    def _deliver(self, queued_at: float, lines: List[str]) -> None:
+        started = time.monotonic()
+        try:
+            self._send(lines)
+            ok = True
+        except Exception as e:
+            ok = False
+            self.log(f"Transport send error ({self.name}): {e}", level="ERROR")
+        took = time.monotonic() - started
+        late = started - queued_at > self._late_s
+        spans = profiling.spans
+        if spans is not None:
+            spans.add(f"send:{self.name}", took)
+        with self._cond:
+            self.sent += ok
+            self.errors += not ok
+            self.late += late
+            self.send_s_total += took
+            self.send_s_last = took
+            self.send_s_max = max(self.send_s_max, took)
+        if self.metrics is not None:
+            self.metrics.observe("transport_send_seconds", took, transport=self.name)
+            if not ok:
+                self.metrics.inc("transport_send_errors_total", transport=self.name)
+            if late:
+                self.metrics.inc("transport_late_total", transport=self.name)
+
+
+class TransportDispatcher:
+    """
+    Moves transport sends off the IRC thread
+    - One worker per transport: sinks send in parallel, so a slow sink never
+      stalls the reactor or adds its latency to the others
+    - Bounded queues: `replace_pending` keeps only the newest frame,
+      `drop_oldest` keeps up to `queue_size` frames; 0 sends inline. A
+      dropped frame's batch of new messages is merged into the next frame
+    - Frames waiting longer than `late_ms` before their send are counted late
+    """
+
+    def __init__(
+        self,
+        logger: HassLog,
+        targets: Sequence[Tuple[str, Callable[[List[str]], None]]],
+        queue_size: int = 8,
+        policy: str = "replace_pending",
+        late_ms: int = 1000,
+        metrics: Optional[Metrics] = None,
+    ) -> None:
+        self.log = logger
+        self.metrics = metrics
+        self._workers = [
+            _DispatchWorker(name, send, logger, queue_size, policy, late_ms, metrics)
+            for name, send in targets
+        ]
+        self._collector: Callable[[], None] | None = None
+        if metrics is not None:
+            self._collector = partial(self._collect, metrics)
+            metrics.add_collector(self._collector)
+
+    def start(self) -> None:
+        """start all workers"""
+        for worker in self._workers:
+            worker.start()
+
+    def stop(self) -> None:
+        """stop all workers"""
+        for worker in self._workers:
+            worker.stop()
+        if self.metrics is not None and self._collector is not None:
+            self.metrics.remove_collector(self._collector)
+
+    def submit(self, lines: List[str]) -> None:
+        """emit_target for IRCAgent; never blocks on downstream I/O"""
+        for worker in self._workers:
+            worker.submit(lines)
+
+    def stats(self) -> Dict[str, Dict[str, int | float]]:
+        """per-transport counters keyed by worker name"""
+        return {worker.name: worker.stats() for worker in self._workers}
+
+    def _collect(self, metrics: Metrics) -> None:
+        """metrics collector: queue depths at read time"""
+        for worker in self._workers:
+            metrics.set(
+                "transport_queue_depth", len(worker._queue), transport=worker.name
+            )
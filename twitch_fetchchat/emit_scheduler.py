@@ -0,0 +1,87 @@
+# SPDX-FileCopyrightText: 2025 Aaron White <w531t4@gmail.com>
+# SPDX-License-Identifier: MIT
+import threading
+import time
+from typing import Callable, Set
+
+from twitch_fetchchat.hasslog import HassLog
+
+
+class EmitScheduler:
+    """
+    Coalesces emit requests into at most `max_rate_hz` flushes per second.
+    - Requests are keyed (one key per display); a flush covers every dirty key
+    - Latest wins: a flush renders whatever the buffer holds at flush time
+    - Trailing flush: once a burst goes quiet for `quiet_ms` (or the rate
+      window runs out) the final state is always emitted
+    """
+
+    def __init__(
+        self,
+        flush: Callable[[str], None],
+        logger: HassLog,
+        max_rate_hz: int,
+        quiet_ms: int = 0,
+    ) -> None:
+        self.log = logger
+        self._flush = flush
+        self._interval = 1.0 / max_rate_hz
+        self._quiet = quiet_ms / 1000.0
+        self._cond = threading.Condition()
+        self._thread: threading.Thread | None = None
+        self._pending: Set[str] = set()
+        self._stop_flag = False
+        self._first_request = 0.0
+        self._last_request = 0.0
+        self._last_flush = 0.0
+
+    def start(self) -> None:
+        """start the flush thread"""
+        if not self._thread:
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+
+    def stop(self) -> None:
+        """stop the flush thread; pending requests are discarded"""
+        with self._cond:
+            self._stop_flag = True
+            self._cond.notify()
+
+    def request(self, key: str) -> None:
+        """Mark `key` dirty; cheap enough to call once per chat line."""
+        now = time.monotonic()
+        with self._cond:
+            self._last_request = now
+            if not self._pending:
+                # Later requests only ever push the deadline out, so the
+                # flush thread needs waking on the idle->pending edge alone.
+                self._first_request = now
+                self._cond.notify()
+            self._pending.add(key)
+
+    def _due(self) -> float:
+        settled = min(
+            self._last_request + self._quiet, self._first_request + self._interval
+        )
+        return max(self._last_flush + self._interval, settled)
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                while not self._stop_flag:
+                    if not self._pending:
+                        self._cond.wait()
+                        continue
+                    delay = self._due() - time.monotonic()
+                    if delay <= 0:
+                        break
+                    self._cond.wait(delay)
+                if self._stop_flag:
+                    return
+                keys, self._pending = self._pending, set()
+                self._last_flush = time.monotonic()
+            for key in keys:
+                try:
+                    self._flush(key)
+                except Exception as e:
+                    self.log(f"Emit flush error ({key}): {e}", level="ERROR")
@@ -0,0 +1,93 @@
+# SPDX-FileCopyrightText: 2025 Aaron White <w531t4@gmail.com>
+# SPDX-License-Identifier: MIT
+from typing import Dict, NamedTuple, Optional
+
+_TAG_UNESCAPE = {":": ";", "s": " ", "n": "\n", "r": "\r", "\\": "\\"}
+_TAG_ESCAPE = str.maketrans(
+    {";": "\\:", " ": "\\s", "\n": "\\n", "\r": "\\r", "\\": "\\\\"}
+)
+
+
+def _unescape(value: str) -> str:
+    """IRCv3 tag value unescaping (same rules as irc.message.Tag.parse)"""
+    if "\\" not in value:
+        return value
+    out = []
+    chars = iter(value)
+    for ch in chars:
+        if ch == "\\":
+            nxt = next(chars, "")
+            out.append(_TAG_UNESCAPE.get(nxt, nxt))
+        else:
+            out.append(ch)
+    return "".join(out)
+
+
+def escape_tag(value: str) -> str:
+    """IRCv3 tag value escaping, the inverse of _unescape"""
+    return value.translate(_TAG_ESCAPE)
+
+
+class RawPrivmsg(NamedTuple):
+    """A channel PRIVMSG split out of a raw line; tags stay undecoded."""
+
+    raw_tags: str
+    nick: str
+    channel: str  # with leading "#"
+    text: str
+
+    def tag(self, key: str, default: Optional[str] = None) -> Optional[str]:
+        """Decode a single tag without parsing the rest."""
+        raw = self.raw_tags
+        needle = key + "="
+        if raw.startswith(needle):
+            start = len(needle)
+        else:
+            pos = raw.find(";" + needle)
+            if pos < 0:
+                return default
+            start = pos + 1 + len(needle)
+        end = raw.find(";", start)
+        value = raw[start:] if end < 0 else raw[start:end]
+        return _unescape(value) if value else default
+
+    def tags(self) -> Dict[str, Optional[str]]:
+        """Decode every tag (empty values become None, like irc.message.Tag)."""
+        out: Dict[str, Optional[str]] = {}
+        if not self.raw_tags:
+            return out
+        for item in self.raw_tags.split(";"):
+            key, _, value = item.partition("=")
+            out[key] = _unescape(value) or None
+        return out
+
+
+def parse_privmsg(line: str) -> Optional[RawPrivmsg]:
+    """
+    Fast path for `[@tags ]:nick!user@host PRIVMSG #channel :text`.
+    Returns None for anything else, including CTCP/low-level-quoted text,
+    so callers can fall back to the full irc.client parser.
+    """
+    start = 0
+    raw_tags = ""
+    if line.startswith("@"):
+        start = line.find(" ")
+        if start < 0:
+            return None
+        raw_tags = line[1:start]
+        start += 1
+    if not line.startswith(":", start):
+        return None
+    prefix_end = line.find(" ", start)
+    if prefix_end < 0 or not line.startswith(" PRIVMSG #", prefix_end):
+        return None
+    channel_start = prefix_end + 9
+    channel_end = line.find(" :", channel_start)
+    if channel_end < 0 or line.find(" ", channel_start, channel_end) >= 0:
+        return None
+    text = line[channel_end + 2 :]
+    if "\x01" in text or "\x10" in text:
+        return None
+    bang = line.find("!", start, prefix_end)
+    nick = line[start + 1 : bang if bang >= 0 else prefix_end]
+    return RawPrivmsg(raw_tags, nick, line[channel_start:channel_end], text)
@@ -0,0 +1,172 @@
+# SPDX-FileCopyrightText: 2025 Aaron White <w531t4@gmail.com>
+# SPDX-License-Identifier: MIT
+import math
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional, Sequence
+
+# key -> value (None when absent/empty) for the message being filtered
+TagGetter = Callable[[str], Optional[str]]
+
+PRIORITY_CLASSES = ["broadcaster", "mod", "vip", "subscriber", "bits", "first_msg"]
+
+SHED_REASONS = ["blocked", "duplicate", "rate"]
+
+# Twitch clients append this to dodge the server's duplicate check
+_DUP_EVASION = "\U000e0000"
+
+
+def no_tags(key: str) -> Optional[str]:  # pylint: disable=unused-argument
+    """TagGetter for sources without tags"""
+    return None
+
+
+def event_tags(tags: Optional[List[Dict[str, Optional[str]]]]) -> TagGetter:
+    """TagGetter over irc.client's Event.tags ([{"key":..., "value":...}])"""
+    if not tags:
+        return no_tags
+    lookup = {t["key"]: t["value"] for t in tags}
+    return lookup.get
+
+
+def priority_classes(tag: TagGetter) -> set[str]:
+    """Which PRIORITY_CLASSES a message belongs to, from its IRCv3 tags."""
+    badges = tag("badges") or ""
+    out = set()
+    if "broadcaster/" in badges:
+        out.add("broadcaster")
+    if tag("mod") == "1" or "moderator/" in badges:
+        out.add("mod")
+    if tag("vip") is not None or "vip/" in badges:
+        out.add("vip")
+    if tag("subscriber") == "1" or "subscriber/" in badges:
+        out.add("subscriber")
+    if tag("bits"):
+        out.add("bits")
+    if tag("first-msg") == "1":
+        out.add("first_msg")
+    return out
+
+
+class _ChannelRate:
+    """exponentially weighted arrival rate plus the sampler's credit"""
+
+    __slots__ = ("rate", "last", "since", "credit")
+
+    def __init__(self, now: float) -> None:
+        self.rate = 0.0
+        self.last = now
+        self.since = now
+        self.credit = 1.0
+
+
+class ChatFilter:
+    """
+    Load shedding between IRC parsing and the ring buffer
+    - blocklist: drop chat from listed nicks (bots)
+    - dedup: drop a line seen in the same channel within `dedup_window_s`
+      (bounded LRU of `dedup_size` normalized hashes; copypasta, spam)
+    - sampling: keep about `max_lines_per_s` per channel by passing an
+      evenly spaced share of the measured rate; `priority` classes
+      (mods, subs, bits, first messages, ...) bypass it
+    Runs on the agent's IRC thread only. Counters record what was shed and why.
+    """
+
+    def __init__(
+        self,
+        max_lines_per_s: float = 0,
+        dedup_size: int = 0,
+        dedup_window_s: float = 30,
+        priority: Sequence[str] = (),
+        blocklist: Sequence[str] = (),
+        rate_window_s: float = 5.0,
+    ) -> None:
+        self.max_lines_per_s = max_lines_per_s
+        self.dedup_size = dedup_size
+        self.dedup_window_s = dedup_window_s
+        self.priority = set(priority)
+        self.blocklist = {nick.lower() for nick in blocklist}
+        self._tau = rate_window_s
+        self._rates: Dict[str, _ChannelRate] = {}
+        self._seen: OrderedDict[int, float] = OrderedDict()
+
+        # -------- Counters --------
+        self.passed = 0
+        self.prioritized = 0
+        # reason -> messages shed
+        self.shed_counts: Dict[str, int] = {r: 0 for r in SHED_REASONS}
+
+    @property
+    def enabled(self) -> bool:
+        """does any stage do something"""
+        return bool(self.max_lines_per_s or self.dedup_size or self.blocklist)
+
+    def shed(self, channel: str, nick: str, msg: str, tag: TagGetter) -> str:
+        """The reason to drop the message (see SHED_REASONS), or "" to keep it."""
+        reason = ""
+        now = time.monotonic()
+        if self.blocklist and nick.lower() in self.blocklist:
+            reason = "blocked"
+        elif self.dedup_size and self._duplicate(channel, msg, now):
+            reason = "duplicate"
+        elif self.max_lines_per_s and not self._sample(channel, now, tag):
+            reason = "rate"
+        if reason:
+            self.shed_counts[reason] += 1
+        else:
+            self.passed += 1
+        return reason
+
+    def stats(self) -> Dict[str, int | float]:
+        """counter snapshot plus the current per-channel arrival rates"""
+        return {
+            "passed": self.passed,
+            "prioritized": self.prioritized,
+            **{f"shed_{r}": n for r, n in self.shed_counts.items()},
+            **{
+                f"rate_{ch.lstrip('#')}": round(self._rate(r), 1)
+                for ch, r in list(self._rates.items())
+            },
+        }
+
+    def forget(self, channel: str) -> None:
+        """drop per-channel state once a channel is no longer watched"""
+        self._rates.pop(channel, None)
+
+    def _duplicate(self, channel: str, msg: str, now: float) -> bool:
+        key = hash((channel, " ".join(msg.replace(_DUP_EVASION, "").split()).lower()))
+        seen = self._seen.get(key)
+        self._seen[key] = now
+        self._seen.move_to_end(key)
+        if len(self._seen) > self.dedup_size:
+            self._seen.popitem(last=False)
+        return seen is not None and now - seen < self.dedup_window_s
+
+    def _sample(self, channel: str, now: float, tag: TagGetter) -> bool:
+        state = self._rates.get(channel)
+        if state is None:
+            state = self._rates[channel] = _ChannelRate(now)
+        # Event rate with time constant tau: decay, then add this arrival
+        state.rate = (
+            state.rate * math.exp((state.last - now) / self._tau) + 1 / self._tau
+        )
+        state.last = now
+        rate = self._rate(state)
+        if self.priority and self.priority.intersection(priority_classes(tag)):
+            self.prioritized += 1
+            return True
+        if rate <= self.max_lines_per_s:
+            state.credit = 1.0
+            return True
+        # Deterministic sampling: pass every (rate / target)-th line
+        state.credit += self.max_lines_per_s / rate
+        if state.credit >= 1.0:
+            state.credit -= 1.0
+            return True
+        return False
+
+    def _rate(self, state: _ChannelRate) -> float:
+        # The average starts at 0; undo that bias so a busy channel is
+        # sampled from its first second instead of after a few tau
+        warm = 1 - math.exp(-max(state.last - state.since, 1.0) / self._tau)
+        return state.rate / warm
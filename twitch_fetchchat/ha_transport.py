@@ -2,30 +2,121 @@
 # SPDX-License-Identifier: MIT
 
 from __future__ import annotations
-from typing import TYPE_CHECKING
+from typing import TYPE_CHECKING, Dict, Optional, Tuple
+import threading
 import time
 from twitch_fetchchat.base_transport import _TransportBase
 
 if TYPE_CHECKING:
-    from twitch_fetchchat.twitch_ircbridge import TwitchIrcBridge
+    from twitch_fetchchat.hasslog import BridgeApp
 
 
 class HAAttrTransport(_TransportBase):
+    """
+    Lines as attributes of an HA entity. Every set_state is a state_changed
+    event and a recorder row, so writes can be cut down:
+    - skip_unchanged: no write when the lines equal the last ones written
+    - min_interval_ms: at most one write per interval; the latest lines
+      that arrived inside it are written when it ends (trailing flush)
+    - event: also fire this HA event for every change, unthrottled, so
+      live consumers need not follow (and the recorder need not keep) the
+      entity; exclude the event type from the recorder to keep it out
+    """
+
     def __init__(
-        self, hass_app: TwitchIrcBridge, entity_id: str = "sensor.twitch_chat_bridge"
+        self,
+        hass_app: BridgeApp,
+        entity_id: str = "sensor.twitch_chat_bridge",
+        skip_unchanged: bool = False,
+        min_interval_ms: int = 0,
+        event: str = "",
     ):
         self.hass = hass_app
         self.entity_id = entity_id
+        self.skip_unchanged = bool(skip_unchanged)
+        self.min_interval_s = min_interval_ms / 1000
+        self.event = event
+        self._lock = threading.Lock()
+        self._written: Optional[Tuple[str, ...]] = None
+        self._fired: Optional[Tuple[str, ...]] = None
+        self._pending: Optional[Tuple[str, ...]] = None
+        self._timer: threading.Timer | None = None
+        self._last_write = 0.0
+        self.written = 0
+        self.skipped = 0
+        self.coalesced = 0
 
     def send(self, lines):
         # lines = [line1, line2, line3] oldest->newest (strings)
+        rows = tuple(line or "" for line in lines)
+        if self.event and not (self.skip_unchanged and rows == self._fired):
+            self._fired = rows
+            self.hass.fire_event(self.event, entity_id=self.entity_id, lines=list(rows))
+        with self._lock:
+            if self._pending is not None:
+                self.coalesced += 1  # replaced before its trailing flush
+                self._pending = None
+            if self.skip_unchanged and rows == self._written:
+                self.skipped += 1
+                return
+            wait = self._last_write + self.min_interval_s - time.monotonic()
+            if wait > 0:
+                self._pending = rows
+                if self._timer is None:
+                    self._timer = threading.Timer(wait, self._flush)
+                    self._timer.daemon = True
+                    self._timer.start()
+                return
+            self._last_write = time.monotonic()
+            self._written = rows
+        self._write(rows)
+
+    def stats(self) -> Dict[str, int]:
+        """set_state calls made and saved"""
+        with self._lock:
+            return {
+                "written": self.written,
+                "skipped": self.skipped,
+                "coalesced": self.coalesced,
+                "saved": self.skipped + self.coalesced,
+            }
+
+    def close(self) -> None:
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            rows, self._pending = self._pending, None
+            if rows is not None:
+                self._written = rows
+        if rows is not None:
+            self._write(rows)  # the newest lines, held back by the interval
+        if self.skip_unchanged or self.min_interval_s:
+            self.hass.log(f"HA writes ({self.entity_id}): {self.stats()}")
+
+    def _flush(self) -> None:
+        """trailing write of the lines held back by min_interval_ms"""
+        with self._lock:
+            self._timer = None
+            rows, self._pending = self._pending, None
+            if rows is None:
+                return
+            self._last_write = time.monotonic()
+            self._written = rows
+        self._write(rows)
+
+    def _write(self, rows: Tuple[str, ...]) -> None:
         attrs = {
             "updated": int(time.time()),
             "friendly_name": "Twitch Chat Bridge",
             "icon": "mdi:chat",
         }
-        for i, line in enumerate(lines):
-            attrs.update({f"line{i + 1}": line or ""})
+        for i, line in enumerate(rows):
+            attrs.update({f"line{i + 1}": line})
+        if self.skip_unchanged or self.min_interval_s:
+            attrs["writes_saved"] = self.skipped + self.coalesced
 
         # Keep state constant to reduce churn; attributes carry the payload
         self.hass.set_state(self.entity_id, state="ok", attributes=attrs)
+        with self._lock:  # also runs on the trailing-flush timer thread
+            self.written += 1
@@ -1,7 +1,7 @@
 # SPDX-FileCopyrightText: 2025 Aaron White <w531t4@gmail.com>
 # SPDX-License-Identifier: MIT
 
-from typing import Protocol, Literal, overload
+from typing import Any, Protocol, Literal, overload
 
 Level = Literal["CRITICAL", "ERROR", "WARNING", "INFO", "DEBUG"]
 
@@ -16,3 +16,19 @@ class HassLog(Protocol):
     @overload
     def __call__(self, message: str, /, *, level: Level) -> None: ...
     def __call__(self, message: str, /, *args, **kwargs) -> None: ...
+
+
+class BridgeApp(Protocol):
+    """
+    What the runtime and the transports call on the app that owns them:
+    TwitchIrcBridge (AppDaemon) or StandaloneBridge, whose HA-only methods
+    raise (it refuses the sinks that need them)
+    """
+
+    def log(self, msg: str, /, *args: Any, level: str = ..., **kwargs: Any) -> None: ...
+    def error(
+        self, msg: str, /, *args: Any, level: str = ..., **kwargs: Any
+    ) -> None: ...
+    def call_service(self, service: str, /, **kwargs: Any) -> Any: ...
+    def set_state(self, entity_id: str, /, **kwargs: Any) -> Any: ...
+    def fire_event(self, event: str, /, **kwargs: Any) -> Any: ...
@@ -1,28 +1,83 @@
 # SPDX-FileCopyrightText: 2025 Aaron White <w531t4@gmail.com>
 # SPDX-License-Identifier: MIT
-from datetime import datetime, timezone
 import ssl
 import random
-import string
 import socket
 import time
-from collections import deque
 import threading
 from functools import partial
-from typing import Optional, Callable, List, Dict
+from typing import Optional, Callable, List
 
 import irc.client
 from irc.connection import Factory
 
+from twitch_fetchchat import profiling
+from twitch_fetchchat.agent_base import MODERATION_COMMANDS, _AgentBase
 from twitch_fetchchat.config import IrcBridgeConfig
+from twitch_fetchchat.fastparse import RawPrivmsg, parse_privmsg
+from twitch_fetchchat.filters import event_tags
 from twitch_fetchchat.hasslog import HassLog
+from twitch_fetchchat.metrics import Metrics
 
 
-class IRCAgent:
+class FastPathConnection(irc.client.ServerConnection):
     """
-    Anonymous, read-only Twitch IRC Agent
-    - Joins/parts as the entity changes (unknown/empty => part & clear output)
-    - Emits rolling last 3 public chat lines through chosen transport(s)
+    ServerConnection that hands plain channel PRIVMSGs straight to
+    `on_privmsg`, skipping Event/NickMask/tag construction and handler
+    lookup; every other line goes through the normal irc.client path.
+    """
+
+    on_privmsg: Callable[[RawPrivmsg], None] | None = None
+
+    def _process_line(self, line: str) -> None:
+        handler = self.on_privmsg
+        msg = parse_privmsg(line) if handler is not None else None
+        if handler is None or msg is None:
+            super()._process_line(line)
+        else:
+            handler(msg)
+
+
+class _WakeableReactor(irc.client.Reactor):
+    """Reactor whose select() also returns as soon as `wake()` is called"""
+
+    def __init__(self, *args, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self._wake_r, self._wake_w = socket.socketpair()
+        self._wake_r.setblocking(False)
+        self._wake_w.setblocking(False)
+
+    @property
+    def sockets(self):
+        return super().sockets + [self._wake_r]
+
+    def process_data(self, sockets) -> None:
+        spans = profiling.spans
+        started = time.perf_counter() if spans is not None else 0.0
+        if self._wake_r in sockets:
+            try:
+                while self._wake_r.recv(64):
+                    pass
+            except BlockingIOError:
+                pass
+        super().process_data([s for s in sockets if s is not self._wake_r])
+        if spans is not None:
+            spans.add("irc_loop", time.perf_counter() - started)
+
+    def wake(self) -> None:
+        """interrupt a pending process_once"""
+        try:
+            self._wake_w.send(b"\0")
+        except BlockingIOError:
+            pass  # already pending
+
+
+class IRCAgent(_AgentBase):
+    """
+    Anonymous, read-only Twitch IRC Agent (threaded irc.client.Reactor engine)
+    - Serves any number of displays over a single IRC connection
+    - Joins/parts as display channels change (all unknown/empty => disconnect)
+    - Emits each display's rolling last N public chat lines to its own target
     """
 
     def __init__(
@@ -30,75 +85,63 @@ class IRCAgent:
         config: IrcBridgeConfig,
         logger: HassLog,
         emit_target: Callable[[List[str]], None],
+        metrics: Optional[Metrics] = None,
     ) -> None:
-        self.log = logger
-        self.config = config
-        self.send = emit_target
+        super().__init__(config, logger, emit_target, metrics)
         self._irc_thread: threading.Thread | None = None
-
-        # -------- State --------
-        self._last: deque[Dict[str, str | int]] = deque(
-            maxlen=max(self.config.max_messages, 3)
-        )
-        self._reactor: irc.client.Reactor | None = None
+        self._reactor: _WakeableReactor | None = None
         self._conn: irc.client.ServerConnection | None = None
-        self._current_channel = None
         self._connected = False
-        self._stop_flag = False
-        self._lock = threading.RLock()
+        self._redial = False
+        # set whenever the wanted channel set changes or we are stopping
+        self._wake = threading.Event()
 
     def start(self) -> None:
         """start the agent"""
+        super().start()
         if not self._irc_thread:
             self._irc_thread = threading.Thread(target=self._irc_loop, daemon=True)
             self._irc_thread.start()
 
-    def switch_channel(self, channel: Optional[str]) -> None:
-        """Switch to a new channel (or None to disconnect) and clear buffers."""
-        with self._lock:
-            self.log(f"switch_channel: channel={channel}")
-            self._current_channel = channel
-            self._last.clear()
-        self._emit()  # send blanks on switch/part
+    def terminate(self) -> None:
+        """stop irc session"""
+        super().terminate()
+        self._wake.set()
+        self._teardown()
 
-        # If no active channel, fully disconnect from IRC and remain offline
-        if channel is None:
-            try:
-                self.log("Tearing down IRC connection (no active channel).")
-                self._teardown()
-            except Exception:
-                pass
+    def _channels_changed(self, idle: bool) -> None:
+        # The loop thread JOINs/PARTs (or tears down once idle) right away;
+        # closing the socket from here would race its select()
+        self._wake.set()
+        if self._reactor:
+            self._reactor.wake()
 
-    # -------------------- Emission --------------------
-    def _emit(self) -> None:
-        with self._lock:
-            items = list(self._last)[(-1 * self.config.max_messages) :]
-        # Build exactly 3 display lines (oldest->newest), empty if missing
-        lines = [""] * (self.config.max_messages - len(items)) + [
-            f"{i['user']}: {i['msg']}" for i in items
-        ]
-        try:
-            self.send(lines)
-        except Exception as e:
-            self.log(f"Transport send error: {e}", level="ERROR")
+    def _endpoint_changed(self) -> None:
+        # The loop thread drops the link and dials the new endpoint
+        self._redial = True
+        self._channels_changed(False)
 
     # -------------------- IRC core --------------------
     def _irc_loop(self) -> None:
         joined: set[str] = set()
         backoff = self.config.reconnect_delay_s
+        idle_since: float | None = None
         while not self._stop_flag:
             try:
                 if not self._connected:
                     # Only connect when we actually have a target channel
-                    with self._lock:
-                        target = self._current_channel
-                        self.log(f"self._current_channel={target}")
-                    if target is None:
-                        time.sleep(self.config.reconnect_delay_s)
+                    self._wake.clear()
+                    wanted = self._wanted_channels()
+                    self.log(f"wanted channels={sorted(wanted)}")
+                    if not wanted:
+                        self._wake.wait()  # until switch_channel/terminate
                         continue
+                    self._redial = False
                     self._connect()
                     joined.clear()
+                    idle_since = None
                     backoff = self.config.reconnect_delay_s  # reset after success
+                    self._link_state("connected")
 
                 if not self._reactor:
                     raise NotImplementedError(
@@ -106,27 +149,49 @@ class IRCAgent:
                     )
                 self._reactor.process_once(timeout=0.5)  # pyright: ignore[reportArgumentType]
 
+                if self._redial:
+                    self._redial = False
+                    self.log("Reconnecting (IRC endpoint changed).")
+                    self._teardown()
+                    self._link_state("closed")
+                    continue
+
                 with self._lock:
-                    target = self._current_channel
+                    wanted = set(self._buffers)
                     conn = self._conn
 
                 if self._connected and conn:
-                    self._sync_channels(conn, joined, target)
+                    self._sync_channels(conn, joined, wanted)
+                    # If no active channel, fully disconnect from IRC and remain
+                    # offline, after keeping the link warm for irc_idle_linger_s
+                    if wanted:
+                        idle_since = None
+                    else:
+                        if idle_since is None:
+                            idle_since = time.monotonic()
+                        if (
+                            time.monotonic() - idle_since
+                            >= self.config.irc_idle_linger_s
+                        ):
+                            self.log("Tearing down IRC connection (no active channel).")
+                            self._teardown()
+                            self._link_state("closed")
                 continue
             except Exception as e:
                 self.log(f"IRC loop error: {e}", level="WARNING")
                 self._teardown()
             # optional backoff (if you already use it)
-            time.sleep(backoff + random.random() * 0.5 * backoff)
+            delay = backoff + random.random() * 0.5 * backoff
+            self._link_state("failed", delay)
+            time.sleep(delay)
             backoff = min(backoff * 2, 60)
 
     def _sync_channels(
         self,
         conn: irc.client.ServerConnection,
         joined: set[str],
-        target: Optional[str],
+        want: set[str],
     ) -> None:
-        want = {f"#{target}"} if target else set()
         # self.log(f"joined={joined} want={want}")
         for ch in list(joined.difference(want)):
             try:
@@ -145,20 +210,37 @@ class IRCAgent:
                 self.log(f"JOIN error: {e}", level="ERROR")
 
     def _connect(self) -> None:
-        self._reactor = irc.client.Reactor()
-        nick = "justinfan" + "".join(random.choices(string.digits, k=6))  # anonymous
+        if self._reactor is None or self._conn is None:
+            # One reactor/connection for the agent's lifetime; connect()
+            # below reopens the socket, global handlers stay registered
+            self._reactor = _WakeableReactor()
+            if self.config.irc_fast_parse:
+                self._reactor.connection_class = FastPathConnection
+            self._conn = self._reactor.server()
+            if isinstance(self._conn, FastPathConnection):
+                self._conn.on_privmsg = self._on_fast_privmsg
+            self._conn.add_global_handler("disconnect", self._on_disconnect)
+            self._conn.add_global_handler("pubmsg", self._on_pubmsg)
+            self._conn.add_global_handler("ping", self._on_ping)
+            self._conn.add_global_handler("welcome", self._on_welcome)
+            for command in MODERATION_COMMANDS:
+                self._conn.add_global_handler(command.lower(), self._on_moderation)
+        nick = self._anonymous_nick()
 
         self.log(
             f"Connecting to {self.config.irc_host}:{self.config.irc_port} "
             f"as {nick} (anonymous)"
         )
-        wrapper = self._tls_connect_wrapper(self.config.irc_host)
-        self._conn = self._reactor.server().connect(
+        if self.config.irc_tls:
+            factory = Factory(wrapper=self._tls_connect_wrapper(self.config.irc_host))
+        else:
+            factory = Factory()
+        self._conn.connect(
             self.config.irc_host,
             self.config.irc_port,
             nick,
             password=None,
-            connect_factory=Factory(wrapper=wrapper),
+            connect_factory=factory,
         )
 
         try:
@@ -168,10 +250,6 @@ class IRCAgent:
         except Exception:
             pass
 
-        self._conn.add_global_handler("disconnect", self._on_disconnect)
-        self._conn.add_global_handler("pubmsg", self._on_pubmsg)
-        self._conn.add_global_handler("ping", self._on_ping)
-
         self._connected = True
 
     def _teardown(self) -> None:
@@ -181,13 +259,6 @@ class IRCAgent:
                 self._conn.disconnect("bye")
         except Exception:
             pass
-        self._conn = None
-        self._reactor = None
-
-    def terminate(self) -> None:
-        """stop irc session"""
-        self._stop_flag = True
-        self._teardown()
 
     # -------------------- IRC events --------------------
     def _on_disconnect(
@@ -196,6 +267,13 @@ class IRCAgent:
         """Handle disconnect events."""
         self._connected = False
 
+    def _on_welcome(
+        self, conn: irc.client.ServerConnection, event: irc.client.Event
+    ) -> None:
+        """Registration done: remember the TLS session for the next connect."""
+        if isinstance(conn.socket, ssl.SSLSocket):
+            self._remember_tls_session(conn.socket)
+
     def _on_ping(
         self, conn: irc.client.ServerConnection, event: irc.client.Event
     ) -> None:
@@ -210,29 +288,42 @@ class IRCAgent:
         self, conn: irc.client.ServerConnection, event: irc.client.Event
     ) -> None:
         """Handle public channel chat messages (PRIVMSG to a channel)."""
+        spans = profiling.spans
+        started = time.perf_counter() if spans is not None else 0.0
         try:
             channel: str = event.target or ""
-            with self._lock:
-                current = self._current_channel
-            if current and channel.lstrip("#") != current:
-                return
             nick: str = (
                 irc.client.NickMask(event.source).nick if event.source else "unknown"
             )
             msg: str = event.arguments[0] if event.arguments else ""
+            self._ingest(channel, nick, msg, event_tags(event.tags))
+        except Exception as e:
+            self.log(f"pubmsg parse error: {e}", level="ERROR")
+        if spans is not None:
+            spans.add("on_pubmsg", time.perf_counter() - started)
 
-            item: Dict[str, str | int] = {
-                "ch": channel.lstrip("#"),
-                "user": nick,
-                "msg": msg,
-                "ts": int(datetime.now(tz=timezone.utc).timestamp()),
-            }
+    def _on_moderation(
+        self, conn: irc.client.ServerConnection, event: irc.client.Event
+    ) -> None:
+        """Handle CLEARCHAT/CLEARMSG/ROOMSTATE (deletions, bans, chat modes)."""
+        try:
+            arg = event.arguments[0] if event.arguments else None
+            self._moderate(
+                event.type.upper(), event.target or "", arg, event_tags(event.tags)
+            )
+        except Exception as e:
+            self.log(f"{event.type} parse error: {e}", level="ERROR")
 
-            with self._lock:
-                self._last.append(item)
-            self._emit()
+    def _on_fast_privmsg(self, msg: RawPrivmsg) -> None:
+        """FastPathConnection counterpart of _on_pubmsg."""
+        spans = profiling.spans
+        started = time.perf_counter() if spans is not None else 0.0
+        try:
+            self._ingest(msg.channel, msg.nick, msg.text, msg.tag)
         except Exception as e:
             self.log(f"pubmsg parse error: {e}", level="ERROR")
+        if spans is not None:
+            spans.add("on_pubmsg", time.perf_counter() - started)
 
     def _tls_connect_wrapper(
         self, server_address: str
@@ -240,9 +331,5 @@ class IRCAgent:
         """
         TLS socket wrapper for python-irc.
         """
-        # Verified TLS (hostname check + CA validation)
-        ctx = ssl.create_default_context(ssl.Purpose.SERVER_AUTH)
-        ctx.minimum_version = ssl.TLSVersion.TLSv1_2
-        ctx.check_hostname = True
-        ctx.verify_mode = ssl.CERT_REQUIRED
+        ctx = self._tls_context()
         return partial(ctx.wrap_socket, server_hostname=server_address)
@@ -0,0 +1,89 @@
+# SPDX-FileCopyrightText: 2025 Aaron White <w531t4@gmail.com>
+# SPDX-License-Identifier: MIT
+import time
+from typing import Iterable, List, NamedTuple, Optional, Tuple
+
+
+class ChatMessage(NamedTuple):
+    """
+    One buffered chat line (immutable, tuple-backed, no per-instance dict).
+    Display rows and their UTF-8 encodings are built once at ingest so emits
+    only slice the ring buffer. `lines` holds one row unless rendering wraps.
+    `seq` numbers a channel's messages from 1 while it is buffered; `msg_id`
+    is Twitch's `id` tag (what CLEARMSG names), empty when unknown.
+    """
+
+    channel: str
+    user: str
+    msg: str
+    ts: int
+    lines: Tuple[str, ...]
+    data: Tuple[bytes, ...]
+    seq: int = 0
+    msg_id: str = ""
+
+    @classmethod
+    def create(
+        cls,
+        channel: str,
+        user: str,
+        msg: str,
+        lines: Optional[Tuple[str, ...]] = None,
+        seq: int = 0,
+        msg_id: str = "",
+    ) -> "ChatMessage":
+        """build a message stamped with the current unix time"""
+        if lines is None:
+            lines = (f"{user}: {msg}",)
+        return cls(
+            channel,
+            user,
+            msg,
+            int(time.time()),
+            lines,
+            tuple(l.encode("utf-8", errors="replace") for l in lines),
+            seq,
+            msg_id,
+        )
+
+
+class Batch(NamedTuple):
+    """
+    The messages new to one display since its previous batch (oldest->newest).
+    Gaps in `seq` are messages the display never saw; `dropped` counts those
+    that left the buffer (evicted or moderated) before a flush included them.
+    """
+
+    display: str
+    channel: Optional[str]
+    messages: Tuple[ChatMessage, ...] = ()
+    dropped: int = 0
+
+    def merge(self, newer: "Batch") -> "Batch":
+        """one batch covering this one and then `newer`"""
+        return Batch(
+            newer.display,
+            newer.channel,
+            self.messages + newer.messages,
+            self.dropped + newer.dropped,
+        )
+
+
+class Snapshot(List[str]):
+    """
+    Display lines for one emit (oldest->newest) plus `data`, their UTF-8
+    encodings, so byte-oriented transports need not encode them again, and
+    `batch`, the messages that arrived since the display's previous emit.
+    """
+
+    __slots__ = ("data", "batch")
+
+    def __init__(
+        self,
+        lines: Iterable[str] = (),
+        data: Iterable[bytes] = (),
+        batch: Optional[Batch] = None,
+    ) -> None:
+        super().__init__(lines)
+        self.data = list(data)
+        self.batch = batch
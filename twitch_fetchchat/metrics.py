@@ -0,0 +1,294 @@
+# SPDX-FileCopyrightText: 2025 Aaron White <w531t4@gmail.com>
+# SPDX-License-Identifier: MIT
+import math
+import threading
+import time
+from bisect import bisect_left
+from typing import TYPE_CHECKING, Any, Callable, Dict, List, Sequence, Tuple
+
+from twitch_fetchchat.hasslog import HassLog
+
+if TYPE_CHECKING:
+    from http.server import ThreadingHTTPServer
+
+# Upper bounds in seconds (Prometheus `le`); +Inf is implicit
+LATENCY_BUCKETS_S = (
+    0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0,
+)  # fmt: skip
+SWITCH_BUCKETS_S = (0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+HELP = {
+    "messages_received_total": "Chat messages ingested from IRC",
+    "messages_shed_total": "Chat messages dropped by the filter stage",
+    "messages_moderated_total": "Buffered messages removed by CLEARCHAT/CLEARMSG",
+    "snapshots_emitted_total": "Display snapshots handed to the transports",
+    "irc_connects_total": "Successful IRC connections",
+    "irc_failures_total": "IRC connection attempts or sessions that failed",
+    "irc_connected": "1 while an IRC session is up",
+    "irc_backoff_seconds": "Delay before the next reconnect attempt",
+    "irc_tls_resumed_total": "Connects that resumed the previous TLS session",
+    "channel_switch_first_message_seconds": "Channel switch to first chat line",
+    "checkpoint_load_seconds": "Time spent reading the buffer checkpoint at startup",
+    "checkpoint_writes_total": "Buffer checkpoints written",
+    "shard_workers_up": "Shard worker processes running",
+    "shard_restarts_total": "Shard worker processes that exited and were restarted",
+    "transport_send_seconds": "Time spent in a transport send()",
+    "transport_send_errors_total": "Transport sends that raised",
+    "transport_dropped_total": "Frames evicted from a full dispatch queue",
+    "transport_late_total": "Frames that waited longer than dispatch_late_ms",
+    "transport_queue_depth": "Frames waiting in a dispatch queue",
+}
+
+Key = Tuple[str, Tuple[Tuple[str, str], ...]]
+
+
+class Histogram:
+    """Bucketed observations with Prometheus (cumulative `le`) semantics"""
+
+    __slots__ = ("bounds", "counts", "sum", "count")
+
+    def __init__(self, bounds: Sequence[float]) -> None:
+        self.bounds = tuple(bounds)
+        self.counts = [0] * (len(self.bounds) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        """record one observation"""
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def quantile(self, q: float) -> float:
+        """upper bound of the bucket holding the q-th observation"""
+        if not self.count:
+            return math.nan
+        rank = q * self.count
+        seen = 0
+        for bound, count in zip(self.bounds, self.counts):
+            seen += count
+            if seen >= rank:
+                return bound
+        return self.bounds[-1]  # overflow bucket: report the top bound
+
+
+class Metrics:
+    """
+    Thread-safe metric registry for the bridge
+    - Counters (`*_total`), gauges and histograms keyed by name + labels
+    - Collectors run before each read to refresh gauges owned elsewhere
+    - `render()` gives Prometheus text, `summary()` a flat dict for HA
+    """
+
+    def __init__(self, prefix: str = "twitch_fetchchat") -> None:
+        self.prefix = prefix
+        self._lock = threading.Lock()
+        self._values: Dict[Key, float] = {}
+        self._kinds: Dict[str, str] = {}
+        self._histograms: Dict[Key, Histogram] = {}
+        self._collectors: List[Callable[[], None]] = []
+        self._prev: Dict[Key, float] = {}
+        self._prev_at = time.monotonic()
+
+    @staticmethod
+    def _key(name: str, labels: Dict[str, str]) -> Key:
+        return name, tuple(sorted(labels.items()))
+
+    def inc(self, name: str, value: float = 1, **labels: str) -> None:
+        """add to a counter"""
+        key = self._key(name, labels)
+        with self._lock:
+            self._kinds[name] = "counter"
+            self._values[key] = self._values.get(key, 0) + value
+
+    def set(self, name: str, value: float, **labels: str) -> None:
+        """set a gauge"""
+        key = self._key(name, labels)
+        with self._lock:
+            self._kinds[name] = "gauge"
+            self._values[key] = value
+
+    def observe(
+        self,
+        name: str,
+        value: float,
+        buckets: Sequence[float] = LATENCY_BUCKETS_S,
+        **labels: str,
+    ) -> None:
+        """add an observation to a histogram"""
+        key = self._key(name, labels)
+        with self._lock:
+            hist = self._histograms.get(key)
+            if hist is None:
+                self._kinds[name] = "histogram"
+                hist = self._histograms[key] = Histogram(buckets)
+            hist.observe(value)
+
+    def add_collector(self, collector: Callable[[], None]) -> None:
+        """call `collector` before every render/summary"""
+        self._collectors.append(collector)
+
+    def remove_collector(self, collector: Callable[[], None]) -> None:
+        """undo add_collector"""
+        if collector in self._collectors:
+            self._collectors.remove(collector)
+
+    def _collect(self) -> None:
+        for collector in self._collectors:
+            try:
+                collector()
+            except Exception:
+                pass
+
+    # -------------------- Exposition --------------------
+    def render(self) -> str:
+        """Prometheus text exposition format (0.0.4)"""
+        self._collect()
+        out: List[str] = []
+        with self._lock:
+            names = sorted(self._kinds)
+            for name in names:
+                full = f"{self.prefix}_{name}"
+                if name in HELP:
+                    out.append(f"# HELP {full} {HELP[name]}")
+                out.append(f"# TYPE {full} {self._kinds[name]}")
+                for (n, labels), value in sorted(self._values.items()):
+                    if n == name:
+                        out.append(f"{full}{_labels(labels)} {_number(value)}")
+                for (n, labels), hist in sorted(self._histograms.items()):
+                    if n != name:
+                        continue
+                    cumulative = 0
+                    bounds = (*hist.bounds, math.inf)
+                    for bound, count in zip(bounds, hist.counts):
+                        cumulative += count
+                        le = _labels(labels + (("le", _number(bound)),))
+                        out.append(f"{full}_bucket{le} {cumulative}")
+                    out.append(f"{full}_sum{_labels(labels)} {_number(hist.sum)}")
+                    out.append(f"{full}_count{_labels(labels)} {hist.count}")
+        return "\n".join(out) + "\n"
+
+    def summary(self) -> Dict[str, Any]:
+        """
+        Flat view for an HA sensor: counters lose `_total` and gain a
+        `_per_s` rate since the previous summary, histograms become
+        `_p50_ms`/`_p99_ms`. Labeled series are grouped per label value,
+        e.g. {"transports": {"udp0": {"send_p50_ms": ...}}}.
+        """
+        self._collect()
+        now = time.monotonic()
+        out: Dict[str, Any] = {}
+        with self._lock:
+            elapsed = max(now - self._prev_at, 1e-9)
+            for key, value in sorted(self._values.items()):
+                name, labels = key
+                target = _group(out, labels)
+                if self._kinds[name] == "counter":
+                    short = _short(name, labels).removesuffix("_total")
+                    target[short] = _number(value)
+                    rate = (value - self._prev.get(key, 0)) / elapsed
+                    target[f"{short}_per_s"] = round(rate, 2)
+                    self._prev[key] = value
+                else:
+                    target[_short(name, labels)] = _number(value)
+            for (name, labels), hist in sorted(self._histograms.items()):
+                target = _group(out, labels)
+                short = _short(name, labels).removesuffix("_seconds")
+                for q in (0.5, 0.99):
+                    value = hist.quantile(q)
+                    target[f"{short}_p{round(q * 100)}_ms"] = (
+                        None if math.isnan(value) else round(value * 1000, 1)
+                    )
+            self._prev_at = now
+        return out
+
+
+def _labels(labels: Tuple[Tuple[str, str], ...]) -> str:
+    if not labels:
+        return ""
+    escaped = (
+        (k, str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"))
+        for k, v in labels
+    )
+    return "{" + ",".join(f'{k}="{v}"' for k, v in escaped) + "}"
+
+
+def _number(value: float) -> Any:
+    if value == math.inf:
+        return "+Inf"
+    return int(value) if float(value).is_integer() else value
+
+
+def _short(name: str, labels: Tuple[Tuple[str, str], ...]) -> str:
+    """drop the label name from a grouped series: transport_dropped -> dropped"""
+    for key, _ in labels:
+        name = name.removeprefix(f"{key}_")
+    return name
+
+
+def _group(out: Dict[str, Any], labels: Tuple[Tuple[str, str], ...]) -> Dict:
+    for key, value in labels:
+        out = out.setdefault(f"{key}s", {}).setdefault(value, {})
+    return out
+
+
+class MetricsServer:
+    """Serves `Metrics.render()` at GET /metrics from its own thread."""
+
+    def __init__(
+        self, metrics: Metrics, logger: HassLog, host: str = "127.0.0.1", port: int = 0
+    ) -> None:
+        self.metrics = metrics
+        self.log = logger
+        self.host = host
+        self.port = port
+        self._server: ThreadingHTTPServer | None = None
+
+    def start(self) -> None:
+        """bind and serve; a bind failure is logged, not raised"""
+        # http.server is only paid for when the endpoint is enabled
+        # pylint: disable-next=import-outside-toplevel
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+        metrics = self.metrics
+
+        class Handler(BaseHTTPRequestHandler):
+            """/metrics only"""
+
+            def do_GET(self) -> None:  # pylint: disable=invalid-name
+                """scrape"""
+                if self.path.split("?", 1)[0] not in ("/", "/metrics"):
+                    self.send_error(404)
+                    return
+                body = metrics.render().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format: str, *args: Any) -> None:
+                pass  # no per-scrape log lines
+
+        try:
+            self._server = ThreadingHTTPServer((self.host, self.port), Handler)
+        except OSError as e:
+            # an optional endpoint; the bridge runs on without it
+            self.log(
+                f"metrics endpoint {self.host}:{self.port} unavailable: {e}",
+                level="ERROR",
+            )
+            return
+        self._server.daemon_threads = True
+        self.port = self._server.server_address[1]
+        threading.Thread(
+            target=self._server.serve_forever, name="metrics-http", daemon=True
+        ).start()
+        self.log(f"metrics endpoint on http://{self.host}:{self.port}/metrics")
+
+    def stop(self) -> None:
+        """stop serving and close the socket"""
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
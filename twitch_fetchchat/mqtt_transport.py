@@ -2,51 +2,146 @@
 # SPDX-License-Identifier: MIT
 
 from __future__ import annotations
-from typing import TYPE_CHECKING
+from typing import TYPE_CHECKING, List, Optional
 from datetime import datetime, timezone
 import json
 
 from twitch_fetchchat.base_transport import _TransportBase
+from twitch_fetchchat.message import Batch, Snapshot
 
 if TYPE_CHECKING:
-    from twitch_fetchchat.twitch_ircbridge import TwitchIrcBridge
+    from twitch_fetchchat.hasslog import BridgeApp
+
+
+class DirectMQTTClient:
+    """
+    Long-lived broker connection (paho-mqtt) instead of one HA service call
+    per topic. Publishes are queued to paho's network thread (pipelined).
+    """
+
+    def __init__(
+        self,
+        logger: BridgeApp,
+        host: str,
+        port: int = 1883,
+        username: str = "",
+        password: str = "",
+    ):
+        try:
+            import paho.mqtt.client as mqtt  # pylint: disable=import-outside-toplevel
+        except ImportError as e:
+            raise ImportError(
+                "mqtt_client=direct requires paho-mqtt "
+                "(pip install twitch_fetchchat[mqtt])"
+            ) from e
+        self.log = logger.log
+        api = getattr(mqtt, "CallbackAPIVersion", None)  # paho-mqtt >= 2
+        if api is not None:
+            self.client = mqtt.Client(api.VERSION2)
+        else:
+            self.client = mqtt.Client()
+        if username:
+            self.client.username_pw_set(username, password or None)
+        self.client.reconnect_delay_set(min_delay=1, max_delay=60)
+        self.client.connect_async(host, int(port), keepalive=60)
+        self.client.loop_start()
+        self.log(f"MQTT direct client connecting to {host}:{port}")
+
+    def publish(self, topic: str, payload: str, qos: int, retain: bool) -> None:
+        """queue a publish; paho delivers it once the link is up"""
+        self.client.publish(topic, payload, qos=qos, retain=retain)
+
+    def close(self) -> None:
+        """disconnect and stop the network thread"""
+        self.client.disconnect()
+        self.client.loop_stop()
 
 
 class MQTTTransport(_TransportBase):
     def __init__(
         self,
-        hass_app: TwitchIrcBridge,
+        hass_app: BridgeApp,
         base_topic: str = "twitch_chat",
         retain: bool = True,
+        delta: bool = False,
+        append: bool = False,
+        qos: int = 0,
+        client: Optional[DirectMQTTClient] = None,
+        batch: bool = False,
     ):
         self.hass = hass_app
         self.base = base_topic.rstrip("/")
         self.retain = bool(retain)
+        self.delta = bool(delta)
+        self.append = bool(append)
+        self.batch = bool(batch)
+        self.qos = int(qos)
+        self.client = client
+        self._prev: List[str] = []
 
     def send(self, lines):
-        # lines: exactly 3 strings, oldest->newest
+        # lines: max_messages strings, oldest->newest
+        lines = [l or "" for l in lines]
+        prev = self._prev
+        if self.delta and lines == prev:
+            return
+
         # Publish JSON array as canonical
+        ts = int(datetime.now(tz=timezone.utc).timestamp())
         payload = json.dumps(
-            [
-                {
-                    "text": (l or ""),
-                    "ts": int(datetime.now(tz=timezone.utc).timestamp()),
-                }
-                for l in lines
-            ],
+            [{"text": l, "ts": ts} for l in lines],
             ensure_ascii=False,
         )
+        self._publish(f"{self.base}/last3", payload)
+        # Convenience line topics (delta mode: only the ones that changed)
+        for i, line in enumerate(lines):
+            if self.delta and i < len(prev) and prev[i] == line:
+                continue
+            self._publish(f"{self.base}/line{i + 1}", line)
+        # Only once everything went out: a failed send is retried in full
+        self._prev = lines
+
+    def send_batch(self, batch: Batch, lines: Snapshot) -> None:
+        self.send(lines)
+        # Compact topic carrying only newly arrived messages, never retained
+        if self.append:
+            for message in batch.messages:
+                for line in message.lines:
+                    self._publish(f"{self.base}/append", line, retain=False)
+        # One JSON document per flush with the new message records
+        if self.batch and (batch.messages or batch.dropped):
+            payload = json.dumps(
+                {
+                    "channel": batch.channel,
+                    "dropped": batch.dropped,
+                    "messages": [
+                        {
+                            "seq": m.seq,
+                            "channel": m.channel,
+                            "user": m.user,
+                            "text": m.msg,
+                            "ts": m.ts,
+                        }
+                        for m in batch.messages
+                    ],
+                },
+                ensure_ascii=False,
+            )
+            self._publish(f"{self.base}/batch", payload, retain=False)
+
+    def close(self) -> None:
+        if self.client:
+            self.client.close()
+
+    def _publish(self, topic: str, payload: str, retain: Optional[bool] = None):
+        retain = self.retain if retain is None else retain
+        if self.client:
+            self.client.publish(topic, payload, self.qos, retain)
+            return
         self.hass.call_service(
             "mqtt/publish",
-            topic=f"{self.base}/last3",
+            topic=topic,
             payload=payload,
-            retain=self.retain,
+            qos=self.qos,
+            retain=retain,
         )
-        # Convenience line topics
-        for i in range(3):
-            self.hass.call_service(
-                "mqtt/publish",
-                topic=f"{self.base}/line{i + 1}",
-                payload=lines[i] or "",
-                retain=self.retain,
-            )
@@ -0,0 +1,191 @@
+# SPDX-FileCopyrightText: 2025 Aaron White <w531t4@gmail.com>
+# SPDX-License-Identifier: MIT
+"""
+On-demand profiling of a running bridge.
+
+A capture runs for N seconds on its own thread and writes two files to the
+chosen directory:
+- `profile-<time>.folded`: stacks sampled from every thread every
+  `sample_ms`, in the folded format flamegraph.pl and speedscope read
+- `profile-<time>.txt`: span timings of the hot paths (IRC loop, pubmsg
+  handling, emits, each transport send), the most sampled functions and
+  the largest allocation growth seen by tracemalloc
+
+Nothing runs between captures: the hot paths only check `spans` for None.
+"""
+
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from pathlib import Path
+from types import FrameType
+from typing import Dict, List, Optional
+
+from twitch_fetchchat.hasslog import HassLog
+
+# stored durations per span name (percentiles use the first ones)
+_SPAN_SAMPLES = 100_000
+_TOP = 25
+
+
+class SpanLog:
+    """Durations of named hot-path sections during one capture"""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._samples: Dict[str, List[float]] = {}
+        self._counts: Counter[str] = Counter()
+        self._totals: Dict[str, float] = {}
+        self._max: Dict[str, float] = {}
+
+    def add(self, name: str, seconds: float) -> None:
+        """record one pass through `name`"""
+        with self._lock:
+            self._counts[name] += 1
+            self._totals[name] = self._totals.get(name, 0.0) + seconds
+            self._max[name] = max(self._max.get(name, 0.0), seconds)
+            samples = self._samples.setdefault(name, [])
+            if len(samples) < _SPAN_SAMPLES:
+                samples.append(seconds)
+
+    def report(self) -> List[str]:
+        """one line per span: count, total, avg, p50, p99, max (ms)"""
+        out = [
+            f"{'span':<28}{'count':>9}{'total':>11}{'avg':>9}"
+            f"{'p50':>9}{'p99':>9}{'max':>9}"
+        ]
+        with self._lock:
+            for name, count in self._counts.most_common():
+                samples = sorted(self._samples[name])
+                p50 = samples[len(samples) // 2]
+                p99 = samples[min(len(samples) - 1, int(len(samples) * 0.99))]
+                out.append(
+                    f"{name:<28}{count:>9}{1000 * self._totals[name]:>11.1f}"
+                    f"{1000 * self._totals[name] / count:>9.3f}{1000 * p50:>9.3f}"
+                    f"{1000 * p99:>9.3f}{1000 * self._max[name]:>9.3f}"
+                )
+        return out
+
+
+# The running capture's span log; None (the hot paths' only check) otherwise
+spans: SpanLog | None = None
+
+
+def _folded(thread: str, frame: Optional[FrameType]) -> str:
+    """`thread;outer;...;inner` for one sampled stack"""
+    names = []
+    while frame is not None:
+        code = frame.f_code
+        names.append(
+            f"{code.co_name} ({os.path.basename(code.co_filename)}:"
+            f"{code.co_firstlineno})"
+        )
+        frame = frame.f_back
+    names.append(thread)
+    return ";".join(reversed(names))
+
+
+class Profiler:
+    """
+    One capture at a time: sampling profiler + tracemalloc + span timing
+    - start() returns at once; the capture stops itself after `seconds`
+      or at stop(), then writes its files
+    - tracemalloc is only stopped again if the capture started it
+    """
+
+    def __init__(self, logger: HassLog) -> None:
+        self.log = logger
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self, directory: str, seconds: int, sample_ms: int) -> bool:
+        """begin a capture; False if one is already running"""
+        if self.running:
+            return False
+        self._stop.clear()
+        self._thread = threading.Thread(
+            target=self._capture,
+            args=(Path(directory), seconds, sample_ms / 1000),
+            name="profiler",
+            daemon=True,
+        )
+        self._thread.start()
+        return True
+
+    def stop(self) -> None:
+        """end a running capture early (its files are still written)"""
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=10)
+            self._thread = None
+
+    def _capture(self, directory: Path, seconds: int, interval_s: float) -> None:
+        global spans  # pylint: disable=global-statement
+        self.log(f"profiling for {seconds}s (sampling every {interval_s * 1000:g} ms)")
+        own_tracing = not tracemalloc.is_tracing()
+        if own_tracing:
+            tracemalloc.start(10)
+        before = tracemalloc.take_snapshot()
+        log = spans = SpanLog()
+
+        me = threading.get_ident()
+        names: Dict[int, str] = {}
+        stacks: Counter[str] = Counter()
+        samples = 0
+        started = time.monotonic()
+        deadline = started + seconds
+        try:
+            while not self._stop.wait(interval_s) and time.monotonic() < deadline:
+                for ident, frame in sys._current_frames().items():
+                    if ident == me:
+                        continue
+                    if ident not in names:
+                        names = {t.ident or 0: t.name for t in threading.enumerate()}
+                    stacks[_folded(names.get(ident, str(ident)), frame)] += 1
+                samples += 1
+        finally:
+            spans = None
+            elapsed = time.monotonic() - started
+            after = tracemalloc.take_snapshot()
+            peak = tracemalloc.get_traced_memory()[1]
+            if own_tracing:
+                tracemalloc.stop()
+
+        ignore = [tracemalloc.Filter(False, tracemalloc.__file__)]
+        growth = after.filter_traces(ignore).compare_to(
+            before.filter_traces(ignore), "lineno"
+        )
+        leaves: Counter[str] = Counter()
+        for stack, count in stacks.items():
+            leaves[stack.rsplit(";", 1)[-1]] += count
+
+        report = [
+            f"duration {elapsed:.1f}s, {samples} samples every "
+            f"{interval_s * 1000:g} ms, traced memory peak {peak / 2**20:.1f} MiB",
+            "",
+            *log.report(),
+            "",
+            "most sampled functions (any thread, incl. idle waits):",
+            *(f"{count:>8}  {name}" for name, count in leaves.most_common(_TOP)),
+            "",
+            "largest allocation growth:",
+            *(str(stat) for stat in growth[:_TOP]),
+        ]
+        stem = directory / time.strftime("profile-%Y%m%d-%H%M%S")
+        try:
+            directory.mkdir(parents=True, exist_ok=True)
+            with open(f"{stem}.folded", "w", encoding="utf-8") as f:
+                f.writelines(f"{stack} {count}\n" for stack, count in stacks.items())
+            with open(f"{stem}.txt", "w", encoding="utf-8") as f:
+                f.write("\n".join(report) + "\n")
+        except OSError as e:
+            self.log(f"profile write error: {e}", level="ERROR")
+            return
+        self.log(f"profile written to {stem}.txt / {stem}.folded")
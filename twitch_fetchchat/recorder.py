@@ -0,0 +1,471 @@
+# SPDX-FileCopyrightText: 2025 Aaron White <w531t4@gmail.com>
+# SPDX-License-Identifier: MIT
+"""
+Append-only chat recording.
+
+A recording is a directory of segments, `chat-<start unix ms>.seg`, each a
+run of zlib-compressed blocks, plus a sparse index, `<segment>.idx`, with one
+entry per block: (first ms, last ms, offset, record count). Readers mmap the
+segment and bisect the index, so a time-window query only inflates the
+blocks that overlap it. Blocks a crash left out of the index are recovered
+by walking the (uncompressed) block headers.
+
+Besides chat lines, CLEARCHAT/CLEARMSG/ROOMSTATE are recorded, each with
+the RECORDED_TAGS it carried, so a replay filters, renders and moderates
+like the live stream did.
+
+    python -m twitch_fetchchat.recorder DIR [--channel X] [--start T] [--end T]
+"""
+
+import argparse
+import mmap
+import os
+import struct
+import threading
+import time
+import zlib
+from bisect import bisect_left
+from collections import deque
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Iterator, List, NamedTuple, Optional, Tuple
+
+from twitch_fetchchat.fastparse import escape_tag
+from twitch_fetchchat.filters import TagGetter, no_tags
+from twitch_fetchchat.hasslog import HassLog
+from twitch_fetchchat.message import ChatMessage
+
+# block header: magic, record count, first ms, last ms, compressed length
+_BLOCK = struct.Struct("!4sIQQI")
+_BLOCK_MAGIC = b"TCB2"
+# record: unix ms, command, channel/user/msg/tags byte lengths, then the
+# UTF-8 bytes
+_RECORD = struct.Struct("!QBBBHH")
+_COMMANDS = ("PRIVMSG", "CLEARCHAT", "CLEARMSG", "ROOMSTATE")
+# what the filters, the renderer and the moderation handlers read; the rest
+# of a line's tags (display-name, color, user-id, ...) is not kept
+RECORDED_TAGS = (
+    "id", "badges", "mod", "vip", "subscriber", "bits", "first-msg", "emotes",
+    "target-msg-id", "emote-only", "followers-only", "r9k", "slow", "subs-only",
+)  # fmt: skip
+# index entry: first ms, last ms, block offset, record count
+_INDEX = struct.Struct("!QQQI")
+
+
+class RecordedMessage(NamedTuple):
+    """one chat line (or moderation command) read back from a recording"""
+
+    ts_ms: int
+    channel: str  # without "#"
+    user: str  # "" for moderation commands
+    msg: str  # moderation: the trailing parameter (banned user, deleted text)
+    command: str = "PRIVMSG"
+    tags: str = ""  # raw IRCv3 tag string, RECORDED_TAGS only
+
+
+# queued by append(): a RecordedMessage whose tags are still a TagGetter
+_Pending = Tuple[int, str, str, str, str, TagGetter]
+
+
+def _now_ms() -> int:
+    return time.time_ns() // 1_000_000
+
+
+def _raw_tags(tag: TagGetter) -> str:
+    """the RECORDED_TAGS `tag` knows, as an IRCv3 tag string"""
+    if tag is no_tags:
+        return ""
+    out = []
+    for key in RECORDED_TAGS:
+        value = tag(key)
+        if value is not None:
+            out.append(f"{key}={escape_tag(value)}")
+    return ";".join(out)
+
+
+def _pack_block(records: List[RecordedMessage]) -> bytes:
+    parts = []
+    for rec in records:
+        channel = rec.channel.encode("utf-8", errors="replace")[:0xFF]
+        user = rec.user.encode("utf-8", errors="replace")[:0xFF]
+        msg = rec.msg.encode("utf-8", errors="replace")[:0xFFFF]
+        tags = rec.tags.encode("utf-8", errors="replace")[:0xFFFF]
+        parts.append(
+            _RECORD.pack(
+                rec.ts_ms,
+                _COMMANDS.index(rec.command),
+                len(channel),
+                len(user),
+                len(msg),
+                len(tags),
+            )
+        )
+        parts.extend((channel, user, msg, tags))
+    payload = zlib.compress(b"".join(parts), 6)
+    header = _BLOCK.pack(
+        _BLOCK_MAGIC, len(records), records[0].ts_ms, records[-1].ts_ms, len(payload)
+    )
+    return header + payload
+
+
+def _unpack_block(data: bytes) -> Iterator[RecordedMessage]:
+    def text(offset: int, length: int) -> str:
+        return data[offset : offset + length].decode("utf-8", "replace")
+
+    offset = 0
+    while offset < len(data):
+        ts_ms, command, n_channel, n_user, n_msg, n_tags = _RECORD.unpack_from(
+            data, offset
+        )
+        offset += _RECORD.size
+        channel = text(offset, n_channel)
+        offset += n_channel
+        user = text(offset, n_user)
+        offset += n_user
+        msg = text(offset, n_msg)
+        offset += n_msg
+        tags = text(offset, n_tags)
+        offset += n_tags
+        yield RecordedMessage(ts_ms, channel, user, msg, _COMMANDS[command], tags)
+
+
+class ChatRecorder:
+    """
+    Background writer for ingested chat
+    - `append`/`append_command` only queue (safe to call from the IRC
+      thread); tags are looked up on the writer thread
+    - At most `max_pending` records wait for the writer; beyond that (a
+      stalled disk) new ones are dropped and counted in `dropped`
+    - Blocks are compressed and written every `block_records` messages or
+      `flush_s` seconds, whichever comes first
+    - Segments rotate at `segment_bytes` or `segment_s`; with `max_segments`
+      the oldest are deleted
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        logger: HassLog,
+        segment_bytes: int = 16 * 2**20,
+        segment_s: int = 3600,
+        max_segments: int = 0,
+        block_records: int = 256,
+        flush_s: float = 1.0,
+        max_pending: int = 65536,
+    ) -> None:
+        self.directory = Path(directory)
+        self.log = logger
+        self.segment_bytes = segment_bytes
+        self.segment_s = segment_s
+        self.max_segments = max_segments
+        self.block_records = block_records
+        self.flush_s = flush_s
+        self.max_pending = max_pending
+        self._pending: deque[_Pending] = deque()
+        self._cond = threading.Condition()
+        self._stop_flag = False
+        self._thread: threading.Thread | None = None
+        self._seg = None
+        self._idx = None
+        self._seg_started = 0.0
+        self.recorded = 0
+        self.dropped = 0
+        self._dropped_logged = 0
+
+    def start(self) -> None:
+        """create the directory and start the writer thread"""
+        if self._thread:
+            return
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self._stop_flag = False
+        self._thread = threading.Thread(target=self._run, name="recorder", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """flush what is queued and close the open segment"""
+        with self._cond:
+            self._stop_flag = True
+            self._cond.notify()
+        if self._thread:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    def append(self, item: ChatMessage, tag: TagGetter = no_tags) -> None:
+        """queue one ingested message (stamped with the current unix ms)"""
+        self._queue((_now_ms(), item.channel, item.user, item.msg, "PRIVMSG", tag))
+
+    def append_command(
+        self, command: str, channel: str, arg: Optional[str], tag: TagGetter
+    ) -> None:
+        """queue a CLEARCHAT/CLEARMSG/ROOMSTATE for `channel` (without "#")"""
+        self._queue((_now_ms(), channel, "", arg or "", command, tag))
+
+    def _queue(self, entry: _Pending) -> None:
+        with self._cond:
+            if len(self._pending) >= self.max_pending:
+                self.dropped += 1
+                return
+            self._pending.append(entry)
+            if len(self._pending) >= self.block_records:
+                self._cond.notify()
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                if len(self._pending) < self.block_records and not self._stop_flag:
+                    self._cond.wait(self.flush_s)
+                stopping = self._stop_flag
+                pending, self._pending = self._pending, deque()
+                dropped = self.dropped
+            # tags are looked up outside the lock: append() must never wait
+            batch = [
+                RecordedMessage(ts_ms, channel, user, msg, command, _raw_tags(tag))
+                for ts_ms, channel, user, msg, command, tag in pending
+            ]
+            if dropped != self._dropped_logged:
+                self.log(
+                    f"recorder falling behind: {dropped - self._dropped_logged} "
+                    f"messages dropped ({dropped} total)",
+                    level="WARNING",
+                )
+                self._dropped_logged = dropped
+            try:
+                for i in range(0, len(batch), self.block_records):
+                    self._write_block(batch[i : i + self.block_records])
+            except OSError as e:
+                self.log(f"recorder write error: {e}", level="ERROR")
+            if stopping:
+                self._close_segment()
+                return
+
+    # -------------------- Segments --------------------
+    def _write_block(self, records: List[RecordedMessage]) -> None:
+        if self._seg and (
+            self._seg.tell() >= self.segment_bytes
+            or time.monotonic() - self._seg_started >= self.segment_s
+        ):
+            self._close_segment()
+        if not self._seg:
+            self._open_segment(records[0].ts_ms)
+        assert self._seg and self._idx
+        offset = self._seg.tell()
+        self._seg.write(_pack_block(records))
+        self._seg.flush()
+        # index after data: a crash leaves at most an unindexed block behind
+        self._idx.write(
+            _INDEX.pack(records[0].ts_ms, records[-1].ts_ms, offset, len(records))
+        )
+        self._idx.flush()
+        self.recorded += len(records)
+
+    def _open_segment(self, start_ms: int) -> None:
+        path = self.directory / f"chat-{start_ms:013d}.seg"
+        self._seg = open(path, "ab")  # pylint: disable=consider-using-with
+        self._idx = open(f"{path}.idx", "ab")  # pylint: disable=consider-using-with
+        self._seg_started = time.monotonic()
+        self._prune()
+
+    def _close_segment(self) -> None:
+        for f in (self._seg, self._idx):
+            if f:
+                f.close()
+        self._seg = self._idx = None
+
+    def _prune(self) -> None:
+        if not self.max_segments:
+            return
+        for path in sorted(self.directory.glob("chat-*.seg"))[: -self.max_segments]:
+            for victim in (path, Path(f"{path}.idx")):
+                try:
+                    victim.unlink()
+                except FileNotFoundError:
+                    pass
+
+
+class Segment:
+    """Read-only, memory-mapped view of one segment file"""
+
+    def __init__(self, path: Path) -> None:
+        self.path = path
+        with open(path, "rb") as f:
+            size = os.fstat(f.fileno()).st_size
+            self._mm = (
+                mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if size else None
+            )
+        self.index = self._load_index(size)
+        self._last_ms = [entry[1] for entry in self.index]
+
+    @property
+    def first_ms(self) -> int:
+        return self.index[0][0] if self.index else 0
+
+    @property
+    def last_ms(self) -> int:
+        return max(self._last_ms) if self.index else 0
+
+    def _load_index(self, size: int) -> List[Tuple[int, int, int, int]]:
+        if self._mm is None:
+            return []
+        index = []
+        try:
+            raw = Path(f"{self.path}.idx").read_bytes()
+        except FileNotFoundError:
+            raw = b""
+        for i in range(len(raw) // _INDEX.size):
+            entry = _INDEX.unpack_from(raw, i * _INDEX.size)
+            if entry[2] + _BLOCK.size > size:
+                break
+            index.append(entry)
+        # recover blocks written after the last index entry
+        offset = 0
+        if index:
+            offset = index[-1][2] + _BLOCK.size + self._header(index[-1][2])[4]
+        while offset + _BLOCK.size <= size:
+            magic, count, first, last, length = self._header(offset)
+            if magic != _BLOCK_MAGIC or offset + _BLOCK.size + length > size:
+                break  # torn tail
+            index.append((first, last, offset, count))
+            offset += _BLOCK.size + length
+        return index
+
+    def _header(self, offset: int) -> Tuple[bytes, int, int, int, int]:
+        assert self._mm is not None
+        return _BLOCK.unpack_from(self._mm, offset)
+
+    def query(
+        self,
+        channel: Optional[str] = None,
+        start_ms: int = 0,
+        end_ms: Optional[int] = None,
+    ) -> Iterator[RecordedMessage]:
+        """messages in [start_ms, end_ms], optionally for one channel"""
+        if self._mm is None:
+            return
+        # blocks are in time order; skip those that end before the window
+        for first, last, offset, _ in self.index[
+            bisect_left(self._last_ms, start_ms) :
+        ]:
+            if end_ms is not None and first > end_ms:
+                break
+            if last < start_ms:
+                continue
+            length = self._header(offset)[4]
+            data = zlib.decompress(
+                self._mm[offset + _BLOCK.size : offset + _BLOCK.size + length]
+            )
+            for rec in _unpack_block(data):
+                if rec.ts_ms < start_ms or (end_ms is not None and rec.ts_ms > end_ms):
+                    continue
+                if channel is None or rec.channel == channel:
+                    yield rec
+
+    def close(self) -> None:
+        """release the mapping"""
+        if self._mm is not None:
+            self._mm.close()
+            self._mm = None
+
+
+class Recording:
+    """All segments of a recording directory, queried as one timeline"""
+
+    def __init__(self, directory: str) -> None:
+        self.directory = Path(directory)
+        self.segments = [Segment(p) for p in sorted(self.directory.glob("chat-*.seg"))]
+
+    def query(
+        self,
+        channel: Optional[str] = None,
+        start_ms: int = 0,
+        end_ms: Optional[int] = None,
+    ) -> Iterator[RecordedMessage]:
+        """messages in [start_ms, end_ms] across segments, oldest first"""
+        for seg in self.segments:
+            if not seg.index or seg.last_ms < start_ms:
+                continue
+            if end_ms is not None and seg.first_ms > end_ms:
+                break
+            yield from seg.query(channel, start_ms, end_ms)
+
+    def close(self) -> None:
+        """release every mapping"""
+        for seg in self.segments:
+            seg.close()
+
+
+class ReplaySource:
+    """
+    Feeds a recording to `sink(record)` paced by the recorded timestamps:
+    speed 1 is real time, 2 twice as fast, 0 as fast as possible.
+    """
+
+    def __init__(
+        self,
+        recording: Recording,
+        sink: Callable[[RecordedMessage], None],
+        speed: float = 1.0,
+        channel: Optional[str] = None,
+        start_ms: int = 0,
+        end_ms: Optional[int] = None,
+    ) -> None:
+        self.recording = recording
+        self.sink = sink
+        self.speed = speed
+        self.channel = channel
+        self.start_ms = start_ms
+        self.end_ms = end_ms
+
+    def run(self, stop: threading.Event) -> int:
+        """replay once (until done or `stop` is set); returns messages fed"""
+        fed = 0
+        # (first recorded ms, monotonic time it was fed)
+        base: Optional[Tuple[int, float]] = None
+        for rec in self.recording.query(self.channel, self.start_ms, self.end_ms):
+            if self.speed > 0:
+                if base is None:
+                    base = rec.ts_ms, time.monotonic()
+                due = base[1] + (rec.ts_ms - base[0]) / 1000 / self.speed
+                delay = due - time.monotonic()
+                if delay > 0 and stop.wait(delay):
+                    break
+            if stop.is_set():
+                break
+            self.sink(rec)
+            fed += 1
+        return fed
+
+
+def _parse_time(value: str) -> int:
+    """unix seconds/ms or ISO-8601 (local time unless an offset is given)"""
+    try:
+        number = float(value)
+        return int(number if number > 1e11 else number * 1000)
+    except ValueError:
+        return int(datetime.fromisoformat(value).timestamp() * 1000)
+
+
+def main() -> None:
+    """print recorded chat, optionally filtered by channel and time"""
+    parser = argparse.ArgumentParser(description="query a chat recording")
+    parser.add_argument("directory")
+    parser.add_argument("--channel")
+    parser.add_argument("--start", type=_parse_time, default=0)
+    parser.add_argument("--end", type=_parse_time)
+    args = parser.parse_args()
+
+    recording = Recording(args.directory)
+    try:
+        for rec in recording.query(args.channel, args.start, args.end):
+            stamp = datetime.fromtimestamp(rec.ts_ms / 1000).isoformat(
+                timespec="milliseconds"
+            )
+            if rec.command == "PRIVMSG":
+                print(f"{stamp} #{rec.channel} {rec.user}: {rec.msg}")
+            else:
+                print(f"{stamp} #{rec.channel} {rec.command} {rec.msg}".rstrip())
+    finally:
+        recording.close()
+
+
+if __name__ == "__main__":
+    main()
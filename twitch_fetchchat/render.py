@@ -0,0 +1,272 @@
+# SPDX-FileCopyrightText: 2025 Aaron White <w531t4@gmail.com>
+# SPDX-License-Identifier: MIT
+import unicodedata
+from functools import lru_cache
+from typing import Iterator, List, Optional, Sequence, Tuple
+
+from twitch_fetchchat.filters import TagGetter, no_tags
+
+_ZWJ = "\u200d"
+_VS16 = "\ufe0f"  # emoji presentation
+
+# Hangul jamo / syllable classes for cluster joining
+_L, _V, _T, _LV, _LVT = range(1, 6)
+
+# Characters with no direct NFKD decomposition to ASCII
+_ASCII_MAP = {
+    "ß": "ss", "æ": "ae", "Æ": "AE", "œ": "oe", "Œ": "OE", "ø": "o", "Ø": "O",
+    "đ": "d", "Đ": "D", "ł": "l", "Ł": "L", "þ": "th", "Þ": "Th", "ð": "d",
+    "ı": "i", "‘": "'", "’": "'", "‚": ",", "“": '"', "”": '"', "„": '"',
+    "«": '"', "»": '"', "–": "-", "—": "-", "−": "-", "…": "...", "•": "*",
+    "·": ".", "€": "EUR", "£": "GBP", "¥": "JPY", "©": "(c)", "®": "(R)",
+    "™": "TM", "°": "deg", "×": "x", "÷": "/",
+}  # fmt: skip
+
+
+def _regional(ch: str) -> bool:
+    return 0x1F1E6 <= ord(ch) <= 0x1F1FF
+
+
+def _hangul(cp: int) -> int:
+    if 0x1100 <= cp <= 0x115F or 0xA960 <= cp <= 0xA97C:
+        return _L
+    if 0x1160 <= cp <= 0x11A7 or 0xD7B0 <= cp <= 0xD7C6:
+        return _V
+    if 0x11A8 <= cp <= 0x11FF or 0xD7CB <= cp <= 0xD7FB:
+        return _T
+    if 0xAC00 <= cp <= 0xD7A3:
+        return _LV if (cp - 0xAC00) % 28 == 0 else _LVT
+    return 0
+
+
+@lru_cache(maxsize=4096)
+def _extends(ch: str) -> bool:
+    """does `ch` attach to the preceding character"""
+    cp = ord(ch)
+    return (
+        unicodedata.category(ch) in ("Mn", "Me", "Mc")
+        or ch == _ZWJ
+        or 0xFE00 <= cp <= 0xFE0F  # variation selectors
+        or 0x1F3FB <= cp <= 0x1F3FF  # emoji skin tones
+        or 0xE0000 <= cp <= 0xE01EF  # tags, Twitch's dedup marker, VS17+
+    )
+
+
+def graphemes(text: str) -> Iterator[str]:
+    """
+    User-perceived characters: a base plus combining marks, variation
+    selectors, skin tones and ZWJ emoji sequences, flag pairs and Hangul
+    syllable blocks (the common cases of UAX #29, without a Unicode db).
+    """
+    if text.isascii():
+        yield from text
+        return
+    start = 0
+    prev = text[0]
+    regional = _regional(prev)  # run of flag letters so far
+    for i in range(1, len(text)):
+        ch = text[i]
+        if _extends(ch) or prev == _ZWJ:
+            joins = True
+        elif _regional(ch):
+            joins = regional % 2 == 1  # second letter of a flag
+            regional += 1
+        else:
+            a, b = _hangul(ord(prev)), _hangul(ord(ch))
+            joins = (
+                (a == _L and b in (_L, _V, _LV, _LVT))
+                or (a in (_V, _LV) and b in (_V, _T))
+                or (a in (_T, _LVT) and b == _T)
+            )
+            regional = 0
+        if not joins:
+            yield text[start:i]
+            start = i
+        prev = ch
+    yield text[start:]
+
+
+@lru_cache(maxsize=4096)
+def _char_width(ch: str) -> int:
+    if unicodedata.category(ch) in ("Mn", "Me", "Cf", "Cc") or _extends(ch):
+        return 0
+    return 2 if unicodedata.east_asian_width(ch) in ("W", "F") else 1
+
+
+def cell_width(cluster: str) -> int:
+    """Display cells of one grapheme cluster (0, 1 or 2)."""
+    width = _char_width(cluster[0])
+    if len(cluster) > 1 and width == 1:
+        # text-default symbols turned emoji, and flag pairs, are wide
+        if _VS16 in cluster or _regional(cluster[0]):
+            return 2
+    return width
+
+
+def text_width(text: str) -> int:
+    """Display cells of a whole string."""
+    if text.isascii():
+        return len(text)
+    return sum(cell_width(g) for g in graphemes(text))
+
+
+def fit(text: str, cells: int) -> str:
+    """Longest prefix of whole graphemes that fits in `cells` display cells."""
+    if text.isascii():
+        return text[:cells]
+    used = end = 0
+    for g in graphemes(text):
+        used += cell_width(g)
+        if used > cells:
+            break
+        end += len(g)
+    return text[:end]
+
+
+def clip(text: str, max_chars: int) -> str:
+    """At most `max_chars` code points, never splitting a grapheme."""
+    if len(text) <= max_chars or text.isascii():
+        return text[:max_chars]
+    end = 0
+    for g in graphemes(text):
+        if end + len(g) > max_chars:
+            break
+        end += len(g)
+    return text[:end]
+
+
+def encode_lines(
+    lines: Sequence[Optional[str]], max_chars: Optional[int]
+) -> List[bytes]:
+    """
+    UTF-8 display lines for a byte transport, clipped to `max_chars`;
+    a Snapshot's pre-encoded `data` is reused unless clipping changes a line.
+    """
+    cached = getattr(lines, "data", None)
+    encoded = []
+    for i, s in enumerate(lines):
+        s = s or ""
+        if max_chars and len(s) > max_chars:
+            encoded.append(clip(s, max_chars).encode("utf-8", "replace"))
+        elif cached is not None:
+            encoded.append(cached[i])
+        else:
+            encoded.append(s.encode("utf-8", errors="replace"))
+    return encoded
+
+
+def wrap(text: str, cells: int) -> List[str]:
+    """Break `text` into rows of at most `cells`, at spaces where possible."""
+    rows: List[str] = []
+    row: List[Tuple[str, int]] = []
+    width = 0
+    space = -1  # index in row just after the last space
+    for g in graphemes(text):
+        w = cell_width(g)
+        if width + w > cells and row:
+            if g == " ":
+                rows.append("".join(c for c, _ in row).rstrip())
+                row, width, space = [], 0, -1
+                continue
+            carry = row[space:] if space > 0 else []
+            rows.append("".join(c for c, _ in row[: len(row) - len(carry)]).rstrip())
+            row, width, space = carry, sum(cw for _, cw in carry), -1
+        if w > cells:
+            continue  # wider than a whole row
+        row.append((g, w))
+        width += w
+        if g == " ":
+            space = len(row)
+    if row:
+        rows.append("".join(c for c, _ in row).rstrip())
+    return rows or [""]
+
+
+def strip_emotes(msg: str, emotes: Optional[str]) -> str:
+    """
+    Remove emote names using the IRCv3 `emotes` tag
+    ("<id>:<start>-<end>,<start>-<end>/<id>:..." in code point offsets).
+    A message that is nothing but emotes is returned unchanged.
+    """
+    if not emotes:
+        return msg
+    keep = [True] * len(msg)
+    try:
+        for emote in emotes.split("/"):
+            for span in emote.partition(":")[2].split(","):
+                first, _, last = span.partition("-")
+                for i in range(int(first), min(int(last) + 1, len(msg))):
+                    keep[i] = False
+    except ValueError:
+        return msg  # malformed tag; show the text as sent
+    out = " ".join("".join(c for c, k in zip(msg, keep) if k).split())
+    return out or msg
+
+
+@lru_cache(maxsize=4096)
+def _ascii_char(ch: str) -> str:
+    if ch in _ASCII_MAP:
+        return _ASCII_MAP[ch]
+    plain = "".join(
+        c for c in unicodedata.normalize("NFKD", ch) if not unicodedata.combining(c)
+    )
+    if plain.isascii():
+        return plain
+    category = unicodedata.category(ch)
+    if category == "Zs":
+        return " "
+    if category[0] in "LN":
+        return "?"
+    return ""  # emoji, symbols, format characters
+
+
+def to_ascii(text: str) -> str:
+    """Transliterate for ASCII-only signs: é->e, ß->ss, “”->"", emoji dropped."""
+    if text.isascii():
+        return text
+    return " ".join("".join(_ascii_char(ch) for ch in text).split())
+
+
+class Renderer:
+    """
+    Display rows for one chat message, built once at ingest and shared by
+    every display and transport
+    - `width`: display cells per row (0 = no limit); wide CJK and emoji
+      count as 2 and graphemes are never split
+    - `wrap_rows`: continue onto further rows (at most `max_rows`) instead
+      of truncating
+    - `hide_emotes`: drop emote names using the `emotes` tag
+    - `ascii_only`: transliterate for signs without Unicode fonts
+    """
+
+    def __init__(
+        self,
+        width: int = 0,
+        wrap_rows: bool = False,
+        hide_emotes: bool = False,
+        ascii_only: bool = False,
+        max_rows: int = 3,
+    ) -> None:
+        self.width = width
+        self.wrap_rows = wrap_rows
+        self.hide_emotes = hide_emotes
+        self.ascii_only = ascii_only
+        self.max_rows = max(max_rows, 1)
+
+    @property
+    def enabled(self) -> bool:
+        """does rendering change anything"""
+        return bool(self.width or self.hide_emotes or self.ascii_only)
+
+    def render(self, user: str, msg: str, tag: TagGetter = no_tags) -> Tuple[str, ...]:
+        """rows for "user: msg", oldest->newest"""
+        if self.hide_emotes:
+            msg = strip_emotes(msg, tag("emotes"))
+        text = f"{user}: {msg}"
+        if self.ascii_only:
+            text = to_ascii(text)
+        if not self.width or (text.isascii() and len(text) <= self.width):
+            return (text,)
+        if not self.wrap_rows:
+            return (fit(text, self.width),)
+        return tuple(wrap(text, self.width)[: self.max_rows])
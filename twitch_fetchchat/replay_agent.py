@@ -0,0 +1,79 @@
+# SPDX-FileCopyrightText: 2025 Aaron White <w531t4@gmail.com>
+# SPDX-License-Identifier: MIT
+import threading
+from typing import Callable, List, Optional
+
+from twitch_fetchchat.agent_base import _AgentBase
+from twitch_fetchchat.config import IrcBridgeConfig
+from twitch_fetchchat.fastparse import RawPrivmsg
+from twitch_fetchchat.hasslog import HassLog
+from twitch_fetchchat.metrics import Metrics
+from twitch_fetchchat.recorder import RecordedMessage, Recording, ReplaySource
+
+
+class ReplayAgent(_AgentBase):
+    """
+    Offline engine (irc_engine: replay): feeds a recording made with
+    `record_dir` through the agent instead of connecting to Twitch
+    - Same switch_channel/terminate API as IRCAgent
+    - Recorded lines reach the displays watching their channel; others
+      are skipped exactly like unwatched channels on a live connection
+    - Recorded tags and CLEARCHAT/CLEARMSG/ROOMSTATE go through the same
+      filter, render and moderation stages as live ones
+    - `replay_speed` 1 is real time, N is N times faster, 0 is max speed
+    """
+
+    def __init__(
+        self,
+        config: IrcBridgeConfig,
+        logger: HassLog,
+        emit_target: Callable[[List[str]], None],
+        metrics: Optional[Metrics] = None,
+    ) -> None:
+        super().__init__(config, logger, emit_target, metrics)
+        self._irc_thread: threading.Thread | None = None
+        self._stopped = threading.Event()
+
+    def start(self) -> None:
+        """start the agent"""
+        super().start()
+        if not self._irc_thread:
+            self._irc_thread = threading.Thread(target=self._replay_loop, daemon=True)
+            self._irc_thread.start()
+
+    def terminate(self) -> None:
+        """stop replaying"""
+        super().terminate()
+        self._stopped.set()
+
+    def _channels_changed(self, idle: bool) -> None:
+        pass  # _ingest already drops lines for unwatched channels
+
+    def _endpoint_changed(self) -> None:
+        pass  # no IRC link
+
+    def _replay_loop(self) -> None:
+        recording = Recording(self.config.replay_dir)
+        try:
+            source = ReplaySource(
+                recording,
+                self._replay,
+                speed=self.config.replay_speed,
+            )
+            while not self._stopped.is_set():
+                fed = source.run(self._stopped)
+                self.log(f"replayed {fed} messages from {self.config.replay_dir}")
+                if not self.config.replay_loop or not fed:
+                    break
+        except Exception as e:
+            self.log(f"replay error: {e}", level="ERROR")
+        finally:
+            recording.close()
+
+    def _replay(self, rec: RecordedMessage) -> None:
+        channel = f"#{rec.channel}"
+        tag = RawPrivmsg(rec.tags, rec.user, channel, rec.msg).tag
+        if rec.command == "PRIVMSG":
+            self._ingest(channel, rec.user, rec.msg, tag)
+        else:
+            self._moderate(rec.command, channel, rec.msg or None, tag)
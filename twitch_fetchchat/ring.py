@@ -0,0 +1,90 @@
+# SPDX-FileCopyrightText: 2025 Aaron White <w531t4@gmail.com>
+# SPDX-License-Identifier: MIT
+from collections import OrderedDict
+from typing import Dict, Iterator
+
+from twitch_fetchchat.message import ChatMessage
+
+
+class ChatRing:
+    """
+    A channel's bounded chat buffer (oldest->newest), indexed by message id
+    and by user so moderation never scans it
+    - append() evicts the oldest message once `maxlen` is reached
+    - remove_id() (CLEARMSG) and remove_user() (CLEARCHAT ban/timeout) cost
+      O(1) per message removed, however long the buffer
+    """
+
+    __slots__ = ("maxlen", "_items", "_by_id", "_by_user", "_next")
+
+    def __init__(self, maxlen: int) -> None:
+        self.maxlen = maxlen
+        # insertion key -> message, oldest first
+        self._items: OrderedDict[int, ChatMessage] = OrderedDict()
+        self._by_id: Dict[str, int] = {}
+        # user (lowercase) -> insertion keys, as an ordered set
+        self._by_user: Dict[str, Dict[int, None]] = {}
+        self._next = 0
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def __iter__(self) -> Iterator[ChatMessage]:
+        return iter(self._items.values())
+
+    def __reversed__(self) -> Iterator[ChatMessage]:
+        return reversed(self._items.values())
+
+    def append(self, item: ChatMessage) -> None:
+        """add the newest message, evicting the oldest when full"""
+        key = self._next
+        self._next += 1
+        self._items[key] = item
+        if item.msg_id:
+            self._by_id[item.msg_id] = key
+        self._by_user.setdefault(item.user.lower(), {})[key] = None
+        while len(self._items) > self.maxlen:
+            self._forget(*self._items.popitem(last=False))
+
+    def resize(self, maxlen: int) -> None:
+        """change the capacity in place, dropping the oldest if it shrinks"""
+        self.maxlen = maxlen
+        while len(self._items) > maxlen:
+            self._forget(*self._items.popitem(last=False))
+
+    def remove_id(self, msg_id: str) -> int:
+        """drop one message by its `id` tag; the number removed (0 or 1)"""
+        key = self._by_id.pop(msg_id, None)
+        if key is None:
+            return 0
+        self._forget(key, self._items.pop(key))
+        return 1
+
+    def remove_user(self, user: str) -> int:
+        """drop all of a user's messages; the number removed"""
+        keys = self._by_user.pop(user.lower(), {})
+        for key in keys:
+            item = self._items.pop(key)
+            if item.msg_id and self._by_id.get(item.msg_id) == key:
+                del self._by_id[item.msg_id]
+        return len(keys)
+
+    def clear(self) -> int:
+        """drop everything; the number removed"""
+        removed = len(self._items)
+        self._items.clear()
+        self._by_id.clear()
+        self._by_user.clear()
+        return removed
+
+    def _forget(self, key: int, item: ChatMessage) -> None:
+        """unindex a message already taken out of _items"""
+        # a repeated msg_id (replay, restore overlapping live chat) points
+        # at the newer copy; evicting the older one must not unindex it
+        if item.msg_id and self._by_id.get(item.msg_id) == key:
+            del self._by_id[item.msg_id]
+        keys = self._by_user.get(item.user.lower())
+        if keys is not None:
+            keys.pop(key, None)
+            if not keys:
+                del self._by_user[item.user.lower()]
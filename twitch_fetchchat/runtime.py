@@ -0,0 +1,269 @@
+# SPDX-FileCopyrightText: 2025 Aaron White <w531t4@gmail.com>
+# SPDX-License-Identifier: MIT
+from __future__ import annotations
+import threading
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Any, Dict, List, Optional
+
+from twitch_fetchchat.agent_base import build_agent
+from twitch_fetchchat.config import RESTART_KEYS, IrcBridgeConfig
+from twitch_fetchchat.dispatcher import TransportDispatcher
+from twitch_fetchchat.metrics import Metrics, MetricsServer
+from twitch_fetchchat.profiling import Profiler
+from twitch_fetchchat.transports import Transport, build_output, needs_app
+
+if TYPE_CHECKING:
+    from twitch_fetchchat.agent_base import _AgentBase
+    from twitch_fetchchat.hasslog import BridgeApp
+    from twitch_fetchchat.supervisor import ShardSupervisor
+
+# Settings a display's dispatcher is built from
+DISPATCH_KEYS = ["dispatch_queue_size", "dispatch_policy", "dispatch_late_ms"]
+
+
+@dataclass
+class _Output:
+    """One display's transports (by name) behind its dispatcher"""
+
+    config: IrcBridgeConfig
+    transports: Dict[str, Transport]
+    dispatcher: TransportDispatcher
+
+
+def _sinks(cfg: IrcBridgeConfig) -> Dict[str, Dict[str, Any]]:
+    return {name: tcfg.sink_settings() for name, tcfg in cfg.transport_configs()}
+
+
+class BridgeRuntime:
+    """
+    What a bridge runs for one config: the agent, one output (transports
+    behind a dispatcher) per display and the metrics endpoint
+    - Shared by the AppDaemon app and the standalone runner; `app` supplies
+      log/error and, for the HA-backed sinks, call_service/set_state
+    - reload() applies a changed config without a restart: only displays
+      whose output settings changed get new transports (unchanged ones are
+      kept), buffers are resized in place and the IRC link is redialled
+      only when the endpoint moved; RESTART_KEYS rebuild the agent alone
+    """
+
+    def __init__(self, app: BridgeApp, config: IrcBridgeConfig) -> None:
+        self.app = app
+        self.config = config
+        self.metrics = Metrics() if config.metrics_enabled else None
+        self.metrics_server: MetricsServer | None = None
+        self.profiler = Profiler(self.log)
+        self._lock = threading.RLock()
+        self._started = False
+        self._stopped = False
+
+        displays = config.display_configs()
+        self._outputs: Dict[str, _Output] = {
+            cfg.entity_id: self._build_output(cfg) for cfg in displays
+        }
+        self.agent = self._build_agent(displays)
+
+    @property
+    def display_ids(self) -> List[str]:
+        """display keys, the config's own entity first"""
+        return list(self._outputs)
+
+    def log(self, message: str, level: str = "INFO", **kwargs: Any) -> None:
+        """log through whichever app currently owns the runtime"""
+        self.app.log(message, level=level, **kwargs)
+
+    # -------------------- Lifecycle --------------------
+    def start(self) -> None:
+        """start the metrics endpoint and the agent (once)"""
+        with self._lock:
+            if self._started:
+                return
+            self._started = True
+            self._start_metrics_server()
+            self.agent.start()
+
+    def terminate(self) -> None:
+        """stop the agent, dispatchers, transports and endpoint (once)"""
+        with self._lock:
+            if self._stopped:
+                return
+            self._stopped = True
+            self.profiler.stop()
+            self.agent.terminate()
+            for output in self._outputs.values():
+                self.log(f"dispatch stats: {output.dispatcher.stats()}")
+                self._close(output)
+            self._stop_metrics_server()
+
+    def park(self) -> None:
+        """
+        The app is going away but may hand the runtime to its successor:
+        stop every dispatcher and close the sinks that call into the app.
+        The agent keeps its link and buffers; reload(rebind=True) builds
+        the outputs again, terminate() shuts down the rest.
+        """
+        with self._lock:
+            for output in self._outputs.values():
+                output.dispatcher.stop()
+                for name, tcfg in output.config.transport_configs():
+                    transport = output.transports.get(name)
+                    if transport is not None and needs_app(tcfg):
+                        del output.transports[name]
+                        transport.close()
+
+    def reload(self, config: IrcBridgeConfig, rebind: bool = False) -> List[str]:
+        """
+        Apply `config`; returns the names of the settings that changed.
+        `rebind`: `app` was replaced (after park()), so rebuild the sinks
+        that call into it and restart every display's dispatcher.
+        """
+        with self._lock:
+            changed = self.config.changed_fields(config)
+            if not changed and not rebind:
+                return changed
+            self.log(f"config reload: changed={changed} rebind={rebind}")
+            self.config = config
+            fresh = "metrics_enabled" in changed
+            if fresh:
+                self.metrics = Metrics() if config.metrics_enabled else None
+
+            # -------- Outputs: rebuild only what changed --------
+            displays = config.display_configs()
+            outputs: Dict[str, _Output] = {}
+            for cfg in displays:
+                old = self._outputs.pop(cfg.entity_id, None)
+                if old is None or fresh or self._output_changed(old, cfg, rebind):
+                    outputs[cfg.entity_id] = self._build_output(cfg, old, rebind)
+                else:
+                    old.config = cfg
+                    outputs[cfg.entity_id] = old
+            removed, self._outputs = self._outputs, outputs
+
+            # -------- Agent --------
+            restart = set(changed).intersection(RESTART_KEYS)
+            if restart:
+                self.log(f"rebuilding the agent for {sorted(restart)}")
+                channels = self.agent.channels()
+                self.agent.terminate()
+                self.agent = self._build_agent(displays)
+                if self._started:
+                    self.agent.start()
+                for key, channel in channels.items():
+                    if channel and key in outputs:
+                        self.agent.switch_channel(channel, display=key)
+            else:
+                self.agent.reconfigure(config)
+                for cfg in displays:
+                    self.agent.add_display(
+                        cfg.entity_id,
+                        outputs[cfg.entity_id].dispatcher.submit,
+                        cfg.max_messages,
+                    )
+                for key in removed:
+                    self.agent.remove_display(key)
+            for output in removed.values():
+                self._close(output)
+
+            if self._started and (
+                fresh or {"metrics_port", "metrics_bind"}.intersection(changed)
+            ):
+                self._stop_metrics_server()
+                self._start_metrics_server()
+            return changed
+
+    def profile(self, seconds: Optional[int] = None) -> bool:
+        """
+        Start a capture into profile_dir for `seconds` (default
+        profile_seconds); 0 ends a running one. False if nothing started.
+        """
+        if seconds is not None and seconds < 0:
+            self.log(
+                f"profile seconds must be >= 0. observed={seconds}", level="WARNING"
+            )
+            return False
+        if seconds == 0:
+            self.profiler.stop()
+            return False
+        if not self.config.profile_dir:
+            self.log("profiling needs profile_dir to be set", level="WARNING")
+            return False
+        started = self.profiler.start(
+            self.config.profile_dir,
+            seconds or self.config.profile_seconds,
+            self.config.profile_sample_ms,
+        )
+        if not started:
+            self.log("a profile capture is already running", level="WARNING")
+        return started
+
+    # -------------------- Builders --------------------
+    def _build_agent(
+        self, displays: List[IrcBridgeConfig]
+    ) -> _AgentBase | ShardSupervisor:
+        agent = build_agent(
+            self.config,
+            self.log,
+            self._outputs[displays[0].entity_id].dispatcher.submit,
+            self.metrics,
+        )
+        for cfg in displays[1:]:
+            agent.add_display(
+                cfg.entity_id,
+                self._outputs[cfg.entity_id].dispatcher.submit,
+                cfg.max_messages,
+            )
+        return agent
+
+    def _build_output(
+        self,
+        cfg: IrcBridgeConfig,
+        old: Optional[_Output] = None,
+        rebind: bool = False,
+    ) -> _Output:
+        """
+        A display's output, reusing the transports of `old` whose settings
+        are unchanged. Replaced transports are closed first so a new one
+        can bind the same port.
+        """
+        keep: Dict[str, Transport] = {}
+        if old is not None:
+            old.dispatcher.stop()
+            before, after = _sinks(old.config), _sinks(cfg)
+            tcfgs = dict(old.config.transport_configs())
+            for name, transport in old.transports.items():
+                if before[name] == after.get(name) and not (
+                    rebind and needs_app(tcfgs[name])
+                ):
+                    keep[name] = transport
+                else:
+                    transport.close()
+        transports, dispatcher = build_output(self.app, cfg, self.metrics, keep)
+        return _Output(cfg, transports, dispatcher)
+
+    @staticmethod
+    def _output_changed(old: _Output, cfg: IrcBridgeConfig, rebind: bool) -> bool:
+        if _sinks(old.config) != _sinks(cfg):
+            return True
+        if any(getattr(old.config, k) != getattr(cfg, k) for k in DISPATCH_KEYS):
+            return True
+        return rebind  # park() stopped the dispatcher
+
+    @staticmethod
+    def _close(output: _Output) -> None:
+        output.dispatcher.stop()
+        for transport in output.transports.values():
+            transport.close()
+
+    def _start_metrics_server(self) -> None:
+        if self.metrics is not None and self.config.metrics_port:
+            self.metrics_server = MetricsServer(
+                self.metrics,
+                self.log,
+                self.config.metrics_bind,
+                self.config.metrics_port,
+            )
+            self.metrics_server.start()
+
+    def _stop_metrics_server(self) -> None:
+        if self.metrics_server:
+            self.metrics_server.stop()
+            self.metrics_server = None
@@ -0,0 +1,259 @@
+# SPDX-FileCopyrightText: 2025 Aaron White <w531t4@gmail.com>
+# SPDX-License-Identifier: MIT
+"""
+Run the bridge without AppDaemon/Home Assistant.
+
+    python -m twitch_fetchchat CONFIG [--channel NAME | --channel DISPLAY=NAME]
+                                      [--stdin] [--control-port PORT]
+
+CONFIG is a JSON or TOML file holding the same settings as the AppDaemon app
+(`channel_entity_id` is optional and only names the main display). Channels
+come from --channel, from stdin lines and/or from UDP datagrams to the control
+port, all in the same form: "NAME" (main display), "DISPLAY NAME", or "-" as
+NAME to release the display. SIGHUP re-reads CONFIG and applies the changes
+without reconnecting (see BridgeRuntime.reload). SIGUSR1 starts a profile
+capture into `profile_dir`, or ends the running one.
+"""
+
+import argparse
+import json
+import logging
+import signal
+import socket
+import sys
+import threading
+from dataclasses import fields
+from pathlib import Path
+from typing import Any, List, Optional, Tuple
+
+from twitch_fetchchat.config import IrcBridgeConfig
+from twitch_fetchchat.runtime import BridgeRuntime
+from twitch_fetchchat.transports import needs_app
+
+DEFAULT_DISPLAY = "display"
+
+_LEVELS = {
+    "CRITICAL": logging.CRITICAL,
+    "ERROR": logging.ERROR,
+    "WARNING": logging.WARNING,
+    "INFO": logging.INFO,
+    "DEBUG": logging.DEBUG,
+}
+
+
+def load_config(path: Path) -> IrcBridgeConfig:
+    """IrcBridgeConfig from a .json or .toml file (AppDaemon app keys)"""
+    if path.suffix == ".toml":
+        try:
+            import tomllib  # pylint: disable=import-outside-toplevel
+        except ImportError as e:
+            raise SystemExit("TOML configs need Python 3.11+; use JSON") from e
+        args = tomllib.loads(path.read_text(encoding="utf-8"))
+    else:
+        args = json.loads(path.read_text(encoding="utf-8"))
+    args["entity_id"] = args.pop("channel_entity_id", DEFAULT_DISPLAY)
+    known = {f.name for f in fields(IrcBridgeConfig)}
+    unknown = set(args).difference(known)
+    if unknown:
+        raise ValueError(f"unknown settings in {path}: {sorted(unknown)}")
+    return IrcBridgeConfig(**args)
+
+
+def parse_command(line: str, default: str) -> Optional[Tuple[str, Optional[str]]]:
+    """("display", channel or None) from "NAME" / "DISPLAY NAME"; None if blank"""
+    words = line.replace("=", " ").split()
+    if not words or len(words) > 2:
+        return None
+    display, channel = (default, words[0]) if len(words) == 1 else words
+    channel = channel.lstrip("#").lower()
+    if channel in ("-", "none", "unknown", "unavailable"):
+        return display, None
+    return display, channel
+
+
+class StandaloneBridge:
+    """
+    TwitchIrcBridge counterpart without HA: builds the same transports and
+    dispatchers and drives the agent from channel commands. Doubles as the
+    `app` the transports log through.
+    """
+
+    def __init__(self, config: IrcBridgeConfig, path: Optional[Path] = None) -> None:
+        self.config = self._checked(config)
+        self.path = path
+        self._logger = logging.getLogger("twitch_fetchchat")
+        self._stop = threading.Event()
+        self._control: socket.socket | None = None
+        self.runtime = BridgeRuntime(self, config)
+
+    @staticmethod
+    def _checked(config: IrcBridgeConfig) -> IrcBridgeConfig:
+        """reject sinks that need Home Assistant"""
+        for cfg in config.display_configs():
+            for name, tcfg in cfg.transport_configs():
+                if needs_app(tcfg):
+                    raise ValueError(
+                        f"{cfg.entity_id}/{name} needs Home Assistant; use udp, "
+                        f"subscribe or mqtt with mqtt_client: direct"
+                    )
+        return config
+
+    @property
+    def display_ids(self) -> List[str]:
+        """display keys, the main one first"""
+        return self.runtime.display_ids
+
+    # -------------------- App interface for the transports --------------------
+    def log(self, message: str, *args: Any, level: str = "INFO", **kwargs: Any) -> None:
+        """AppDaemon-style log (extra AppDaemon arguments are ignored)"""
+        self._logger.log(_LEVELS.get(level, logging.INFO), message)
+
+    def error(
+        self, message: str, *args: Any, level: str = "ERROR", **kwargs: Any
+    ) -> None:
+        """AppDaemon-style error log"""
+        self.log(message, level=level)
+
+    def call_service(self, service: str, **kwargs: Any) -> Any:
+        """HA only; _checked keeps the sinks that call it out"""
+        raise NotImplementedError(f"{service} needs Home Assistant")
+
+    def set_state(self, entity_id: str, **kwargs: Any) -> Any:
+        """HA only; _checked keeps the sinks that call it out"""
+        raise NotImplementedError(f"set_state({entity_id}) needs Home Assistant")
+
+    def fire_event(self, event: str, **kwargs: Any) -> Any:
+        """HA only; _checked keeps the sinks that call it out"""
+        raise NotImplementedError(f"fire_event({event}) needs Home Assistant")
+
+    # -------------------- Lifecycle --------------------
+    def start(self, control_bind: str = "127.0.0.1", control_port: int = 0) -> None:
+        """start the agent, metrics and (optionally) the UDP control socket"""
+        if control_port:
+            self._control = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+            self._control.bind((control_bind, control_port))
+            self._control.settimeout(0.5)
+            threading.Thread(target=self._serve_control, daemon=True).start()
+            self.log(f"channel control on udp {control_bind}:{control_port}")
+        self.runtime.start()
+        self.log(
+            f"standalone bridge ready (engine={self.config.irc_engine}, "
+            f"displays={self.display_ids})"
+        )
+
+    def command(self, line: str) -> bool:
+        """apply one channel command; False if it was not understood"""
+        parsed = parse_command(line, self.display_ids[0])
+        if parsed is None or parsed[0] not in self.display_ids:
+            return False
+        display, channel = parsed
+        self.runtime.agent.switch_channel(channel, display=display)
+        return True
+
+    def reload(self) -> None:
+        """re-read the config file and apply what changed"""
+        if self.path is None:
+            return
+        try:
+            config = self._checked(load_config(self.path))
+        except (OSError, ValueError, TypeError) as e:
+            self.log(f"config reload failed, keeping the old one: {e}", level="ERROR")
+            return
+        self.runtime.reload(config)
+        self.config = config
+
+    def toggle_profile(self) -> None:
+        """start a profile capture, or end the one running"""
+        runtime = self.runtime
+        runtime.profile(0 if runtime.profiler.running else None)
+
+    def run(self) -> None:
+        """block until stop(), logging the metrics summary periodically"""
+        interval = self.config.metrics_interval_s or None
+        while not self._stop.wait(interval):
+            metrics = self.runtime.metrics
+            if metrics is not None:
+                self.log(f"metrics: {metrics.summary()}")
+            interval = self.config.metrics_interval_s or None
+
+    def stop(self) -> None:
+        """unblock run()"""
+        self._stop.set()
+
+    def terminate(self) -> None:
+        """shut everything down"""
+        if self._control:
+            self._control.close()
+        self.runtime.terminate()
+
+    # -------------------- Channel sources --------------------
+    def _serve_control(self) -> None:
+        sock = self._control
+        while sock is not None and not self._stop.is_set():
+            try:
+                data, addr = sock.recvfrom(512)
+            except socket.timeout:
+                continue
+            except OSError:
+                return  # closed
+            ok = self.command(data.decode("utf-8", errors="replace"))
+            try:
+                sock.sendto(b"OK\n" if ok else b"ERR\n", addr)
+            except OSError:
+                pass
+
+    def read_stdin(self) -> None:
+        """apply one command per stdin line; EOF leaves the bridge running"""
+        for line in sys.stdin:
+            if line.strip() and not self.command(line):
+                self.log(f"ignored command: {line.strip()!r}", level="WARNING")
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    """entry point for python -m twitch_fetchchat"""
+    parser = argparse.ArgumentParser(
+        prog="python -m twitch_fetchchat",
+        description=__doc__.splitlines()[1] if __doc__ else None,
+    )
+    parser.add_argument("config", type=Path, help="JSON or TOML settings file")
+    parser.add_argument(
+        "--channel",
+        action="append",
+        default=[],
+        help="NAME or DISPLAY=NAME to watch at startup (repeatable)",
+    )
+    parser.add_argument("--stdin", action="store_true", help="read commands")
+    parser.add_argument("--control-port", type=int, default=0)
+    parser.add_argument("--control-bind", default="127.0.0.1")
+    parser.add_argument("--log-level", default="INFO", choices=list(_LEVELS))
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(
+        level=_LEVELS[args.log_level],
+        format="%(asctime)s %(levelname)s %(message)s",
+    )
+    try:
+        bridge = StandaloneBridge(load_config(args.config), args.config)
+    except (OSError, ValueError, TypeError) as e:
+        raise SystemExit(f"config error: {e}") from e
+
+    for item in args.channel:
+        if not bridge.command(item):
+            raise SystemExit(f"bad --channel {item!r}")
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(sig, lambda *_: bridge.stop())
+    signal.signal(
+        signal.SIGHUP,
+        lambda *_: threading.Thread(target=bridge.reload, daemon=True).start(),
+    )
+    signal.signal(
+        signal.SIGUSR1,
+        lambda *_: threading.Thread(target=bridge.toggle_profile, daemon=True).start(),
+    )
+    bridge.start(args.control_bind, args.control_port)
+    if args.stdin:
+        threading.Thread(target=bridge.read_stdin, daemon=True).start()
+    try:
+        bridge.run()
+    finally:
+        bridge.terminate()
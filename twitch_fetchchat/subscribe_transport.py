@@ -0,0 +1,234 @@
+# SPDX-FileCopyrightText: 2025 Aaron White <w531t4@gmail.com>
+# SPDX-License-Identifier: MIT
+"""
+Pull/subscribe UDP server (transport_mode: subscribe).
+
+Display clients send "SUB" to the server port and get the current snapshot
+straight away, then every update until their lease runs out; re-sending
+"SUB" renews the lease (and resends the snapshot), "UNSUB" ends it early.
+A snapshot is far larger than a request and UDP sources are not verified,
+so the server binds to loopback by default and, given `allow`, only answers
+addresses inside those networks.
+With udp_frame v1, updates after the snapshot are deltas (FLAG_DELTA set,
+only the newly scrolled-in lines); a client that sees a sequence gap sends
+"SUB" to resync. With udp_frame text every update is a full snapshot.
+Each frame is encoded once and the same bytes go to every subscriber.
+
+    python -m twitch_fetchchat.subscribe_transport HOST [PORT]
+"""
+
+from __future__ import annotations
+import argparse
+import ipaddress
+import socket
+import threading
+import time
+from typing import Dict, List, Sequence, Tuple, TYPE_CHECKING
+
+from twitch_fetchchat.base_transport import _TransportBase
+from twitch_fetchchat.render import encode_lines
+from twitch_fetchchat.udp_transport import decode_frame, encode_frame
+
+if TYPE_CHECKING:
+    from twitch_fetchchat.hasslog import BridgeApp
+
+FLAG_DELTA = 0x01
+
+Address = Tuple[str, int]
+
+
+def frame_flags(frame: bytes) -> int:
+    """flags byte of a v1 frame (FLAG_DELTA)"""
+    return frame[3]
+
+
+def scroll_shift(prev: Sequence[bytes], lines: Sequence[bytes], added: int = 0) -> int:
+    """
+    How far the display scrolled: `added`, the rows the snapshot's batch
+    brought in, when prev[added:] == lines[:-added] agrees; otherwise the
+    smallest such m. Identical lines (a flood of one text) match at m=0,
+    so rows that were added but look unchanged count as a full redraw.
+    """
+    n = len(lines)
+    if len(prev) != n or added >= n:
+        return n
+    if added and prev[added:] == lines[: n - added]:
+        return added
+    for m in range(n + 1):
+        if prev[m:] == lines[: n - m]:
+            return m if m or not added else n
+    return n
+
+
+class SubscribeTransport(_TransportBase):
+    def __init__(
+        self,
+        logger: BridgeApp,
+        port: int,
+        bind: str = "127.0.0.1",
+        max_chars: int | None = None,
+        frame: str = "text",
+        allow: Sequence[str] = (),
+        lease_s: int = 60,
+        max_clients: int = 64,
+    ):
+        self.log = logger.log
+        self.max_chars = max_chars
+        self.frame = frame
+        self.lease_s = lease_s
+        self.max_clients = max_clients
+        self.allow = [ipaddress.ip_network(net, strict=False) for net in allow]
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sock.bind((bind, int(port)))
+        self.port = self.sock.getsockname()[1]
+        self._lock = threading.Lock()
+        # address -> lease expiry (monotonic)
+        self._clients: Dict[Address, float] = {}
+        self._lines: List[bytes] = []
+        self._seq = 0
+        self._snapshot = self._encode(self._lines, 0)
+        self._closed = False
+        self._full_logged = False
+
+        # -------- Counters --------
+        self.sent = 0
+        self.errors = 0
+
+        self.sock.settimeout(0.5)  # lets _serve notice close()
+        self._thread = threading.Thread(
+            target=self._serve, name=f"subscribe-{self.port}", daemon=True
+        )
+        self._thread.start()
+        self.log(f"subscribe server on udp {bind}:{self.port}")
+
+    def send(self, lines):
+        encoded = encode_lines(lines, self.max_chars)
+        batch = getattr(lines, "batch", None)
+        added = sum(len(m.lines) for m in batch.messages) if batch else 0
+        with self._lock:
+            shift = scroll_shift(self._lines, encoded, added)
+            if shift == 0:
+                return  # unchanged
+            self._seq = (self._seq + 1) & 0xFFFFFFFF
+            self._lines = encoded
+            self._snapshot = self._encode(encoded, 0)
+            payload = self._snapshot
+            if self.frame == "v1" and shift < len(encoded):
+                payload = self._encode(encoded[len(encoded) - shift :], FLAG_DELTA)
+            clients = self._live(time.monotonic())
+        for addr in clients:
+            self._sendto(payload, addr)
+
+    def close(self) -> None:
+        self._closed = True
+        self.sock.close()
+
+    def stats(self) -> Dict[str, int]:
+        """subscriber count and send totals"""
+        with self._lock:
+            return {
+                "clients": len(self._live(time.monotonic())),
+                "sent": self.sent,
+                "errors": self.errors,
+            }
+
+    def _encode(self, lines: Sequence[bytes], flags: int) -> bytes:
+        if self.frame == "v1":
+            return encode_frame(self._seq, int(time.time() * 1000), lines, flags)
+        return b"\n".join(lines)
+
+    def _live(self, now: float) -> List[Address]:
+        """drop lapsed leases and list the rest (lock held)"""
+        expired = [addr for addr, until in self._clients.items() if until <= now]
+        for addr in expired:
+            del self._clients[addr]
+        return list(self._clients)
+
+    def _sendto(self, payload: bytes, addr: Address) -> None:
+        try:
+            self.sock.sendto(payload, addr)
+            self.sent += 1
+        except OSError as e:
+            self.errors += 1
+            if self.errors == 1:
+                self.log(f"subscribe send to {addr} failed: {e}", level="ERROR")
+
+    def _allowed(self, host: str) -> bool:
+        ip = ipaddress.ip_address(host)
+        return any(ip in net for net in self.allow)
+
+    def _serve(self) -> None:
+        """answer SUB/UNSUB requests until close()"""
+        while not self._closed:
+            try:
+                request, addr = self.sock.recvfrom(512)
+            except OSError:
+                if self._closed:
+                    return
+                continue
+            if self.allow and not self._allowed(addr[0]):
+                continue  # never answer (or amplify towards) other sources
+            command = request.strip().upper()
+            now = time.monotonic()
+            with self._lock:
+                if command == b"UNSUB":
+                    self._clients.pop(addr, None)
+                    continue
+                if command != b"SUB":
+                    continue
+                if addr not in self._clients:
+                    self._live(now)
+                    if len(self._clients) >= self.max_clients:
+                        if not self._full_logged:
+                            self.log(
+                                f"subscribe server full ({self.max_clients} "
+                                f"clients); ignoring {addr}",
+                                level="WARNING",
+                            )
+                            self._full_logged = True
+                        continue
+                    self._full_logged = False
+                self._clients[addr] = now + self.lease_s
+                snapshot = self._snapshot
+            self._sendto(snapshot, addr)
+
+
+def main() -> None:
+    """entry point: subscribe and print what a v1 display would show"""
+    parser = argparse.ArgumentParser(description="twitch_fetchchat subscriber")
+    parser.add_argument("host")
+    parser.add_argument("port", type=int, nargs="?", default=7778)
+    parser.add_argument("--renew", type=float, default=30, help="seconds")
+    args = parser.parse_args()
+
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    sock.settimeout(args.renew)
+    addr = (args.host, args.port)
+    lines: List[str] = []
+    seq = None
+    renewed = 0.0
+    try:
+        while True:
+            if time.monotonic() - renewed >= args.renew:
+                sock.sendto(b"SUB", addr)  # subscribe / renew the lease
+                renewed = time.monotonic()
+            try:
+                frame = sock.recv(65535)
+            except socket.timeout:
+                continue
+            got, _, new = decode_frame(frame)
+            if not frame_flags(frame) & FLAG_DELTA:
+                lines = new
+            elif seq is not None and got == (seq + 1) & 0xFFFFFFFF:
+                lines = (lines + new)[len(new) :]
+            else:
+                renewed = 0.0  # missed a delta; resync
+                continue
+            seq = got
+            print("\n".join(lines), end="\n\n", flush=True)
+    except KeyboardInterrupt:
+        sock.sendto(b"UNSUB", addr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,417 @@
+# SPDX-FileCopyrightText: 2025 Aaron White <w531t4@gmail.com>
+# SPDX-License-Identifier: MIT
+import multiprocessing
+import multiprocessing.connection
+import pickle
+import signal
+import struct
+import threading
+import time
+import zlib
+from dataclasses import replace
+from multiprocessing.process import BaseProcess
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple, cast
+
+from twitch_fetchchat.agent_base import _AgentBase, agent_class
+from twitch_fetchchat.config import IrcBridgeConfig
+from twitch_fetchchat.hasslog import HassLog, Level
+from twitch_fetchchat.message import Snapshot
+from twitch_fetchchat.metrics import Metrics
+
+# -------- Worker -> supervisor frames (Connection.send_bytes) --------
+# emit: b"E", display index (u16), line count (u8), then per line a u16
+# length + UTF-8 bytes, then the pickled Batch if it holds any messages;
+# log: b"L" + "<level>\0<message>" in UTF-8
+_EMIT = struct.Struct("!cHB")
+_LINE_LEN = struct.Struct("!H")
+
+_MAX_BACKOFF_S = 300
+_STABLE_S = 60  # a worker up this long has its restart backoff reset
+_DRAIN_FRAMES = 64  # per worker per wakeup, so one busy shard can't starve the rest
+
+
+def pack_emit(index: int, lines: Sequence[str]) -> bytes:
+    """Frame a snapshot, reusing a Snapshot's pre-encoded lines."""
+    data = getattr(lines, "data", None) or [
+        (l or "").encode("utf-8", errors="replace") for l in lines
+    ]
+    parts = [_EMIT.pack(b"E", index, len(data))]
+    for line in data:
+        line = line[:0xFFFF]
+        parts.append(_LINE_LEN.pack(len(line)))
+        parts.append(line)
+    batch = getattr(lines, "batch", None)
+    if batch is not None and (batch.messages or batch.dropped):
+        parts.append(pickle.dumps(batch, pickle.HIGHEST_PROTOCOL))
+    return b"".join(parts)
+
+
+def unpack_emit(frame: bytes) -> Tuple[int, Snapshot]:
+    """(display index, snapshot) from an emit frame"""
+    _, index, count = _EMIT.unpack_from(frame)
+    offset = _EMIT.size
+    data = []
+    for _ in range(count):
+        (length,) = _LINE_LEN.unpack_from(frame, offset)
+        offset += _LINE_LEN.size
+        data.append(frame[offset : offset + length])
+        offset += length
+    batch = pickle.loads(frame[offset:]) if offset < len(frame) else None
+    lines = [d.decode("utf-8", errors="replace") for d in data]
+    return index, Snapshot(lines, data, batch)
+
+
+def _worker_main(
+    conn: multiprocessing.connection.Connection, config: IrcBridgeConfig
+) -> None:
+    """
+    Shard process: one agent (own IRC connection and buffers) driven by
+    ("display", index, key, max_messages) / ("remove", key) /
+    ("switch", key, channel) / ("config", config) / ("stop",) commands;
+    emits and logs go back as frames.
+    """
+    signal.signal(signal.SIGINT, signal.SIG_IGN)  # the parent decides
+    send_lock = threading.Lock()
+
+    def send(frame: bytes) -> None:
+        with send_lock:
+            try:
+                conn.send_bytes(frame)
+            except OSError:
+                pass  # supervisor gone; conn.recv() below ends the worker
+
+    def log(message: str, level: str = "INFO", **kwargs: Any) -> None:
+        send(b"L" + f"{level}\0{message}".encode("utf-8", errors="replace"))
+
+    def target(index: int) -> Callable[[List[str]], None]:
+        return lambda lines: send(pack_emit(index, lines))
+
+    agent: Optional[_AgentBase] = None
+    try:
+        while True:
+            try:
+                command = conn.recv()
+            except (EOFError, OSError):
+                break
+            if command[0] == "display":
+                _, index, key, max_messages = command
+                if agent is None:
+                    agent = agent_class(config.irc_engine)(
+                        config=replace(
+                            config, entity_id=key, max_messages=max_messages
+                        ),
+                        logger=log,
+                        emit_target=target(index),
+                    )
+                    agent.start()
+                else:
+                    agent.add_display(key, target(index), max_messages)
+            elif command[0] == "config":
+                config = command[1]
+                if agent is not None:
+                    agent.reconfigure(
+                        replace(
+                            config,
+                            entity_id=agent.config.entity_id,
+                            max_messages=agent.config.max_messages,
+                        )
+                    )
+            elif agent is None:
+                continue
+            elif command[0] == "remove":
+                agent.remove_display(command[1])
+            elif command[0] == "switch":
+                agent.switch_channel(command[2], display=command[1])
+            elif command[0] == "stop":
+                break
+    finally:
+        if agent is not None:
+            agent.terminate()
+
+
+class _Shard:
+    """One worker process and its restart state"""
+
+    def __init__(self, index: int) -> None:
+        self.index = index
+        self.process: Optional[BaseProcess] = None
+        self.conn: Optional[multiprocessing.connection.Connection] = None
+        self.started_at = 0.0
+        self.failures = 0
+        self.restart_at = 0.0
+
+
+class ShardSupervisor:
+    """
+    Runs the agent in `irc_shards` worker processes instead of a thread
+    - Same add_display/switch_channel/start/terminate API as IRCAgent
+    - A channel always maps to the same shard (crc32), so displays sharing
+      a channel share its connection and buffer
+    - Snapshots come back as framed bytes over each worker's pipe and go to
+      the display's emit target from one reader thread
+    - Workers that exit are restarted with exponential backoff and get
+      their displays and channels replayed
+    """
+
+    def __init__(
+        self,
+        config: IrcBridgeConfig,
+        logger: HassLog,
+        emit_target: Callable[[List[str]], None],
+        metrics: Optional[Metrics] = None,
+    ) -> None:
+        self.log = logger
+        self.config = config
+        self.metrics = metrics
+        self._ctx = multiprocessing.get_context("spawn")
+        self._worker_config = self._for_workers(config)
+
+        # -------- State --------
+        self._lock = threading.RLock()
+        # index -> (display key, emit target, max_messages); None once removed
+        self._displays: List[Optional[Tuple[str, Callable[[List[str]], None], int]]]
+        self._displays = [(config.entity_id, emit_target, config.max_messages)]
+        self._channels: Dict[str, Optional[str]] = {}
+        # display key -> the shard whose emits currently reach it
+        self._owner: Dict[str, int] = {}
+        self._shards = [_Shard(i) for i in range(config.irc_shards)]
+        self._stop_flag = False
+        self._thread: threading.Thread | None = None
+
+    @staticmethod
+    def _for_workers(config: IrcBridgeConfig) -> IrcBridgeConfig:
+        """workers run a plain single-process agent without metrics"""
+        return replace(
+            config,
+            irc_shards=0,
+            metrics_enabled=False,
+            transports=[],
+            displays=[],
+        )
+
+    def shard_of(self, channel: str) -> int:
+        """the shard serving `channel`"""
+        return zlib.crc32(channel.encode("utf-8")) % len(self._shards)
+
+    def start(self) -> None:
+        """start every worker and the reader thread"""
+        with self._lock:
+            for shard in self._shards:
+                self._spawn(shard)
+        self._thread = threading.Thread(
+            target=self._supervise, name="shard-supervisor", daemon=True
+        )
+        self._thread.start()
+
+    def terminate(self) -> None:
+        """stop the workers (killed if they do not exit in time)"""
+        self._stop_flag = True
+        with self._lock:
+            for shard in self._shards:
+                self._send(shard, ("stop",))
+        deadline = time.monotonic() + 5
+        for shard in self._shards:
+            if shard.process is None:
+                continue
+            shard.process.join(max(deadline - time.monotonic(), 0.1))
+            if shard.process.is_alive():
+                shard.process.kill()
+            if shard.conn is not None:
+                shard.conn.close()
+
+    def add_display(
+        self,
+        key: str,
+        emit_target: Callable[[List[str]], None],
+        max_messages: int,
+    ) -> None:
+        """
+        Register another display (served by whichever shard has its
+        channel); for a known key, swap its target/size and keep its channel.
+        """
+        with self._lock:
+            index = self._index(key)
+            if index is None:
+                index = len(self._displays)
+                self._displays.append(None)
+            self._displays[index] = (key, emit_target, max_messages)
+            for shard in self._shards:
+                self._send(shard, ("display", index, key, max_messages))
+
+    def remove_display(self, key: str) -> None:
+        """Drop a display, releasing its channel."""
+        with self._lock:
+            index = self._index(key)
+            if index is None:
+                return
+            self._displays[index] = None
+            self._channels.pop(key, None)
+            self._owner.pop(key, None)
+            for shard in self._shards:
+                self._send(shard, ("remove", key))
+
+    def channels(self) -> Dict[str, Optional[str]]:
+        """display key -> the channel it follows"""
+        with self._lock:
+            return {
+                d[0]: self._channels.get(d[0]) for d in self._displays if d is not None
+            }
+
+    def reconfigure(self, config: IrcBridgeConfig) -> None:
+        """
+        Pass a reloaded config to every worker (see _AgentBase.reconfigure);
+        RESTART_KEYS, irc_shards included, need a new supervisor.
+        """
+        with self._lock:
+            self.config = config
+            self._worker_config = self._for_workers(config)
+            for shard in self._shards:
+                self._send(shard, ("config", self._worker_config))
+
+    def switch_channel(
+        self, channel: Optional[str], display: Optional[str] = None
+    ) -> None:
+        """Point a display at a channel (on its shard), or None to release it."""
+        key = self.config.entity_id if display is None else display
+        self.log(f"switch_channel: display={key} channel={channel}")
+        with self._lock:
+            old = self._owner.get(key)
+            new = self.shard_of(channel) if channel else old
+            if old is not None and old != new:
+                self._send(self._shards[old], ("switch", key, None))
+            self._channels[key] = channel
+            if new is None:
+                blanks = [""] * self._max_messages(key)
+                self._target(key)(blanks)
+                return
+            self._owner[key] = new
+            self._send(self._shards[new], ("switch", key, channel))
+
+    def _index(self, key: str) -> Optional[int]:
+        for index, display in enumerate(self._displays):
+            if display is not None and display[0] == key:
+                return index
+        return None
+
+    def _max_messages(self, key: str) -> int:
+        return next(d[2] for d in self._displays if d is not None and d[0] == key)
+
+    def _target(self, key: str) -> Callable[[List[str]], None]:
+        return next(d[1] for d in self._displays if d is not None and d[0] == key)
+
+    # -------------------- Workers --------------------
+    def _spawn(self, shard: _Shard) -> None:
+        """start a worker and replay its displays and channels (lock held)"""
+        parent, child = self._ctx.Pipe(duplex=True)
+        process = self._ctx.Process(
+            target=_worker_main,
+            args=(child, self._worker_config),
+            name=f"twitch-shard-{shard.index}",
+            daemon=True,
+        )
+        process.start()
+        child.close()
+        shard.process, shard.conn = process, parent
+        shard.started_at = time.monotonic()
+        for index, display in enumerate(self._displays):
+            if display is not None:
+                self._send(shard, ("display", index, display[0], display[2]))
+        for key, channel in self._channels.items():
+            if channel and self._owner.get(key) == shard.index:
+                self._send(shard, ("switch", key, channel))
+        self.log(f"shard {shard.index} started (pid {process.pid})")
+        self._count_up()
+
+    def _send(self, shard: _Shard, command: Tuple) -> None:
+        if shard.conn is None:
+            return  # down; the restart replays the current state
+        try:
+            shard.conn.send(command)
+        except OSError:
+            pass  # the reader notices the exit
+
+    def _lost(self, shard: _Shard) -> None:
+        """a worker exited: schedule its restart with backoff (lock held)"""
+        if shard.conn is None:
+            return
+        shard.conn.close()
+        shard.conn = None
+        if shard.process is not None:
+            shard.process.join(1)
+        code = shard.process.exitcode if shard.process else None
+        now = time.monotonic()
+        if now - shard.started_at >= _STABLE_S:
+            shard.failures = 0
+        delay = min(self.config.reconnect_delay_s * 2**shard.failures, _MAX_BACKOFF_S)
+        shard.failures += 1
+        shard.restart_at = now + delay
+        self.log(
+            f"shard {shard.index} exited (code {code}); restarting in {delay}s",
+            level="WARNING",
+        )
+        if self.metrics is not None:
+            self.metrics.inc("shard_restarts_total")
+        self._count_up()
+
+    def _count_up(self) -> None:
+        if self.metrics is not None:
+            up = sum(1 for s in self._shards if s.conn is not None)
+            self.metrics.set("shard_workers_up", up)
+
+    # -------------------- Reader --------------------
+    def _supervise(self) -> None:
+        """read frames from all workers; notice and restart exited ones"""
+        while not self._stop_flag:
+            try:
+                self._supervise_once()
+            except Exception as e:
+                # e.g. a corrupt frame or a failed spawn; this is the only
+                # reader, so it must outlive them
+                self.log(f"shard reader error: {e}", level="ERROR")
+                time.sleep(0.5)
+
+    def _supervise_once(self) -> None:
+        with self._lock:
+            waiting: Dict[Any, _Shard] = {}
+            for shard in self._shards:
+                if shard.conn is not None and shard.process is not None:
+                    waiting[shard.conn] = shard
+                    waiting[shard.process.sentinel] = shard
+                elif time.monotonic() >= shard.restart_at:
+                    self._spawn(shard)
+        try:
+            ready = multiprocessing.connection.wait(list(waiting), timeout=0.5)
+        except OSError:
+            return  # a pipe closed under us; rebuild the wait set
+        for obj in ready:
+            shard = waiting[obj]
+            if self._stop_flag:
+                return
+            conn = shard.conn
+            if conn is None or obj is not conn:
+                continue  # exit sentinel; the pipe reports EOF as well
+            try:
+                for _ in range(_DRAIN_FRAMES):
+                    self._frame(shard, conn.recv_bytes())
+                    if not conn.poll():
+                        break
+            except (EOFError, OSError):
+                with self._lock:
+                    self._lost(shard)
+
+    def _frame(self, shard: _Shard, frame: bytes) -> None:
+        if frame[:1] == b"L":
+            level, _, message = frame[1:].decode("utf-8", "replace").partition("\0")
+            self.log(f"[shard {shard.index}] {message}", level=cast(Level, level))
+            return
+        index, lines = unpack_emit(frame)
+        display = self._displays[index] if index < len(self._displays) else None
+        if display is None:
+            return  # removed
+        key, target, _ = display
+        if self._owner.get(key) != shard.index:
+            return  # late frame from the shard this display moved away from
+        try:
+            target(lines)
+        except Exception as e:
+            self.log(f"Transport send error ({key}): {e}", level="ERROR")
@@ -0,0 +1,124 @@
+# SPDX-FileCopyrightText: 2025 Aaron White <w531t4@gmail.com>
+# SPDX-License-Identifier: MIT
+
+from __future__ import annotations
+from typing import TYPE_CHECKING, Callable, Dict, List, Optional, Tuple
+
+from twitch_fetchchat.config import IrcBridgeConfig
+from twitch_fetchchat.dispatcher import TransportDispatcher
+from twitch_fetchchat.ha_transport import HAAttrTransport
+from twitch_fetchchat.mqtt_transport import DirectMQTTClient, MQTTTransport
+from twitch_fetchchat.subscribe_transport import SubscribeTransport
+from twitch_fetchchat.udp_transport import UDPTransport
+
+if TYPE_CHECKING:
+    from twitch_fetchchat.metrics import Metrics
+    from twitch_fetchchat.hasslog import BridgeApp
+
+Transport = UDPTransport | MQTTTransport | HAAttrTransport | SubscribeTransport
+
+
+def build_transport(app: BridgeApp, cfg: IrcBridgeConfig) -> Transport | None:
+    """
+    Build the sink named by cfg.transport_mode. `app` supplies log/error and,
+    for the HA-backed sinks, call_service/set_state.
+    """
+    if cfg.transport_mode == "udp":
+        if not cfg.udp_hosts:
+            app.error("transport=udp requires udp_host", level="ERROR")
+            return None
+        return UDPTransport(
+            app,
+            cfg.udp_hosts,
+            cfg.udp_port,
+            cfg.udp_line_max_chars,
+            frame=cfg.udp_frame,
+            skip_unchanged=cfg.udp_skip_unchanged,
+            resolve_ttl_s=cfg.udp_resolve_ttl_s,
+            fail_threshold=cfg.udp_fail_threshold,
+            suppress_s=cfg.udp_suppress_s,
+        )
+    if cfg.transport_mode == "mqtt":
+        client = None
+        if cfg.mqtt_client == "direct":
+            client = DirectMQTTClient(
+                app,
+                cfg.mqtt_broker_host,
+                cfg.mqtt_broker_port,
+                cfg.mqtt_username,
+                cfg.mqtt_password,
+            )
+        return MQTTTransport(
+            app,
+            cfg.mqtt_base_topic,
+            cfg.mqtt_retain,
+            delta=cfg.mqtt_delta,
+            append=cfg.mqtt_append,
+            qos=cfg.mqtt_qos,
+            client=client,
+            batch=cfg.mqtt_batch,
+        )
+    if cfg.transport_mode == "subscribe":
+        return SubscribeTransport(
+            app,
+            cfg.sub_port,
+            cfg.sub_bind,
+            cfg.udp_line_max_chars,
+            frame=cfg.udp_frame,
+            allow=cfg.sub_allow,
+            lease_s=cfg.sub_lease_s,
+            max_clients=cfg.sub_max_clients,
+        )
+    if cfg.transport_mode == "ha":
+        return HAAttrTransport(
+            app,
+            cfg.ha_entity_id,
+            skip_unchanged=cfg.ha_skip_unchanged,
+            min_interval_ms=cfg.ha_min_interval_ms,
+            event=cfg.ha_event,
+        )
+    return None
+
+
+def needs_app(cfg: IrcBridgeConfig) -> bool:
+    """does this sink call back into AppDaemon (HA services/states)"""
+    return cfg.transport_mode == "ha" or (
+        cfg.transport_mode == "mqtt" and cfg.mqtt_client == "ha"
+    )
+
+
+def build_output(
+    app: BridgeApp,
+    cfg: IrcBridgeConfig,
+    metrics: Optional[Metrics] = None,
+    keep: Optional[Dict[str, Transport]] = None,
+) -> Tuple[Dict[str, Transport], TransportDispatcher]:
+    """
+    One display's transports (by name) behind a started TransportDispatcher
+    (dispatcher.submit is the display's emit target). Transports in `keep`
+    are reused under their name instead of being built.
+    """
+    keep = keep or {}
+    transports: Dict[str, Transport] = {}
+    targets: List[Tuple[str, Callable[[List[str]], None]]] = []
+    for name, tcfg in cfg.transport_configs():
+        transport = keep.get(name) or build_transport(app, tcfg)
+        if transport:
+            transports[name] = transport
+            targets.append((f"{cfg.entity_id}/{name}", transport.deliver))
+    if not targets:
+        app.error(
+            "No valid transport configured (use udp/mqtt/ha/subscribe)", level="ERROR"
+        )
+
+    # -------- Dispatch (parallel, off the IRC thread) --------
+    dispatcher = TransportDispatcher(
+        app.log,
+        targets,
+        queue_size=cfg.dispatch_queue_size,
+        policy=cfg.dispatch_policy,
+        late_ms=cfg.dispatch_late_ms,
+        metrics=metrics,
+    )
+    dispatcher.start()
+    return transports, dispatcher
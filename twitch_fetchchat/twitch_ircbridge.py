@@ -1,26 +1,67 @@
 # SPDX-FileCopyrightText: 2025 Aaron White <w531t4@gmail.com>
 # SPDX-License-Identifier: MIT
+import atexit
+import threading
 from dataclasses import fields
-from typing import Any, List
+from typing import Any, Dict, List, Optional
 import appdaemon.plugins.hass.hassapi as hass
 
 
-from twitch_fetchchat.mqtt_transport import MQTTTransport
-from twitch_fetchchat.udp_transport import UDPTransport
-from twitch_fetchchat.ha_transport import HAAttrTransport
 from twitch_fetchchat.config import IrcBridgeConfig
-from twitch_fetchchat.irc_agent import IRCAgent
+from twitch_fetchchat.runtime import BridgeRuntime
+
+# apps.yaml edits make AppDaemon terminate() the app and initialize() a new
+# instance; the runtime waits this long in between to be picked up again
+_HANDOFF_S = 10
+_HANDOFF_KEY = "twitch_fetchchat.handoff"
+# HA event starting a profile capture; data: seconds (0 stops), app (optional)
+PROFILE_EVENT = "twitch_fetchchat_profile"
+
+
+class _Parked:
+    """A runtime between an app's terminate() and the next initialize()"""
+
+    def __init__(self, owner: type, runtime: BridgeRuntime) -> None:
+        self.owner = owner
+        self.runtime = runtime
+        self._lock = threading.Lock()
+        self._taken = False
+        self._timer = threading.Timer(_HANDOFF_S, self.expire)
+        self._timer.daemon = True
+        self._timer.start()
+        atexit.register(self.expire)  # AppDaemon exiting: shut down cleanly
+
+    def take(self) -> Optional[BridgeRuntime]:
+        """the runtime, at most once; None if it already expired"""
+        with self._lock:
+            if self._taken:
+                return None
+            self._taken = True
+        self._timer.cancel()
+        atexit.unregister(self.expire)
+        return self.runtime
+
+    def expire(self) -> None:
+        """nobody picked the runtime up: shut it down"""
+        runtime = self.take()
+        if runtime is not None:
+            runtime.terminate()
 
 
 class TwitchIrcBridge(hass.Hass):
     """
     Bridge between HASS and Twitch IRC Agent
-    - Watches an HA entity for the channel name
+    - Watches one HA entity per display for the channel name
+    - All displays share a single IRC connection (one per shard with
+      irc_shards > 1)
+    - Config edits are applied to the running bridge (see BridgeRuntime)
+      instead of reconnecting
+    - A PROFILE_EVENT runs a profile capture into profile_dir
     """
 
     config: IrcBridgeConfig
-    _transports: List[UDPTransport | MQTTTransport | HAAttrTransport]
-    irc_agent: IRCAgent
+    runtime: BridgeRuntime
+    _display_ids: List[str]
 
     def initialize(self) -> None:
         """appdaemon init section"""
@@ -34,46 +75,87 @@ class TwitchIrcBridge(hass.Hass):
             }
         )
 
-        # -------- Build transports --------
-        self._transports = []
-        if self.config.transport_mode == "udp":
-            if not self.config.udp_hosts:
-                self.error("transport=udp requires udp_host", level="ERROR")
-            else:
-                self._transports.append(
-                    UDPTransport(
-                        self,
-                        self.config.udp_hosts,
-                        self.config.udp_port,
-                        self.config.udp_line_max_chars,
-                    )
-                )
-        elif self.config.transport_mode == "mqtt":
-            self._transports.append(
-                MQTTTransport(
-                    self, self.config.mqtt_base_topic, self.config.mqtt_retain
-                )
-            )
-        elif self.config.transport_mode == "ha":
-            self._transports.append(HAAttrTransport(self, self.config.ha_entity_id))
-        if not self._transports:
-            self.error("No valid transport configured (use udp/mqtt/ha)", level="ERROR")
+        # -------- Adopt the previous instance's runtime, or build one --------
+        parked: Dict[str, _Parked] = self.global_vars.setdefault(_HANDOFF_KEY, {})
+        handoff = parked.pop(self.name, None)
+        runtime = handoff.take() if handoff else None
+        if (
+            handoff is not None
+            and runtime is not None
+            and handoff.owner is not type(self)
+        ):
+            runtime.terminate()  # the app's code was reloaded; start clean
+            runtime = None
+        if runtime is None:
+            self.runtime = BridgeRuntime(self, self.config)
+        else:
+            runtime.app = self
+            changed = runtime.reload(self.config, rebind=True)
+            self.log(f"kept the running bridge; applied changes to {changed}")
+            self.runtime = runtime
+        displays = self.config.display_configs()
+
+        # Drive from entities
+        self._display_ids = self.runtime.display_ids
+        for entity_id in self._display_ids:
+            # subscribe for future changes
+            self.listen_state(self._on_channel_change, entity_id)
 
-        self.irc_agent = IRCAgent(
-            logger=self.log, config=self.config, emit_target=self._transports[0].send
+            # apply current value once at startup
+            cur = self.get_state(entity_id)  # None if entity missing
+            self.log(f"initial entity_id={entity_id} cur={cur}")
+            self._on_channel_change(entity_id, "state", None, cur)
+        self.log(
+            f"TwitchIrcBridge ready (displays={len(displays)}, "
+            f"transports={[n for c in displays for n, _ in c.transport_configs()]})"
         )
 
-        # Drive from entity
-        # subscribe for future changes
-        self.listen_state(self._on_channel_change, self.config.entity_id)
+        if self.runtime.metrics is not None and self.config.metrics_interval_s:
+            self.run_every(self._publish_metrics, "now", self.config.metrics_interval_s)
+        self.listen_event(self._on_profile_event, PROFILE_EVENT)
+
+        self.runtime.start()
 
-        # apply current value once at startup
-        cur = self.get_state(self.config.entity_id)  # None if entity missing
-        self.log(f"initial entity_id={self.config.entity_id} cur={cur}")
-        self._on_channel_change(self.config.entity_id, "state", None, cur)
-        self.log(f"TwitchIrcBridge ready (transport={self.config.transport_mode})")
+    def terminate(self) -> None:
+        """appdaemon shutdown section (the runtime lingers for a reload)"""
+        # Nothing may call into this app from here on; the next instance
+        # rebuilds the outputs, or the runtime expires
+        self.runtime.park()
+        parked: Dict[str, _Parked] = self.global_vars.setdefault(_HANDOFF_KEY, {})
+        parked[self.name] = _Parked(type(self), self.runtime)
 
-        self.irc_agent.start()
+    def _publish_metrics(self, kwargs: Any) -> None:  # pylint: disable=unused-argument
+        """run_every callback: metrics summary as an HA sensor"""
+        metrics = self.runtime.metrics
+        if metrics is None:
+            return
+        summary = metrics.summary()
+        self.set_state(
+            self.config.metrics_entity_id,
+            state=summary.get("messages_received_per_s", 0),
+            attributes={
+                **summary,
+                "unit_of_measurement": "msg/s",
+                "friendly_name": "Twitch Chat Bridge Metrics",
+                "icon": "mdi:chart-line",
+            },
+        )
+
+    def _on_profile_event(
+        self,
+        event_type: str,  # pylint: disable=unused-argument
+        data: Dict[str, Any],
+        **kwargs: Any,  # pylint: disable=unused-argument
+    ) -> None:
+        """PROFILE_EVENT callback: profile this bridge (or the named app)"""
+        if data.get("app", self.name) != self.name:
+            return
+        try:
+            seconds = int(data["seconds"]) if "seconds" in data else None
+        except (TypeError, ValueError):
+            self.log(f"{PROFILE_EVENT}: bad seconds={data['seconds']!r}")
+            return
+        self.runtime.profile(seconds)
 
     # -------------------- Entity handling --------------------
     def _on_channel_change(
@@ -85,14 +167,15 @@ class TwitchIrcBridge(hass.Hass):
         **kwargs: Any,
     ) -> None:
         """React to channel-entity changes and (dis)connect accordingly."""
-        if entity != self.config.entity_id:
+        if entity not in self._display_ids:
             self.log(
-                f"this shouldn't happen. found entity={entity} != "
-                f"self.config.entity_id=self.config.entity_id"
+                f"this shouldn't happen. found entity={entity} not in "
+                f"displays={self._display_ids}"
             )
+            return
         new_channel: str = (new or "").strip().lstrip("#").lower()
         if new in (None, "") or new_channel in ("unknown", "unavailable", "none"):
-            self.log(f"{self.config.entity_id} unknown/unavailable -> disconnect IRC")
-            self.irc_agent.switch_channel(None)
+            self.log(f"{entity} unknown/unavailable -> release channel")
+            self.runtime.agent.switch_channel(None, display=entity)
         else:
-            self.irc_agent.switch_channel(new_channel)
+            self.runtime.agent.switch_channel(new_channel, display=entity)
@@ -3,38 +3,165 @@
 
 from __future__ import annotations
 import socket
-from typing import Sequence, TYPE_CHECKING
+import struct
+import time
+from typing import Dict, List, Sequence, Tuple, TYPE_CHECKING
 from twitch_fetchchat.base_transport import _TransportBase
+from twitch_fetchchat.render import encode_lines
 
 if TYPE_CHECKING:
-    from twitch_fetchchat.twitch_ircbridge import TwitchIrcBridge
+    from twitch_fetchchat.hasslog import BridgeApp
+
+# -------- Framed protocol (udp_frame: v1) --------
+# header: magic "TC", version, flags, seq (u32), unix ms (u64), line count (u8)
+# then per line: length (u16) + UTF-8 bytes; all integers big-endian
+FRAME_MAGIC = b"TC"
+FRAME_VERSION = 1
+_HEADER = struct.Struct("!2sBBIQB")
+_LINE_LEN = struct.Struct("!H")
+
+
+def encode_frame(seq: int, ts_ms: int, lines: Sequence[bytes], flags: int = 0) -> bytes:
+    """Pack already-encoded lines into a v1 frame."""
+    parts = [_HEADER.pack(FRAME_MAGIC, FRAME_VERSION, flags, seq, ts_ms, len(lines))]
+    for data in lines:
+        data = data[:0xFFFF]
+        parts.append(_LINE_LEN.pack(len(data)))
+        parts.append(data)
+    return b"".join(parts)
+
+
+def decode_frame(frame: bytes) -> Tuple[int, int, List[str]]:
+    """Unpack a v1 frame into (seq, ts_ms, lines); for receivers and tests."""
+    magic, version, _, seq, ts_ms, count = _HEADER.unpack_from(frame)
+    if magic != FRAME_MAGIC or version != FRAME_VERSION:
+        raise ValueError(f"not a v{FRAME_VERSION} frame. observed={magic!r}/{version}")
+    offset = _HEADER.size
+    lines = []
+    for _ in range(count):
+        (length,) = _LINE_LEN.unpack_from(frame, offset)
+        offset += _LINE_LEN.size
+        lines.append(frame[offset : offset + length].decode("utf-8", errors="replace"))
+        offset += length
+    return seq, ts_ms, lines
+
+
+class _Destination:
+    """Cached address and health for one udp host"""
+
+    def __init__(self, host: str) -> None:
+        self.host = host
+        self.addr: Tuple[str, int] | None = None
+        self.expires = 0.0
+        self.failures = 0
+        self.suppressed_until = 0.0
+        self.sent = 0
 
 
 class UDPTransport(_TransportBase):
     def __init__(
         self,
-        logger: TwitchIrcBridge,
+        logger: BridgeApp,
         hosts: Sequence[str],
         port: int,
         max_chars: int | None = None,
+        frame: str = "text",
+        skip_unchanged: bool = False,
+        resolve_ttl_s: int = 300,
+        fail_threshold: int = 3,
+        suppress_s: int = 30,
     ):
         self.log = logger.log
-        self.hosts = hosts if isinstance(hosts, (list, tuple)) else [hosts]
+        self.hosts: List[str] = [hosts] if isinstance(hosts, str) else list(hosts)
         self.port = int(port)
         self.max_chars = max_chars
+        self.frame = frame
+        self.skip_unchanged = bool(skip_unchanged)
+        self.resolve_ttl_s = resolve_ttl_s
+        self.fail_threshold = max(int(fail_threshold), 1)
+        self.suppress_s = suppress_s
         self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self._dests = [_Destination(host) for host in self.hosts]
+        self._seq = 0
+        self._last_key: object = None
+        self.skipped = 0
 
     def send(self, lines):
-        out = []
-        for s in lines:
-            if s is None:
-                s = ""
-            if self.max_chars:
-                s = s[: self.max_chars]
-            out.append(s)
-        payload = ("\n".join(out)).encode("utf-8", errors="replace")
-        for host in self.hosts:
+        encoded = encode_lines(lines, self.max_chars)
+        if self.frame == "v1":
+            key: object = tuple(encoded)
+            payload = b""  # framed below, once it is known to be sent
+        else:
+            payload = b"\n".join(encoded)
+            key = payload
+        if self.skip_unchanged and key == self._last_key:
+            self.skipped += 1
+            return
+        self._last_key = key
+        if self.frame == "v1":
+            payload = encode_frame(self._seq, int(time.time() * 1000), encoded)
+            self._seq = (self._seq + 1) & 0xFFFFFFFF
+
+        now = time.monotonic()
+        for dest in self._dests:
+            if dest.suppressed_until > now:
+                continue
             try:
-                self.sock.sendto(payload, (host, self.port))
+                self.sock.sendto(payload, self._resolve(dest, now))
             except Exception as e:
-                self.log(f"UDP send to {host}:{self.port} failed: {e}", level="ERROR")
+                self._failed(dest, now, e)
+                continue
+            dest.sent += 1
+            if dest.failures:
+                self.log(f"UDP send to {dest.host}:{self.port} recovered")
+                dest.failures = 0
+
+    def close(self) -> None:
+        self.sock.close()
+
+    def stats(self) -> Dict[str, Dict[str, int | bool]]:
+        """per-host health keyed by hostname"""
+        now = time.monotonic()
+        return {
+            dest.host: {
+                "sent": dest.sent,
+                "failures": dest.failures,
+                "suppressed": dest.suppressed_until > now,
+            }
+            for dest in self._dests
+        }
+
+    def _resolve(self, dest: _Destination, now: float) -> Tuple[str, int]:
+        """Look the host up at most once per resolve_ttl_s."""
+        if dest.addr and now < dest.expires:
+            return dest.addr
+        try:
+            info = socket.getaddrinfo(
+                dest.host, self.port, socket.AF_INET, socket.SOCK_DGRAM
+            )
+        except OSError:
+            if not dest.addr:
+                raise
+            # Keep the stale address rather than going dark on a DNS blip
+            dest.expires = now + min(self.resolve_ttl_s, self.suppress_s)
+            return dest.addr
+        addr = (str(info[0][4][0]), int(info[0][4][1]))
+        dest.addr = addr
+        dest.expires = now + self.resolve_ttl_s
+        return addr
+
+    def _failed(self, dest: _Destination, now: float, error: Exception) -> None:
+        """Log the first failure, then suppress the host after a streak."""
+        dest.failures += 1
+        if dest.failures == 1:
+            self.log(
+                f"UDP send to {dest.host}:{self.port} failed: {error}", level="ERROR"
+            )
+        if dest.failures >= self.fail_threshold:
+            self.log(
+                f"UDP host {dest.host} failed {dest.failures} times; "
+                f"suppressing for {self.suppress_s}s",
+                level="WARNING",
+            )
+            dest.suppressed_until = now + self.suppress_s
+            dest.expires = 0.0  # re-resolve when the suppression lapses